@@ -2,7 +2,12 @@ import pandas as pd
 import numpy as np
 from event_group import EventGroup
 import os
+import json
 import logging
+from hperf_exception import AnalyzerError, EventGroupError
+from perf_reader import read_perf_result, AGGREGATED_UNIT
+from result_store import ResultStore
+from collector import COLLECTORS, TIMEZONE_FILE, PASS_DIR_PREFIX
 
 
 class Analyzer:
@@ -10,6 +15,9 @@ class Analyzer:
     `Analyzer` is responsible for handling the raw performance data generated by `Profiler` and output the report of performance metrics. 
     """
 
+    # the maximum size of the cube of (timestamp x unit x event) handled at once when breaking down metrics by units
+    BREAKDOWN_CHUNK_BYTES = 64 * 1024 * 1024
+
     def __init__(self, test_dir: str, configs: dict, event_groups: EventGroup) -> None:
         """
         Constructor of `Analyzer`
@@ -24,90 +32,454 @@ class Analyzer:
         self.configs = configs
         self.event_groups = event_groups
 
-        self.cpu_topo: pd.DataFrame = None    # for cpu topo (mapping of cpu id and socket id)
+        # for multi-pass collection (`--multi-pass`), the outputs of each pass are saved in sub-directories, 
+        # and the outputs of the first pass are used as the reference for timestamps and auxiliary collectors
+        self.pass_dirs: list = self.get_pass_dirs(test_dir)
+        self.source_dir: str = self.pass_dirs[0] if len(self.pass_dirs) > 0 else test_dir
+
+        # metrics to compute, which can be specified by `--metrics` option (all metrics of the architecture by default)
+        self.metrics: list = self.__select_metrics()    # may raise `AnalyzerError`
+
+        self.cpu_topo: pd.DataFrame = None    # for cpu topo (mapping of cpu id, socket id and core id)
+        self.cpu_to_socket: np.ndarray = None    # dense lookup array: cpu id -> socket id (-1 for absent cpu ids)
+        self.cpu_to_core: np.ndarray = None    # dense lookup array: cpu id -> core id (-1 for absent cpu ids or unknown core ids)
+
+        # the sampling interval (in seconds), which is specified by `-I/--interval` option when profiling, 
+        # or derived from the timestamps of raw performance data (see `.__get_elapsed_time()`)
+        self.interval: float = configs["interval"] / 1000 if "interval" in configs else None
         
         self.timeseries: pd.DataFrame = None    # for timeseries results
+        self.coverage: pd.DataFrame = None    # for timeseries of the percentage of time each event was actually running on the counter
         self.aggregated_metrics: pd.DataFrame = None    # for aggregated results
+        self.breakdown_metrics: dict = {}    # for aggregated results of each unit, keyed by breakdown level ('cpu', 'core' or 'socket')
+
+        self.start_time: pd.Timestamp = None    # the absolute time (UTC) when perf started, i.e. timestamp 0 of perf
+        self.collector_results: dict = {}    # for outputs of auxiliary collectors (e.g. sar) aligned on the clock of perf
+
+    def __select_metrics(self) -> list:
+        """
+        Select the metrics to compute according to `configs["metrics"]` (names or categories of metrics), 
+        in the order defined for the architecture. 
+        :return: a list of metrics (items in `self.event_groups.metrics`)
+        :raises:
+            `AnalyzerError`: if any specified metric is not defined for the architecture or not collected
+        """
+        if "metrics" not in self.configs:
+            return self.event_groups.metrics
+        try:
+            return self.event_groups.resolve_metrics(self.configs["metrics"])
+        except EventGroupError as e:
+            raise AnalyzerError(str(e))
 
     def __analyze_cpu_topo(self):
         """
+        Read the CPU topology (`cpu_topo`) generated by `Profiler` and build dense lookup arrays 
+        indexed by cpu id (`.cpu_to_socket` and `.cpu_to_core`), so that mapping cpu ids can be done by array indexing. 
+        **Note**: for aarch64 platform, `cpu_topo` only has 2 columns (processor | socket), the core ids are unknown. 
         """
-        self.cpu_topo = pd.read_csv(os.path.join(self.test_dir, "cpu_topo"),
-                                    sep="\t",
-                                    header=None,
-                                    names=["unit", "socket"],
-                                    usecols=[0, 1])
+        cpu_topo = pd.read_csv(os.path.join(self.test_dir, "cpu_topo"),
+                               sep="\t",
+                               header=None)
+        if cpu_topo.shape[1] < 3:
+            cpu_topo[2] = -1
+        self.cpu_topo = cpu_topo.iloc[:, 0:3].set_axis(["unit", "socket", "core"], axis=1).astype(np.int64)
+
+        self.cpu_to_socket = np.full(self.cpu_topo["unit"].max() + 1, -1, dtype=np.int64)
+        self.cpu_to_socket[self.cpu_topo["unit"].to_numpy()] = self.cpu_topo["socket"].to_numpy()
+        self.cpu_to_core = np.full(self.cpu_topo["unit"].max() + 1, -1, dtype=np.int64)
+        self.cpu_to_core[self.cpu_topo["unit"].to_numpy()] = self.cpu_topo["core"].to_numpy()
+
+    def __remap_units(self, perf_raw_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rename 'unit' according to `self.event_groups.events[..]['type']` by a single vectorized categorical mapping. 
+        e.g. 'duration_time' is a system-wide event, where in each timestamp there is only a value (attribute to CPU0)
+        ```
+        timestamp | unit | value | metric         -> timestamp | unit   | value | metric
+        1.0000    | CPU0 | 1.001 | duration_time     1.0000    | SYSTEM | 1.001 | duration_time
+        1.0000    | CPU0 | 12345 | cycles            1.0000    | CPU0   | 12345 | cycles
+        1.0000    | CPU1 | 23456 | cycles            1.0000    | CPU1   | 23456 | cycles
+        ```
+        For some socket-wide events, such as events from SLC shared by a socket, perf will report its value 
+        attributed to a CPU in this socket, and the CPU is mapped to its socket by `.cpu_to_socket`. 
+        e.g. SOCKET 0: CPU 0-15, 32-47 ... SOCKET 1: CPU 16-31, 48-63 ...
+        ```
+        timestamp | unit  | value | metric             -> timestamp | unit    | value | metric
+        1.0000    | CPU0  | 12345 | uncore_cha_xxx        1.0000    | SOCKET0 | 12345 | uncore_cha_xxx
+        1.0000    | CPU16 | 23456 | uncore_cha_xxx        1.0000    | SOCKET1 | 23456 | uncore_cha_xxx
+        ```
+        :param `perf_raw_data`: a DataFrame of raw performance data with columns 'timestamp', 'unit', 'value' and 'metric'
+        :return: a new DataFrame where the column 'unit' is replaced by a categorical column of remapped units
+        :raises:
+            `AnalyzerError`: if a unit can not be mapped to a socket by the CPU topology
+        """
+        # each distinct unit and metric is mapped to a code only once by `read_perf_result()`, rather than handling strings row by row
+        units = perf_raw_data["unit"].astype("category")
+        metrics = perf_raw_data["metric"].astype("category")
+
+        # cpu id of each distinct unit (e.g. 'CPU16' -> 16)
+        unit_cpu_ids = units.cat.categories.str[3:].astype(np.int64).to_numpy()
+        # type of each distinct metric (0: CPU, 1: SYSTEM, 2: SOCKET)
+        mapping_perf_name_to_type = { item["perf_name"]: item.get("type", "CPU") for item in self.event_groups.events }
+        metric_types = np.array([ ["CPU", "SYSTEM", "SOCKET"].index(mapping_perf_name_to_type.get(x, "CPU"))
+                                  for x in metrics.cat.categories ], dtype=np.int8)
+
+        # the categories of remapped units: CPU0, ..., CPU<n-1>, SOCKET0, ..., SOCKET<m-1>, SYSTEM
+        n_cpus = max(len(self.cpu_to_socket), unit_cpu_ids.max() + 1)
+        n_sockets = self.cpu_to_socket.max() + 1
+        categories = [ f"CPU{i}" for i in range(n_cpus) ] + [ f"SOCKET{i}" for i in range(n_sockets) ] + [ "SYSTEM" ]
+
+        row_cpu_ids = unit_cpu_ids[units.cat.codes.to_numpy()]
+        row_types = metric_types[metrics.cat.codes.to_numpy()]
+        codes = row_cpu_ids.copy()
+        if (row_types == 2).any():
+            socket_cpu_ids = row_cpu_ids[row_types == 2]
+            if socket_cpu_ids.max() >= len(self.cpu_to_socket) or (self.cpu_to_socket[socket_cpu_ids] < 0).any():
+                raise AnalyzerError("Fail to attribute socket-wide events to sockets by the CPU topology.")
+            codes[row_types == 2] = n_cpus + self.cpu_to_socket[socket_cpu_ids]
+        codes[row_types == 1] = n_cpus + n_sockets
+
+        return perf_raw_data.assign(unit=pd.Categorical.from_codes(codes, categories=categories))
+
+    @staticmethod
+    def read_perf_result(file) -> pd.DataFrame:
+        """
+        Read the raw performance data generated by perf (`perf stat -x "\t" -I ...`) and convert to DataFrame. 
+        :param `file`: the path of the raw performance data file, or a file-like object (e.g. new bytes of the file wrapped by `io.BytesIO`)
+        :return: a DataFrame with columns 'timestamp', 'unit', 'value', 'metric', 'run_time' and 'coverage', see `perf_reader.read_perf_result()`
+        """
+        return read_perf_result(file)
 
     def analyze(self):
         """
-        
+        Read the raw performance data file generated by `Profiler` and get the timeseries of events and metrics (`.timeseries`). 
+        :raises:
+            `AnalyzerError`: if the raw performance data can not be handled
         """
-        self.__analyze_cpu_topo()
+        # read the raw performance data file generated by `Profiler` and convert to DataFrame, 
+        # if the parsed raw performance data has been saved in the test directory by a previous analysis, load it instead of parsing text
+        store = ResultStore(self.test_dir, [ os.path.join(pass_dir, "perf_result") for pass_dir in self.pass_dirs ])
+        if store.has_raw_data():
+            perf_raw_data = store.load_raw_data()
+        elif len(self.pass_dirs) > 0:
+            perf_raw_data = self.merge_passes([ self.read_perf_result(os.path.join(pass_dir, "perf_result")) 
+                                                for pass_dir in self.pass_dirs ])    # may raise `AnalyzerError`
+            store.save_raw_data(perf_raw_data)
+        else:
+            perf_raw_data = self.read_perf_result(os.path.join(self.test_dir, "perf_result"))
+            store.save_raw_data(perf_raw_data)
+
+        # only analyze the intervals in the time window, which can be specified by `--window` option in re-analysis mode
+        if "window" in self.configs:
+            start, end = self.configs["window"]
+            if start is not None:
+                perf_raw_data = perf_raw_data[perf_raw_data["timestamp"] >= start]
+            if end is not None:
+                perf_raw_data = perf_raw_data[perf_raw_data["timestamp"] <= end]
+            if len(perf_raw_data) == 0:
+                raise AnalyzerError(f"No interval in the time window {self.configs['window']}")
+
+        # outputs of auxiliary collectors (e.g. sar), which can be specified by `--collectors` option
+        self.analyze_collectors()
+
+        # the timeseries derived in the same scope by a previous analysis is loaded instead of evaluating metrics again
+        scope = { "cpu_list": self.configs["cpu_list"], 
+                  "metrics": [ item["metric"] for item in self.metrics ], 
+                  "window": self.configs.get("window"), 
+                  "interval": self.configs.get("interval"), 
+                  "coverage_threshold": self.configs.get("coverage_threshold") }
+        self.timeseries, self.coverage = store.load_timeseries(scope)
+        if self.timeseries is None:
+            self.timeseries, self.coverage = self.analyze_raw_data(perf_raw_data)    # may raise `AnalyzerError`
+            # OS-level metrics are joined to the timeseries of perf on the common clock
+            self.timeseries = self.__join_os_metrics(self.timeseries)
+            store.save_timeseries(self.timeseries, self.coverage, scope)
 
-        # read the raw performance data file generated by `Profiler` and convert to DataFrame
-        perf_raw_data = pd.read_csv(os.path.join(self.test_dir, "perf_result"),
-                                    sep="\t",
-                                    header=None, 
-                                    names=["timestamp", "unit", "value", "metric"], 
-                                    usecols=[0, 1, 2, 4])
+        # break down metrics by cpus, physical cores or sockets, which can be specified by `--breakdown` option
+        for level in self.configs.get("breakdown", []):
+            self.__analyze_breakdown(perf_raw_data, level)    # may raise `AnalyzerError`
+
+    @staticmethod
+    def get_pass_dirs(test_dir: str) -> list:
+        """
+        Get the sub-directories of passes of multi-pass collection (`--multi-pass`) in the test directory. 
+        Only 'pass_<i>' for i below the number of passes recorded in the metadata (`hperf_meta.json`) are accepted, 
+        so that stale sub-directories (e.g. left on a remote SUT by an earlier run) are never merged. 
+        :param `test_dir`: a string of the path of test directory
+        :return: a list of paths of sub-directories 'pass_<i>' with raw performance data, ordered by the index of pass 
+        (empty if the raw performance data is collected in a single pass)
+        """
+        num_passes = None    # unknown for test directories without metadata
+        try:
+            with open(os.path.join(test_dir, "hperf_meta.json")) as f:
+                num_passes = json.load(f).get("num_passes")
+        except (IOError, ValueError):
+            pass
+
+        pass_indexes = []
+        for name in os.listdir(test_dir):
+            index = name[len(PASS_DIR_PREFIX):]
+            if not name.startswith(PASS_DIR_PREFIX) or not index.isdigit():
+                continue
+            if num_passes is not None and int(index) >= num_passes:
+                continue
+            if os.path.exists(os.path.join(test_dir, name, "perf_result")):
+                pass_indexes.append(int(index))
+        return [ os.path.join(test_dir, f"{PASS_DIR_PREFIX}{index}") for index in sorted(pass_indexes) ]
+
+    def merge_passes(self, pass_raw_data: list) -> pd.DataFrame:
+        """
+        Merge the raw performance data of passes of multi-pass collection into the raw performance data of a single run. 
+        Each pass runs the same workload with the pinned and other events and one multiplexed event group, 
+        so that the pinned and other events are taken from the first pass (the reference pass), 
+        and the events of the multiplexed group of each following pass are merged as follows: 
+        1. intervals are aligned by their ordinals, i.e. the i-th interval of a pass is mapped to the timestamp of 
+        the i-th interval of the reference pass, and intervals beyond the shortest pass are discarded, 
+        2. counts are normalized to the reference event (see `EventGroup.get_reference_event()`, e.g. instructions) 
+        in every interval, i.e. scaled by (count of the reference event in the reference pass) / (count in this pass), 
+        so that metrics relative to the reference event (e.g. MPKI) are preserved, 
+        while the variation of the progress of the workload between passes is compensated. 
+        :param `pass_raw_data`: a list of DataFrames of raw performance data of each pass returned by `.read_perf_result()`
+        :return: a DataFrame of merged raw performance data
+        :raises:
+            `AnalyzerError`: if there is no raw performance data in any pass
+        """
+        pass_raw_data = [ raw_data for raw_data in pass_raw_data if len(raw_data) > 0 ]
+        if len(pass_raw_data) == 0:
+            raise AnalyzerError("No raw performance data is collected in any pass.")
         
-        # rename 'unit' according to self.event_groups.events[..]['type']
-        # e.g. 'duration_time' is a system-wide event, where in each timestamp there is only a value (attribute to CPU0)
-        # timestamp | unit | value | metric         -> timestamp | unit   | value | metric
-        # 1.0000    | CPU0 | 1.001 | duration_time     1.0000    | system | 1.001 | duration_time
-        # 1.0000    | CPU0 | 12345 | cycles            1.0000    | CPU0   | 12345 | cycles
-        # 1.0000    | CPU1 | 23456 | cycles            1.0000    | CPU1   | 23456 | cycles
-        # ...
-        system_event_flag = False
-        socket_event_flag = False
+        # step 1. the timestamps of intervals of each pass, truncated to the shortest pass
+        pass_timestamps = [ np.sort(raw_data["timestamp"].unique()) for raw_data in pass_raw_data ]
+        n_intervals = min([ len(timestamps) for timestamps in pass_timestamps ])
+        if max([ len(timestamps) for timestamps in pass_timestamps ]) - n_intervals > 1:
+            self.logger.warning(f"the numbers of intervals of passes are different ({', '.join([ str(len(timestamps)) for timestamps in pass_timestamps ])}), "
+                                f"the workload may not be deterministic, only the first {n_intervals} intervals are merged")
+        reference_timestamps = pass_timestamps[0][:n_intervals]
 
-        def cpu2socket(x):
-            cpu_id = int(x["unit"][3:])
-            return "SOCKET" + str(self.cpu_topo.loc[self.cpu_topo.unit == cpu_id]["socket"].values[0])
+        reference_event = self.event_groups.get_reference_event()
+        if reference_event is None:
+            self.logger.warning("no event is pinned in every pass, counts of passes are merged without normalization")
 
-        for item in self.event_groups.events:
-            if "type" in item:
-                if item["type"] == "SYSTEM":
-                    perf_raw_data.loc[perf_raw_data.metric == item["perf_name"], ["unit"]] = "SYSTEM"
-                    system_event_flag = True
-                elif item["type"] == "SOCKET":
-                    # TODO: for some socket-wide events, such as events from SLC shared by a socket, perf will report its value 
-                    # attributed to a CPU in this socket.
-                    # e.g. SOCKET 0: CPU 0-15, 32-47 ... SOCKET 1: CPU 16-31, 48-63 ...
-                    # timestamp | unit  | value | metric
-                    # 1.0000    | CPU0  | 12345 | uncore_cha_xxx    // CPU0 -> SOCKET 0
-                    # 1.0000    | CPU16 | 23456 | uncore_cha_xxx    // CPU16 -> SOCKET 1
-                    # 1.0000    | CPU0  | 23456 | cycles
-                    # 1.0000    | CPU1  | 34567 | cycles
-                    # ... 
-                    # -------------- faulty --------------
-                    perf_raw_data.loc[perf_raw_data.metric == item["perf_name"], ["unit"]] \
-                        = perf_raw_data.loc[perf_raw_data.metric == item["perf_name"], ["unit"]].apply(cpu2socket, axis=1)
-                    socket_event_flag = True
-                    # -------------- faulty --------------
+        def get_reference_counts(raw_data: pd.DataFrame, ordinals: np.ndarray) -> np.ndarray:
+            """
+            Get the count of the reference event summed over all units in every interval of a pass. 
+            """
+            is_reference = (raw_data["metric"] == reference_event["perf_name"]).to_numpy()
+            return np.bincount(ordinals[is_reference], weights=np.nan_to_num(raw_data["value"].to_numpy()[is_reference]), minlength=n_intervals)
 
-        # in every timestamp, aggregate performance data for selected cpus (aggregate 'unit')
-        # timestamp | unit | value | metric -> timestamp | value=sum(value) | metric
+        # step 2. align intervals of each pass by ordinals, and normalize counts to the reference event
+        merged_raw_data = []
+        collected_events = set()
+        for pass_index, raw_data in enumerate(pass_raw_data):
+            ordinals = np.searchsorted(pass_timestamps[pass_index], raw_data["timestamp"].to_numpy())
+            raw_data = raw_data[ordinals < n_intervals]
+            ordinals = ordinals[ordinals < n_intervals]
+
+            if pass_index == 0:
+                if reference_event is not None:
+                    reference_counts = get_reference_counts(raw_data, ordinals)
+            else:
+                scale = np.ones(n_intervals)
+                if reference_event is not None:
+                    pass_counts = get_reference_counts(raw_data, ordinals)
+                    valid = (pass_counts > 0) & (reference_counts > 0)
+                    scale[valid] = reference_counts[valid] / pass_counts[valid]
+                # events which have been collected in previous passes (e.g. the pinned events) are taken from the reference pass
+                is_new = ~raw_data["metric"].isin(collected_events).to_numpy()
+                raw_data = raw_data[is_new].assign(timestamp=reference_timestamps[ordinals[is_new]], 
+                                                   value=raw_data["value"].to_numpy()[is_new] * scale[ordinals[is_new]])
+            collected_events |= set(raw_data["metric"].unique())
+            merged_raw_data.append(raw_data)
+        self.logger.debug(f"{len(pass_raw_data)} passes of {n_intervals} intervals are merged, normalized to "
+                          f"{reference_event['perf_name'] if reference_event is not None else 'none'}")
+
+        # categories of 'unit' and 'metric' (and 'cgroup') differ between passes, which are unified after concatenation
+        merged_raw_data = pd.concat(merged_raw_data, ignore_index=True)
+        for column in ("unit", "metric", "cgroup"):
+            if column in merged_raw_data.columns:
+                merged_raw_data[column] = merged_raw_data[column].astype(str).astype("category")
+        return merged_raw_data.sort_values("timestamp", kind="stable", ignore_index=True)
+
+    def analyze_collectors(self):
+        """
+        Read the outputs of auxiliary collectors in the test directory (see `collector.py`) 
+        and align them on the clock of perf: a column 'timestamp' (seconds since perf started) is inserted before the column of absolute time, 
+        so that they can be compared with the timeseries of perf directly. 
+        """
+        for name, collector_cls in COLLECTORS.items():
+            if name == "perf" or not collector_cls.has_results(self.source_dir):
+                continue
+            try:
+                results = collector_cls.read_results(self.source_dir)
+            except (ValueError, KeyError) as e:
+                self.logger.warning(f"fail to read the output of collector {name}: {e}")
+                continue
+            for result_name, result in results.items():
+                if len(result) == 0:
+                    continue
+                start_time = self.__get_start_time(result["time"].min())
+                result.insert(0, "timestamp", (result["time"] - start_time).dt.total_seconds())
+                self.collector_results[result_name] = result
+
+    def __get_start_time(self, sample_time: pd.Timestamp) -> pd.Timestamp:
+        """
+        Get the absolute time (UTC) when perf started from `perf_start_timestamp`, which is recorded in the local time of SUT. 
+        The UTC offset of SUT is recorded in `TIMEZONE_FILE` by the profiling script. 
+        For test directories without `TIMEZONE_FILE`, the offset is inferred from a sample of an auxiliary collector in UTC, 
+        since collectors start at the same time (see the start barrier in `Collector`) and UTC offsets are multiples of 15 minutes. 
+        :param `sample_time`: the absolute time (UTC) of the first sample of an auxiliary collector
+        :return: the absolute time (UTC) when perf started
+        """
+        if self.start_time is not None:
+            return self.start_time
+
+        with open(os.path.join(self.source_dir, "perf_start_timestamp")) as f:
+            local_start_time = pd.Timestamp(f.read().strip())
+
+        timezone_path = os.path.join(self.source_dir, TIMEZONE_FILE)
+        if os.path.exists(timezone_path):
+            with open(timezone_path) as f:
+                timezone = f.read().strip()    # e.g. '+0800'
+            sign = -1 if timezone.startswith("-") else 1
+            offset = sign * pd.Timedelta(hours=int(timezone[1:3]), minutes=int(timezone[3:5]))
+        else:
+            offset = (local_start_time - sample_time.tz_localize(None)).round("15min")
+            self.logger.debug(f"UTC offset of SUT is inferred as {offset}")
+
+        self.start_time = (local_start_time - offset).tz_localize("UTC")
+        return self.start_time
+
+    def __get_os_metrics(self) -> pd.DataFrame:
+        """
+        Derive OS-level metrics of the selected cpus from the outputs of sar (see `.analyze_collectors()`): 
+        - 'OS CPU UTILIZATION' (%): 100 - %idle, averaged over the selected cpus
+        - 'OS SOFTIRQ' (%): time spent servicing softirqs, averaged over the selected cpus (only if sar reports '%soft')
+        - 'NIC RX PACKETS PER SECOND' and 'NIC TX PACKETS PER SECOND': packet rates summed over all interfaces except loopback
+        :return: a DataFrame: timestamp | <OS metric> | ..., or `None` if there is no output of sar
+        """
+        os_metrics = []
+
+        if "sar_u" in self.collector_results:
+            sar_u = self.collector_results["sar_u"]
+            # use the row of all cpus if it is reported and all cpus are selected, otherwise average over the selected cpus
+            if self.configs["cpu_list"] == "all":
+                mask = (sar_u["CPU"] == -1) if (sar_u["CPU"] == -1).any() else (sar_u["CPU"] >= 0)
+            else:
+                mask = sar_u["CPU"].isin(self.configs["cpu_list"])
+            grouped = sar_u[mask].groupby("timestamp")
+            cpu_metrics = pd.DataFrame({ "OS CPU UTILIZATION": 100 - grouped["%idle"].mean() })
+            if "%soft" in sar_u.columns:
+                cpu_metrics["OS SOFTIRQ"] = grouped["%soft"].mean()
+            os_metrics.append(cpu_metrics)
+
+        if "sar_n_dev" in self.collector_results:
+            sar_n_dev = self.collector_results["sar_n_dev"]
+            grouped = sar_n_dev[sar_n_dev["IFACE"] != "lo"].groupby("timestamp")
+            os_metrics.append(pd.DataFrame({ "NIC RX PACKETS PER SECOND": grouped["rxpck/s"].sum(), 
+                                             "NIC TX PACKETS PER SECOND": grouped["txpck/s"].sum() }))
+
+        if len(os_metrics) == 0:
+            return None
+        return pd.concat(os_metrics, axis=1).sort_index().rename_axis("timestamp").reset_index()
+
+    def __join_os_metrics(self, timeseries: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join OS-level metrics (see `.__get_os_metrics()`) to the timeseries of perf by an as-of merge on the common clock. 
+        A sample of sar at time T covers the period (T - sar interval, T], 
+        so that an interval of perf ending at t is joined with the first sample of sar at or after t, within one sar interval. 
+        :param `timeseries`: a DataFrame of timeseries returned by `.analyze_raw_data()`
+        :return: a DataFrame of timeseries with OS-level metrics appended
+        """
+        os_metrics = self.__get_os_metrics()
+        if os_metrics is None or len(os_metrics) == 0:
+            return timeseries
+        sar_interval = float(np.median(np.diff(os_metrics["timestamp"]))) if len(os_metrics) > 1 else 1.0
+        return pd.merge_asof(timeseries, os_metrics, on="timestamp", direction="forward", tolerance=sar_interval)
+
+    def get_collector_results(self, to_csv: bool = False) -> dict:
+        """
+        Get the outputs of auxiliary collectors aligned on the clock of perf (see `.analyze_collectors()`). 
+        :param `to_csv`: if `True`, save each result to `timeseries_<result>.csv` in the test directory
+        :return: a dict of DataFrames keyed by the name of result, e.g. 'sar_u': timestamp | time | CPU | %user | ... 
+        """
+        if to_csv:
+            for result_name, result in self.collector_results.items():
+                result_path = os.path.join(self.test_dir, f"timeseries_{result_name}.csv")
+                result.to_csv(result_path, header=True, index=False)
+                self.logger.info(f"save the output of collector aligned on the clock of perf to CSV file: {result_path}")
+        return self.collector_results
+
+    @staticmethod
+    def is_aggregated(perf_raw_data: pd.DataFrame) -> bool:
+        """
+        Check if counts in the raw performance data are aggregated over all cpus by perf (see `perf_reader.read_perf_result()`). 
+        """
+        return list(perf_raw_data["unit"].cat.categories) == [AGGREGATED_UNIT]
+
+    def __select_units(self, perf_raw_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Remap units (see `.__remap_units()`) and select the rows of the cpus specified by `-c` option, 
+        as well as the rows of system-wide events and socket-wide events of the sockets these cpus belong to. 
+        :param `perf_raw_data`: a DataFrame of raw performance data returned by `.read_perf_result()`
+        :return: a DataFrame of selected raw performance data with remapped units
+        :raises:
+            `AnalyzerError`: if the raw performance data can not be handled
+        """
+        # when perf is attached to processes (`--pid`), counts have been aggregated over all cpus by perf
+        if self.is_aggregated(perf_raw_data):
+            if self.configs["cpu_list"] != "all":
+                raise AnalyzerError("Counts are aggregated over all cpus when perf is attached to processes, so that cpus can not be selected.")
+            return perf_raw_data
+
+        if self.cpu_to_socket is None:
+            self.__analyze_cpu_topo()
+
+        perf_raw_data = self.__remap_units(perf_raw_data)    # may raise `AnalyzerError`
+
+        # when perf counts for each cgroup (`--cgroup`), system-wide events (e.g. wall clock time) are duplicated for each cgroup
+        if "cgroup" in perf_raw_data.columns:
+            is_system = (perf_raw_data["unit"] == "SYSTEM").to_numpy()
+            perf_raw_data = perf_raw_data[~is_system | (perf_raw_data["cgroup"].cat.codes.to_numpy() == 0)]
+
+        # select rows of the specified cpus
         if self.configs["cpu_list"] == 'all':
-            scoped_raw_data = perf_raw_data.groupby(["timestamp", "metric"]).agg(
-                value=("value", np.sum)
-            ).reset_index()
+            selected_raw_data = perf_raw_data
         else:
             unit_list = [ f"CPU{i}" for i in self.configs["cpu_list"] ]
             # besides CPUs, there are also some system-wide and socket-wide events need to be added in 'unit_list'
             # e.g. CPU 0, 2, 4, 6 are specified, these 4 CPUs are belong to SOCKET0, so that SOCKET0 and SYSTEM should be added in 'unit_list'.
-            if system_event_flag:
-                unit_list.append("SYSTEM")
-            if socket_event_flag:
-                for i in self.configs["cpu_list"]:
-                    socket = f'SOCKET{self.cpu_topo.loc[self.cpu_topo.unit == i]["socket"].values[0]}'
-                    if socket not in unit_list:
-                        unit_list.append(socket)
+            unit_list.append("SYSTEM")
+            cpu_ids = np.array(self.configs["cpu_list"], dtype=np.int64)
+            cpu_ids = cpu_ids[cpu_ids < len(self.cpu_to_socket)]
+            for socket in np.unique(self.cpu_to_socket[cpu_ids]):
+                if socket >= 0:
+                    unit_list.append(f"SOCKET{socket}")
             self.logger.debug(f"Unit list: {unit_list}")
 
-            scoped_raw_data = perf_raw_data[perf_raw_data["unit"].isin(unit_list)].groupby(["timestamp", "metric"]).agg(
-                value=("value", np.sum)
-            ).reset_index()
+            selected_raw_data = perf_raw_data[perf_raw_data["unit"].isin(unit_list)]
+
+        return selected_raw_data
+
+    def analyze_raw_data(self, perf_raw_data: pd.DataFrame) -> tuple:
+        """
+        Aggregate the raw performance data for the selected cpus and evaluate metrics in every timestamp. 
+        This method can be applied to any subset of intervals, e.g. new intervals appended to `perf_result` during profiling (see `LiveAnalyzer`). 
+        :param `perf_raw_data`: a DataFrame of raw performance data returned by `.read_perf_result()`
+        :return: a tuple of 2 DataFrames: 
+        the timeseries: timestamp | <event> | ... | <event> | <metric> | ... | <metric> | MIN COVERAGE | LOW COVERAGE, 
+        and the coverage of events: timestamp | <event> | ... | <event>
+        where the coverage (%) is the percentage of time the event was actually running on the counter in the interval (see `.__get_coverage_columns()`)
+        :raises:
+            `AnalyzerError`: if the raw performance data can not be handled
+        """
+        # in every timestamp, aggregate performance data for selected cpus (aggregate 'unit')
+        # timestamp | unit | value | metric | coverage -> timestamp | value=sum(value) | metric | coverage=mean(coverage)
+        selected_raw_data = self.__select_units(perf_raw_data)    # may raise `AnalyzerError`
+
+        grouped_raw_data = selected_raw_data.groupby(["timestamp", "metric"], observed=True)
+        scoped_raw_data = pd.DataFrame({
+            "value": grouped_raw_data["value"].sum(min_count=1),    # keep `NaN` if the event is not counted on any selected unit
+            "coverage": grouped_raw_data["coverage"].mean()
+        }).reset_index()
 
         # rename event names used in perf by the generic event names defined by hperf
         # e.g. 
@@ -121,32 +493,225 @@ class Analyzer:
             mapping_perf_name_to_name[item["perf_name"]] = item["name"]
             mapping_name_to_id[item["name"]] = item["id"]
 
-        scoped_raw_data["metric"] = scoped_raw_data["metric"].apply(
-            lambda x: mapping_perf_name_to_name[x.split(":")[0]]
-        )
-
-        perf_timeseries = pd.DataFrame()    # for final results
-        # timestamp | <event> | ... | <event> | <metric> | ... | <metric>
-
-        timestamps = scoped_raw_data.groupby(["timestamp"]).groups.keys()    # get all timestamps
-
-        for t in timestamps:
-            metric_results = {}
-            metric_results["timestamp"] = t    # col. 0
-            
-            mapping_id_to_value = {}
-            for item in self.event_groups.events:
-                val = scoped_raw_data.query(f'metric=="{item["name"]}" & timestamp=={t}')["value"].iloc[0]
-                metric_results[item["name"]] = val    # col. event count
-                mapping_id_to_value[f"e{item['id']}"] = val
-                
-            for item in self.event_groups.metrics:
-                val = eval(item["expression"], mapping_id_to_value)
-                metric_results[item["metric"]] = val    # col. metric result
-            
-            perf_timeseries = pd.concat([perf_timeseries, pd.DataFrame(metric_results, index=[0])], ignore_index=True)
-        
-        self.timeseries = pd.concat([perf_timeseries], axis=1)
+        # modifiers of event names (e.g. 'cycles:D') have been removed by `read_perf_result()`, 
+        # and the mapping is applied to the categories of 'metric' rather than every row
+        scoped_raw_data["metric"] = scoped_raw_data["metric"].map(mapping_perf_name_to_name)
+        # events which are not defined in `EventGroup` (e.g. not required by the metrics of a re-analysis) are ignored
+        scoped_raw_data = scoped_raw_data.dropna(subset=["metric"])
+
+        # pivot the scoped raw data once into a matrix of (timestamp x event), 
+        # so that all metrics can be evaluated over whole columns instead of row by row
+        # timestamp | value | metric -> timestamp | <event> | ... | <event>
+        # 1.0000    | 12345 | CYCLES     1.0000    | 12345   | ... | 98765
+        # 1.0000    | 98765 | L1 ...     2.0000    | 23456   | ... | 87654
+        # ...
+        # events which are not collected (e.g. socket-wide events are excluded when perf is attached to processes) result in `NaN`
+        event_names = [ item["name"] for item in self.event_groups.events ]
+        event_matrix = scoped_raw_data.pivot(index="timestamp", columns="metric", values="value").reindex(columns=event_names)
+        coverage_matrix = scoped_raw_data.pivot(index="timestamp", columns="metric", values="coverage").reindex(columns=event_names)
+
+        columns = {}
+        mapping_id_to_values = {}
+        for item in self.event_groups.events:
+            values = event_matrix[item["name"]].to_numpy(dtype=np.float64)
+            if item["perf_name"] == "duration_time" and np.isnan(values).any():
+                values = np.where(np.isnan(values), self.__get_elapsed_time(event_matrix.index.to_numpy()), values)
+            columns[item["name"]] = values    # col. event count
+            mapping_id_to_values[item["id"]] = values
+
+        for item in self.metrics:
+            # metric expressions are compiled by `EventGroup` in advance, see `MetricExpression`
+            columns[item["metric"]] = self.event_groups.metric_expressions[item["metric"]](mapping_id_to_values)    # col. metric result
+
+        # timestamp | <event> | ... | <event>
+        coverage = coverage_matrix[[ item["name"] for item in self.event_groups.events ]]
+        coverage.columns = list(coverage.columns)
+        columns.update(self.__get_coverage_columns(coverage))
+
+        # timestamp | <event> | ... | <event> | <metric> | ... | <metric> | MIN COVERAGE | LOW COVERAGE
+        timeseries = pd.DataFrame(columns, index=event_matrix.index).rename_axis("timestamp").reset_index()
+        return timeseries, coverage.rename_axis("timestamp").reset_index()
+
+    def __get_elapsed_time(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Get the elapsed time (in nanoseconds) of each interval from the timestamps, 
+        which is used for the intervals where the wall clock time (perf event 'duration_time') is not counted, 
+        so that rates are always derived from the actual length of intervals rather than the nominal sampling interval. 
+        The length of the first interval is unknown from the timestamps, the sampling interval (`.interval`) is used instead. 
+        If the sampling interval is not specified, it is derived from the median of differences of timestamps. 
+        :param `timestamps`: a sorted NumPy array of unique timestamps (in seconds)
+        :return: a NumPy array of elapsed time (in nanoseconds) of each interval
+        """
+        if self.interval is None and len(timestamps) > 1:
+            self.interval = float(np.median(np.diff(timestamps)))
+            self.logger.debug(f"sampling interval derived from timestamps: {self.interval:.3f}s")
+        interval = self.interval if self.interval is not None else timestamps[0]
+        return np.diff(timestamps, prepend=timestamps[0] - interval) * 1e9
+
+    def __get_coverage_columns(self, coverage: pd.DataFrame) -> dict:
+        """
+        Since the number of events may exceed the number of available PMCs, events in different groups are multiplexed, 
+        and perf extrapolates the count of an event from the percentage of time it was actually running on the counter (coverage). 
+        This method flags intervals where any event ran below the coverage threshold (`--coverage-threshold`), 
+        in which case the derived metrics of the interval may be untrustworthy. 
+        :param `coverage`: a DataFrame of the coverage (%) of events: (timestamp x event)
+        :return: a dict of 2 columns: 'MIN COVERAGE' (the minimum coverage of all events in the interval) 
+        and 'LOW COVERAGE' (`True` if the minimum coverage is below the threshold)
+        """
+        min_coverage = coverage.min(axis=1).to_numpy()
+        threshold = self.configs.get("coverage_threshold", 20.0)
+        low_coverage = min_coverage < threshold
+        if low_coverage.any():
+            self.logger.warning(f"{low_coverage.sum()} intervals have events running below the coverage threshold ({threshold}%)")
+        return {
+            "MIN COVERAGE": min_coverage,
+            "LOW COVERAGE": low_coverage
+        }
+
+    def __analyze_breakdown(self, perf_raw_data: pd.DataFrame, level: str):
+        """
+        Evaluate metrics for each unit of the breakdown level instead of aggregating all selected cpus: 
+        - 'cpu': per logical cpu
+        - 'core': per physical core, aggregating hardware threads by the core id in `cpu_topo`
+        - 'socket': per socket
+        The raw performance data is accumulated into a cube of (timestamp x unit x event) by `np.bincount`, 
+        chunk by chunk of timestamps so that the memory usage is bounded by `BREAKDOWN_CHUNK_BYTES`. 
+        System-wide events (e.g. wall clock time) apply to every unit. Socket-wide events are attributed to their sockets, 
+        so that they are only available for the 'socket' level (`NaN` for other levels since they can not be split). 
+        The timeseries of each chunk is appended to `timeseries_<level>.csv` in the test directory, 
+        and the aggregated results of each unit are recorded in `.breakdown_metrics[level]`. 
+        :param `perf_raw_data`: a DataFrame of raw performance data returned by `.read_perf_result()`
+        :param `level`: 'cpu', 'core' or 'socket'
+        :raises:
+            `AnalyzerError`: if the raw performance data can not be handled
+        """
+        if self.is_aggregated(perf_raw_data):
+            raise AnalyzerError("Counts are aggregated over all cpus when perf is attached to processes, so that metrics can not be broken down.")
+        selected_raw_data = self.__select_units(perf_raw_data)    # may raise `AnalyzerError`
+        events = self.event_groups.events
+        n_events = len(events)
+
+        # step 1. determine the units of the breakdown level for the selected cpus
+        if self.configs["cpu_list"] == "all":
+            cpu_ids = np.flatnonzero(self.cpu_to_socket >= 0)
+        else:
+            cpu_ids = np.array(self.configs["cpu_list"], dtype=np.int64)
+            cpu_ids = cpu_ids[(cpu_ids < len(self.cpu_to_socket))]
+            cpu_ids = cpu_ids[self.cpu_to_socket[cpu_ids] >= 0]
+        sockets = self.cpu_to_socket[cpu_ids]
+        n_cores = self.cpu_to_core.max() + 1
+        if level == "cpu":
+            unit_keys = cpu_ids
+        elif level == "core":
+            if (self.cpu_to_core[cpu_ids] < 0).any():
+                raise AnalyzerError("Fail to break down by physical cores since core ids are unknown in the CPU topology.")
+            unit_keys = sockets * n_cores + self.cpu_to_core[cpu_ids]    # core ids may be duplicated in different sockets
+        elif level == "socket":
+            unit_keys = sockets
+        else:
+            raise AnalyzerError(f"Unsupported breakdown level: {level}")
+        unique_keys, cpu_to_unit_index = np.unique(unit_keys, return_inverse=True)
+        n_units = len(unique_keys)
+        if level == "cpu":
+            unit_columns = { "cpu": unique_keys }
+        elif level == "core":
+            unit_columns = { "socket": unique_keys // n_cores, "core": unique_keys % n_cores }
+        else:
+            unit_columns = { "socket": unique_keys }
+
+        # lookup arrays: cpu id -> unit index, socket id -> unit index (only for 'socket' level)
+        cpu_unit_index = np.full(len(self.cpu_to_socket), -1, dtype=np.int64)
+        cpu_unit_index[cpu_ids] = cpu_to_unit_index
+        socket_unit_index = np.full(self.cpu_to_socket.max() + 1, -1, dtype=np.int64)
+        if level == "socket":
+            socket_unit_index[unique_keys] = np.arange(n_units)
+
+        # step 2. map every row to (timestamp index, unit index, event index) by categories
+        unit_categories = selected_raw_data["unit"].cat.categories
+        category_unit_index = np.full(len(unit_categories), -1, dtype=np.int64)
+        category_is_system = np.zeros(len(unit_categories), dtype=bool)
+        for i, unit in enumerate(unit_categories):
+            if unit == "SYSTEM":
+                category_is_system[i] = True
+            elif unit.startswith("SOCKET"):
+                category_unit_index[i] = socket_unit_index[int(unit[6:])]
+            elif int(unit[3:]) < len(cpu_unit_index):
+                category_unit_index[i] = cpu_unit_index[int(unit[3:])]
+        mapping_perf_name_to_index = { item["perf_name"]: i for i, item in enumerate(events) }
+        metrics = selected_raw_data["metric"].astype("category")
+        category_event_index = np.array([ mapping_perf_name_to_index.get(x, -1) for x in metrics.cat.categories ], dtype=np.int64)
+
+        unit_codes = selected_raw_data["unit"].cat.codes.to_numpy()
+        row_unit = category_unit_index[unit_codes]
+        row_is_system = category_is_system[unit_codes]
+        row_event = category_event_index[metrics.cat.codes.to_numpy()]
+        row_value = selected_raw_data["value"].to_numpy(dtype=np.float64)
+        timestamps, row_timestamp = np.unique(selected_raw_data["timestamp"].to_numpy(), return_inverse=True)
+        order = np.argsort(row_timestamp, kind="stable")
+        system_event_indexes = [ i for i, item in enumerate(events) if item.get("type") == "SYSTEM" ]
+
+        # step 3. build the cube chunk by chunk of timestamps and evaluate metrics over whole columns
+        chunk_size = max(1, self.BREAKDOWN_CHUNK_BYTES // (n_units * n_events * 8))
+        breakdown_path = os.path.join(self.test_dir, f"timeseries_{level}.csv")
+        event_sums = np.zeros((n_units, n_events))
+        metric_sums = np.zeros((n_units, len(self.metrics)))
+        metric_counts = np.zeros((n_units, len(self.metrics)))
+        boundaries = np.searchsorted(row_timestamp[order], np.arange(0, len(timestamps) + chunk_size, chunk_size))
+        for chunk, t_start in enumerate(range(0, len(timestamps), chunk_size)):
+            n_t = min(chunk_size, len(timestamps) - t_start)
+            rows = order[boundaries[chunk]:boundaries[chunk + 1]]
+            t = row_timestamp[rows] - t_start
+            e = row_event[rows]
+            u = row_unit[rows]
+            v = row_value[rows]
+
+            # per-unit events: `NaN` if the event is not counted on the unit
+            mask = (e >= 0) & (u >= 0) & ~row_is_system[rows]
+            flat = (t[mask] * n_units + u[mask]) * n_events + e[mask]
+            sums = np.bincount(flat, weights=np.nan_to_num(v[mask]), minlength=n_t * n_units * n_events)
+            counts = np.bincount(flat, weights=~np.isnan(v[mask]), minlength=n_t * n_units * n_events)
+            cube = np.where(counts > 0, sums, np.nan).reshape(n_t, n_units, n_events)
+
+            # system-wide events: broadcast to every unit
+            mask = (e >= 0) & row_is_system[rows]
+            flat = t[mask] * n_events + e[mask]
+            sums = np.bincount(flat, weights=np.nan_to_num(v[mask]), minlength=n_t * n_events)
+            counts = np.bincount(flat, weights=~np.isnan(v[mask]), minlength=n_t * n_events)
+            system_matrix = np.where(counts > 0, sums, np.nan).reshape(n_t, n_events)
+            for i in system_event_indexes:
+                if events[i]["perf_name"] == "duration_time" and np.isnan(system_matrix[:, i]).any():
+                    elapsed_time = self.__get_elapsed_time(timestamps)[t_start:t_start + n_t]
+                    system_matrix[:, i] = np.where(np.isnan(system_matrix[:, i]), elapsed_time, system_matrix[:, i])
+                cube[:, :, i] = system_matrix[:, i][:, None]
+
+            # timestamp | <unit columns> | <event> | ... | <event> | <metric> | ... | <metric>
+            columns = { "timestamp": np.repeat(timestamps[t_start:t_start + n_t], n_units) }
+            for name, values in unit_columns.items():
+                columns[name] = np.tile(values, n_t)
+            mapping_id_to_values = {}
+            for i, item in enumerate(events):
+                columns[item["name"]] = mapping_id_to_values[item["id"]] = cube[:, :, i].reshape(-1)
+            for j, item in enumerate(self.metrics):
+                values = self.event_groups.metric_expressions[item["metric"]](mapping_id_to_values)
+                columns[item["metric"]] = values
+                values = values.reshape(n_t, n_units)
+                metric_sums[:, j] += np.nansum(values, axis=0)
+                metric_counts[:, j] += (~np.isnan(values)).sum(axis=0)
+            event_sums += np.nansum(cube, axis=0)
+
+            pd.DataFrame(columns).to_csv(breakdown_path, header=(chunk == 0), index=False, mode=("w" if chunk == 0 else "a"))
+
+        self.logger.info(f"save timeseries broken down by {level} to CSV file: {breakdown_path}")
+
+        # <unit columns> | <event> | ... | <event> | <metric> | ... | <metric>
+        # for events, get the sum of values in differenet timestamps; for metrics, get the average of values in different timestamps.
+        aggregated = dict(unit_columns)
+        for i, item in enumerate(events):
+            aggregated[item["name"]] = event_sums[:, i]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for j, item in enumerate(self.metrics):
+                aggregated[item["metric"]] = metric_sums[:, j] / metric_counts[:, j]
+        self.breakdown_metrics[level] = pd.DataFrame(aggregated)
 
     def get_timeseries(self, to_csv: bool = False) -> pd.DataFrame:
         """
@@ -160,7 +725,7 @@ class Analyzer:
     def get_timeseries_plot(self):
         """
         """
-        perf_metrics = [ item["metric"] for item in self.event_groups.metrics ]
+        perf_metrics = [ item["metric"] for item in self.metrics ]
         metrics = perf_metrics
         axes = self.timeseries.plot(x="timestamp", 
                                     y=metrics,
@@ -172,23 +737,64 @@ class Analyzer:
         fig.savefig(timeseries_plot_path)
         self.logger.info(f"timeseries figure saved in: {timeseries_plot_path}")
 
-    def get_aggregated_metrics(self, to_csv: bool = False) -> pd.DataFrame:
+    def get_breakdown_metrics(self, level: str, to_csv: bool = False) -> pd.DataFrame:
         """
+        Get the aggregated results of each unit of a breakdown level (see `.__analyze_breakdown()`). 
+        :param `level`: 'cpu', 'core' or 'socket'
+        :param `to_csv`: if `True`, save the results to `aggregated_metrics_<level>.csv` in the test directory
+        :return: a DataFrame: <unit columns> | <event> | ... | <event> | <metric> | ... | <metric>
         """
-        # use timeseries to get aggregated metrics.  
-        # for events, get the sum of values in differenet timestamps; for metrics, get the average of values in different timestamps. 
-        metric_results = {}
-        for item in self.event_groups.events:
-            sum = self.timeseries[item["name"]].sum()
-            metric_results[item["name"]] = sum
-        for item in self.event_groups.metrics:
-            avg = self.timeseries[item["metric"]].mean()
-            metric_results[item["metric"]] = avg
+        if to_csv:
+            breakdown_metrics_path = os.path.join(self.test_dir, f"aggregated_metrics_{level}.csv")
+            self.breakdown_metrics[level].to_csv(breakdown_metrics_path, header=True, index=False)
+            self.logger.info(f"save aggregated metrics broken down by {level} to CSV file: {breakdown_metrics_path}")
+        return self.breakdown_metrics[level]
 
-        self.aggregated_metrics = pd.DataFrame(metric_results, index=[0])
+    def get_aggregated_metrics(self, to_csv: bool = False) -> pd.DataFrame:
+        """
+        """
+        self.aggregated_metrics = self.aggregate_timeseries(self.timeseries, self.coverage, self.event_groups, self.metrics)
 
         if to_csv:
             aggregated_metrics_path = os.path.join(self.test_dir, "aggregated_metrics.csv")
             self.aggregated_metrics.to_csv(aggregated_metrics_path, header=True)
             self.logger.info(f"save aggregated metrics DataFrame to CSV file: {aggregated_metrics_path}")
         return self.aggregated_metrics
+
+    @staticmethod
+    def aggregate_timeseries(timeseries: pd.DataFrame, coverage_timeseries: pd.DataFrame, event_groups: EventGroup, metrics: list) -> pd.DataFrame:
+        """
+        Aggregate the timeseries over all intervals. 
+        This method is shared with `ClusterAnalyzer` for the timeseries aggregated over hosts. 
+        :param `timeseries`: a DataFrame of timeseries returned by `.analyze_raw_data()`
+        :param `coverage_timeseries`: a DataFrame of the coverage of events returned by `.analyze_raw_data()`
+        :param `event_groups`: an instance of `EventGroup`
+        :param `metrics`: a list of selected metrics (items of `EventGroup.metrics`)
+        :return: a DataFrame: (value | coverage | error) x (<event> | ... | <event> | <metric> | ... | <metric>)
+        """
+        # use timeseries to get aggregated metrics.  
+        # for events, get the sum of values in differenet timestamps; for metrics, get the average of values in different timestamps. 
+        # besides, estimate the reliability of each event and metric under multiplexing: 
+        # - coverage (%): for events, the average percentage of time the event was actually running on the counter; 
+        #   for metrics, the minimum coverage of the events which the metric depends on.
+        # - error: the fraction of the count extrapolated by perf instead of being measured (i.e. 1 - coverage / 100), 
+        #   which is an estimated upper bound of the relative error if the workload is not stable during the interval.
+        metric_results = {}
+        event_coverage = {}
+        for item in event_groups.events:
+            sum = timeseries[item["name"]].sum()
+            coverage = coverage_timeseries[item["name"]].mean()
+            metric_results[item["name"]] = [sum, coverage, 1 - coverage / 100]
+            event_coverage[item["id"]] = coverage
+        for item in metrics:
+            avg = timeseries[item["metric"]].mean()
+            dependencies = event_groups.metric_expressions[item["metric"]].dependencies
+            coverage = min([ event_coverage[event_id] for event_id in dependencies ], default=100.0)
+            metric_results[item["metric"]] = [avg, coverage, 1 - coverage / 100]
+        # OS-level metrics joined from auxiliary collectors are not measured by PMCs
+        for column in timeseries.columns:
+            if column not in metric_results and column.startswith(("OS ", "NIC ")):
+                metric_results[column] = [timeseries[column].mean(), np.nan, np.nan]
+
+        # (value | coverage | error) x (<event> | ... | <event> | <metric> | ... | <metric>)
+        return pd.DataFrame(metric_results, index=["value", "coverage", "error"])
@@ -4,7 +4,7 @@ events = [
     { "id": 1, "perf_name": "duration_time", "name": "WALL CLOCK TIME", "type": "SYSTEM" },
     { "id": 2, "perf_name": "cs", "name": "CONTEXT SWITCH" },
     # PMU - General
-    { "id": 20, "perf_name": "cycles", "name": "CYCLES" },
+    { "id": 20, "perf_name": "cycles", "name": "CYCLES", "fixed": 0 },    # PMCCNTR_EL0
     { "id": 21, "perf_name": "instructions", "name": "INSTRUCTIONS" },
     # PMU - Cache
     { "id": 30, "perf_name": "r01", "name": "L1I CACHE MISSES" },
@@ -17,8 +17,9 @@ events = [
     { "id": 100, "perf_name": "arm_cmn_0/hnf_cache_miss/", "name": "LL CACHE MISSES", "type": "SYSTEM" },
     { "id": 101, "perf_name": "arm_cmn_0/hnf_slc_sf_cache_access/", "name": "LL CACHE ACCESSES", "type": "SYSTEM" },
     # PMU - Branch
-    { "id": 40, "perf_name": "r22", "name": "BRANCH MISSES" }, 
-    { "id": 41, "perf_name": "r21", "name": "BRANCHES" },
+    # BR_MIS_PRED_RETIRED and BR_RETIRED are optional before Armv8.1, substituted by the speculative BR_MIS_PRED and BR_PRED
+    { "id": 40, "perf_name": "r22", "name": "BRANCH MISSES", "alternatives": ["r10"] }, 
+    { "id": 41, "perf_name": "r21", "name": "BRANCHES", "alternatives": ["r12"] },
     # PMU - TLB
     { "id": 50, "perf_name": "r35", "name": "ITLB WALKS" }, 
     { "id": 51, "perf_name": "r26", "name": "ITLB ACCESSES" },
@@ -59,38 +60,38 @@ event_groups = [
 
 metrics = [
     # General
-    { "metric": "CPU UTILIZATION", "expression": "e0 / (e1 / 1000000)" },
-    { "metric": "CPI", "expression": "e20 / e21" },
-    { "metric": "FREQUENCY", "expression": "e20 / (e1 / 1000000000)" },
+    { "metric": "CPU UTILIZATION", "category": "general", "expression": "e0 / (e1 / 1000000)" },
+    { "metric": "CPI", "category": "general", "expression": "e20 / e21" },
+    { "metric": "FREQUENCY", "category": "general", "expression": "e20 / (e1 / 1000000000)" },
     # Cache
-    { "metric": "L1I CACHE MPKI", "expression": "(1000 * e30) / e21" },
-    { "metric": "L1I CACHE MISS RATE", "expression": "e30 / e31" },
-    { "metric": "L1D CACHE MPKI", "expression": "(1000 * e32) / e21" },
-    { "metric": "L1D CACHE MISS RATE", "expression": "e32 / e33" },
-    { "metric": "L2 CACHE MPKI", "expression": "(1000 * e34) / e21" },
-    { "metric": "L2 CACHE MISS RATE", "expression": "e34 / e35" },
-    { "metric": "L3 CACHE MPKI", "expression": "(1000 * e100) / e21" },
-    { "metric": "L3 CACHE MISS RATE", "expression": "e100 / e101" },
+    { "metric": "L1I CACHE MPKI", "category": "cache", "expression": "(1000 * e30) / e21" },
+    { "metric": "L1I CACHE MISS RATE", "category": "cache", "expression": "e30 / e31" },
+    { "metric": "L1D CACHE MPKI", "category": "cache", "expression": "(1000 * e32) / e21" },
+    { "metric": "L1D CACHE MISS RATE", "category": "cache", "expression": "e32 / e33" },
+    { "metric": "L2 CACHE MPKI", "category": "cache", "expression": "(1000 * e34) / e21" },
+    { "metric": "L2 CACHE MISS RATE", "category": "cache", "expression": "e34 / e35" },
+    { "metric": "L3 CACHE MPKI", "category": "cache", "expression": "(1000 * e100) / e21" },
+    { "metric": "L3 CACHE MISS RATE", "category": "cache", "expression": "e100 / e101" },
     # Branch
-    { "metric": "BRANCH MPKI", "expression": "(1000 * e40) / e21" },
-    { "metric": "BRANCH MISS RATE", "expression": "e40 / e41" },
+    { "metric": "BRANCH MPKI", "category": "branch", "expression": "(1000 * e40) / e21" },
+    { "metric": "BRANCH MISS RATE", "category": "branch", "expression": "e40 / e41" },
     # TLB
-    { "metric": "ITLB MPKI", "expression": "(1000 * e50) / e21" },
-    { "metric": "DTLB MPKI", "expression": "(1000 * e52) / e21" },
-    { "metric": "ITLB WALK RATE", "expression": "e50 / e51" },
-    { "metric": "DTLB WALK RATE", "expression": "e52 / e53" },
+    { "metric": "ITLB MPKI", "category": "tlb", "expression": "(1000 * e50) / e21" },
+    { "metric": "DTLB MPKI", "category": "tlb", "expression": "(1000 * e52) / e21" },
+    { "metric": "ITLB WALK RATE", "category": "tlb", "expression": "e50 / e51" },
+    { "metric": "DTLB WALK RATE", "category": "tlb", "expression": "e52 / e53" },
     # Stall
-    { "metric": "FRONTEND STALL RATE", "expression": "e60 / e20" },
-    { "metric": "BACKEND STALL RATE", "expression": "e61 / e20" },
+    { "metric": "FRONTEND STALL RATE", "category": "stall", "expression": "e60 / e20" },
+    { "metric": "BACKEND STALL RATE", "category": "stall", "expression": "e61 / e20" },
     # Instruction Mix
-    { "metric": "LD PERCENTAGE", "expression": "e70 / e78" },
-    { "metric": "ST PERCENTAGE", "expression": "e71 / e78" },
-    { "metric": "ASE PERCENTAGE", "expression": "e72 / e78" },
-    { "metric": "VFP PERCENTAGE", "expression": "e73 / e78" },
-    { "metric": "DP PERCENTAGE", "expression": "e74 / e78" },
-    { "metric": "BR IMMED PERCENTAGE", "expression": "e75 / e78" },
-    { "metric": "BR INDIRECT", "expression": "e76 / e78" },
-    { "metric": "BR RETURN", "expression": "e77 / e78" }
+    { "metric": "LD PERCENTAGE", "category": "mix", "expression": "e70 / e78" },
+    { "metric": "ST PERCENTAGE", "category": "mix", "expression": "e71 / e78" },
+    { "metric": "ASE PERCENTAGE", "category": "mix", "expression": "e72 / e78" },
+    { "metric": "VFP PERCENTAGE", "category": "mix", "expression": "e73 / e78" },
+    { "metric": "DP PERCENTAGE", "category": "mix", "expression": "e74 / e78" },
+    { "metric": "BR IMMED PERCENTAGE", "category": "mix", "expression": "e75 / e78" },
+    { "metric": "BR INDIRECT", "category": "mix", "expression": "e76 / e78" },
+    { "metric": "BR RETURN", "category": "mix", "expression": "e77 / e78" }
 ]
 
 available_GP = 6
\ No newline at end of file
@@ -13,7 +13,8 @@ events = [
     {
         "id": 20,
         "perf_name": "cycles",
-        "name": "CYCLES"
+        "name": "CYCLES",
+        "fixed": 0    # PMCCNTR_EL0
     },
     {
         "id": 30,
@@ -38,12 +39,14 @@ events = [
     {
         "id": 35,
         "perf_name": "r21",
-        "name": "BRANCHES"
+        "name": "BRANCHES",
+        "alternatives": ["r12"]    # BR_PRED, if BR_RETIRED is not implemented
     },
     {
         "id": 36,
         "perf_name": "r22",
-        "name": "BRANCH MISSES"
+        "name": "BRANCH MISSES",
+        "alternatives": ["r10"]    # BR_MIS_PRED, if BR_MIS_PRED_RETIRED is not implemented
     }
 ]
 
@@ -58,30 +61,37 @@ event_groups = [
 metrics = [
     {
         "metric": "CPU UTILIZATION",
+        "category": "general",
         "expression": "e0 / (e1 / 1000000)"
     },
     {
         "metric": "FREQUENCY",
+        "category": "general",
         "expression": "e20 / (e1 / 1000000000)"
     },
     {
         "metric": "CPI",
+        "category": "general",
         "expression": "e20 / e30"
     },
     {
         "metric": "L1I CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e31) / e30"
     },
     {
         "metric": "L1D CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e32) / e30"
     },
     {
         "metric": "L2 CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e33) / e30"
     },
     {
         "metric": "BRANCH MISS RATE",
+        "category": "branch",
         "expression": "e36 / e35"
     }
 ]
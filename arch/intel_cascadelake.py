@@ -18,18 +18,24 @@ events = [
     {
         "id": 20,
         "perf_name": "cycles",
-        "name": "CYCLES"
+        "name": "CYCLES",
+        "fixed": 1
     },
     {
         "id": 21,
         "perf_name": "instructions",
-        "name": "INSTRUCTIONS"
+        "name": "INSTRUCTIONS",
+        "fixed": 0
     },
     {
         "id": 22,
         "perf_name": "ref-cycles",
-        "name": "REFERENCE CYCLES"
+        "name": "REFERENCE CYCLES",
+        "fixed": 2,
+        "counters": []
     },
+    # MEM_LOAD_RETIRED.* are restricted to counters 0-3 only when 8 general-purpose counters are available (SMT off), 
+    # which is no restriction with `available_GP = 4`
     {
         "id": 30,
         "perf_name": "r08d1",
@@ -69,30 +75,37 @@ event_groups = [
 metrics = [
     {
         "metric": "CPU UTILIZATION",
+        "category": "general",
         "expression": "e22 / e10"
     },
     {
         "metric": "FREQUENCY",
+        "category": "general",
         "expression": "e20 / (e1 / 1000000000)"
     },
     {
         "metric": "CPI",
+        "category": "general",
         "expression": "e20 / e21"
     },
     {
         "metric": "L1 CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e30) / e21"
     },
     {
         "metric": "L2 CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e31) / e21"
     },
     {
         "metric": "L3 CACHE MPKI",
+        "category": "cache",
         "expression": "(1000 * e32) / e21"
     },
     {
         "metric": "BRANCH MISS RATE",
+        "category": "branch",
         "expression": "e34 / e33"
     }
 ]
@@ -6,10 +6,13 @@ events = [
     # MSR
     { "id": 10, "perf_name": "msr/tsc/", "name": "TSC" },
     # PMU - General
-    { "id": 20, "perf_name": "cycles", "name": "CYCLES" },
-    { "id": 21, "perf_name": "instructions", "name": "INSTRUCTIONS" },
-    { "id": 22, "perf_name": "ref-cycles", "name": "REFERENCE CYCLES" },
+    #     'fixed': index of the dedicated fixed counter, 'counters': general-purpose counters the event is restricted to
+    { "id": 20, "perf_name": "cycles", "name": "CYCLES", "fixed": 1 },
+    { "id": 21, "perf_name": "instructions", "name": "INSTRUCTIONS", "fixed": 0 },
+    { "id": 22, "perf_name": "ref-cycles", "name": "REFERENCE CYCLES", "fixed": 2, "counters": [] },    # only on fixed counter
     # PMU - Cache
+    #     MEM_LOAD_RETIRED.* are restricted to counters 0-3 only when 8 general-purpose counters are available (SMT off), 
+    #     which is no restriction with `available_GP = 4`
     { "id": 30, "perf_name": "r08d1", "name": "L1 CACHE MISSES" },    # MEM_LOAD_RETIRED.L1_MISS
     { "id": 31, "perf_name": "r01d1", "name": "L1 CACHE HITS" },    # MEM_LOAD_RETIRED.L1_HIT
     { "id": 32, "perf_name": "r10d1", "name": "L2 CACHE MISSES" },    # MEM_LOAD_RETIRED.L2_MISS
@@ -43,28 +46,28 @@ event_groups = [
 
 metrics = [
     # General
-    { "metric": "CPU UTILIZATION", "expression": "e22 / e10" },
-    { "metric": "FREQUENCY", "expression": "e20 / (e1 / 1000000000)" },
-    { "metric": "CPI", "expression": "e20 / e21" },
+    { "metric": "CPU UTILIZATION", "category": "general", "expression": "e22 / e10" },
+    { "metric": "FREQUENCY", "category": "general", "expression": "e20 / (e1 / 1000000000)" },
+    { "metric": "CPI", "category": "general", "expression": "e20 / e21" },
     # Cache
-    { "metric": "L1 CACHE MPKI", "expression": "(1000 * e30) / e21" },
-    { "metric": "L1 CACHE MISS RATE", "expression": "e30 / (e30 + e31)" },
-    { "metric": "L2 CACHE MPKI", "expression": "(1000 * e32) / e21" },
-    { "metric": "L2 CACHE MISS RATE", "expression": "e32 / (e32 + e33)" },
+    { "metric": "L1 CACHE MPKI", "category": "cache", "expression": "(1000 * e30) / e21" },
+    { "metric": "L1 CACHE MISS RATE", "category": "cache", "expression": "e30 / (e30 + e31)" },
+    { "metric": "L2 CACHE MPKI", "category": "cache", "expression": "(1000 * e32) / e21" },
+    { "metric": "L2 CACHE MISS RATE", "category": "cache", "expression": "e32 / (e32 + e33)" },
     # LLC
-    { "metric": "LL CACHE MPKI", "expression": "(1000 * e100) / e21" },
-    { "metric": "LL CACHE MISS RATE", "expression": "e100 / e101" },
+    { "metric": "LL CACHE MPKI", "category": "cache", "expression": "(1000 * e100) / e21" },
+    { "metric": "LL CACHE MISS RATE", "category": "cache", "expression": "e100 / e101" },
     # Memory
-    { "metric": "MEM BANDWITH RD", "expression": "(e110 * 64) / (e1 / 1000000000)" },
-    { "metric": "MEM BANDWITH WR", "expression": "(e111 * 64) / (e1 / 1000000000)" },
-    { "metric": "MEM BANDWITH", "expression": "((e110 + e111) * 64) / (e1 / 1000000000)"},
+    { "metric": "MEM BANDWITH RD", "category": "memory", "expression": "(e110 * 64) / (e1 / 1000000000)" },
+    { "metric": "MEM BANDWITH WR", "category": "memory", "expression": "(e111 * 64) / (e1 / 1000000000)" },
+    { "metric": "MEM BANDWITH", "category": "memory", "expression": "((e110 + e111) * 64) / (e1 / 1000000000)"},
     # Branch
-    { "metric": "BRANCH MPKI", "expression": "(1000 * e40) / e21" },
-    { "metric": "BRANCH MISS RATE", "expression": "e40 / e41" },
+    { "metric": "BRANCH MPKI", "category": "branch", "expression": "(1000 * e40) / e21" },
+    { "metric": "BRANCH MISS RATE", "category": "branch", "expression": "e40 / e41" },
     # TLB
-    { "metric": "ITLB MPKI", "expression": "(1000 * e50) / e21" },
-    { "metric": "DTLB MPKI", "expression": "(1000 * (e51 + e52)) / e21" },
-    { "metric": "DTLB WALK RATE", "expression": "(e51 + e52) / e53" },
+    { "metric": "ITLB MPKI", "category": "tlb", "expression": "(1000 * e50) / e21" },
+    { "metric": "DTLB MPKI", "category": "tlb", "expression": "(1000 * (e51 + e52)) / e21" },
+    { "metric": "DTLB WALK RATE", "category": "tlb", "expression": "(e51 + e52) / e53" },
 ]
 
 available_GP = 4
\ No newline at end of file
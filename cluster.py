@@ -0,0 +1,366 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from connector import RemoteConnector
+from sut import SUT, SUTCache
+from event_group import EventGroup
+from profiler import Profiler
+from analyzer import Analyzer
+from hperf_exception import ProfilerError, AnalyzerError
+
+
+class Host:
+    """
+    `Host` holds the instances used for profiling and analyzing a single SUT in a cluster.
+    """
+
+    def __init__(self, name: str, test_dir: str, configs: dict) -> None:
+        """
+        Constructor of `Host`.
+        :param `name`: the name of the host, which is also the name of its sub-directory in the test directory
+        :param `test_dir`: a string of the path of (local) test directory of the host
+        :param `configs`: a dict of parsed configurations for the host (with its 'hostname', 'username', 'port' and 'key_filename')
+        """
+        self.name: str = name
+        self.test_dir: str = test_dir
+        self.configs: dict = configs
+
+        self.connector: RemoteConnector = None
+        self.sut: SUT = None
+        self.event_groups: EventGroup = None
+        self.profiler: Profiler = None
+        self.analyzer: Analyzer = None
+
+
+class Cluster:
+    """
+    `Cluster` is responsible for profiling multiple remote SUTs with one command (`--hosts` or `--hosts-file` option).
+    Discovery, event grouping and profiling are conducted concurrently on all hosts,
+    profiling starts on all hosts at the same time, and results are pulled in parallel.
+    The results of each host are saved in its sub-directory of the test directory,
+    and the results aggregated over hosts are saved in the test directory (see `ClusterAnalyzer`).
+    ```
+    <test_dir>/
+    |- <host>/                  // the same layout as the test directory of a single SUT
+    |- ...
+    |- timeseries.csv           // aggregated over hosts
+    |- aggregated_metrics.csv   // aggregated over hosts
+    |- aggregated_metrics_hosts.csv    // aggregated metrics of each host
+    ```
+    If a host fails, it is excluded from the following steps and the remaining hosts continue.
+    """
+
+    def __init__(self, test_dir: str, configs: dict) -> None:
+        """
+        Constructor of `Cluster`.
+        :param `test_dir`: a string of the path of (local) test directory for this run
+        :param `configs`: a dict of parsed configurations, where `configs["hosts"]` is a list of dicts with keys
+        'hostname', 'username', 'port' and 'key_filename'
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.test_dir: str = test_dir
+        self.configs: dict = configs
+
+        self.hosts: list = []
+        for host_configs in configs["hosts"]:
+            name = host_configs["hostname"]
+            configs_of_host = { key: value for key, value in configs.items() if key != "hosts" }
+            configs_of_host.update(host_configs)
+            configs_of_host["host_type"] = "remote"
+            self.hosts.append(Host(name, os.path.join(test_dir, name), configs_of_host))
+
+        self.analyzer: ClusterAnalyzer = None
+
+    def __run_on_hosts(self, step: str, func):
+        """
+        Run a function for all active hosts concurrently, and exclude the hosts which fail.
+        :param `step`: the description of the step for logging
+        :param `func`: a function with a parameter of `Host`, its returned value is ignored
+        :raises:
+            `ProfilerError`: if the function fails for all hosts
+        """
+        with ThreadPoolExecutor(max_workers=len(self.hosts)) as executor:
+            tasks = { executor.submit(func, host): host for host in self.hosts }
+            wait(tasks)
+        failed_hosts = []
+        for task, host in tasks.items():
+            if task.exception() is not None:
+                self.logger.error(f"{step} failed on host {host.name}: {task.exception()}")
+                failed_hosts.append(host)
+        self.__exclude(failed_hosts)
+        if len(self.hosts) == 0:
+            raise ProfilerError(f"{step.capitalize()} failed on all hosts.")
+
+    def __exclude(self, hosts: list):
+        """
+        Exclude the hosts from the following steps and close their connections.
+        """
+        for host in hosts:
+            if host.connector:
+                host.connector.close()
+            self.hosts.remove(host)
+
+    def connect(self):
+        """
+        Create the test directories and connect to all hosts concurrently.
+        :raises:
+            `ProfilerError`: if fail to connect to all hosts
+        """
+        def connect_host(host: Host):
+            os.makedirs(host.test_dir, exist_ok=True)
+            host.connector = RemoteConnector(host.test_dir,
+                                             hostname=host.configs["hostname"],
+                                             username=host.configs["username"],
+                                             port=host.configs["port"],
+                                             key_filename=host.configs["key_filename"],
+                                             interactive="non_interactive" not in host.configs)    # may raise `ConnectorError`
+            self.logger.debug(f"connected to host {host.name}, local test directory: {host.test_dir}")
+
+        self.__run_on_hosts("connection", connect_host)
+
+    def discover(self, sut_cache: SUTCache = None):
+        """
+        Discover the SUTs and determine the event groups of all hosts concurrently.
+        :param `sut_cache`: an instance of `SUTCache` (optional)
+        :raises:
+            `ProfilerError`: if discovery fails on all hosts
+        """
+        def discover_host(host: Host):
+            host.sut = SUT.discover(host.connector, sut_cache)    # may raise `ConnectorError`
+            host.sut.save(host.test_dir)
+            host.event_groups = EventGroup(host.sut, host.configs.get("metrics"))    # may raise `EventGroupError`
+            if "no_probe" not in host.configs:
+                host.event_groups.probe_capabilities(host.connector)    # may raise `ConnectorError` and `EventGroupError`
+            if sut_cache:
+                sut_cache.save(host.sut)
+            host.profiler = Profiler(host.connector, host.configs, host.event_groups, host.sut)
+            self.__save_metadata(host)
+
+        self.__run_on_hosts("discovery", discover_host)
+
+    def __save_metadata(self, host: Host):
+        """
+        Save the metadata of the host in its test directory (`hperf_meta.json`),
+        so that the results of each host can be re-analyzed separately.
+        """
+        metadata = host.event_groups.get_metadata()
+        metadata["configs"] = host.configs
+        metadata["num_passes"] = 0    # multi-pass collection is not available for multiple hosts
+        metadata_path = os.path.join(host.test_dir, "hperf_meta.json")
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        self.logger.debug(f"save metadata of host {host.name}: {metadata_path}")
+
+    def sanity_check(self) -> bool:
+        """
+        Run sanity check on all hosts (see `Profiler.sanity_check()`).
+        :return: `True` if all hosts pass the sanity check
+        """
+        passed = True
+        for host in self.hosts:
+            if not host.profiler.sanity_check():
+                self.logger.warning(f"sanity check failed on host {host.name}")
+                passed = False
+        return passed
+
+    def profile(self):
+        """
+        Profile all hosts concurrently.
+        Profiling starts on all hosts at the same time by a barrier shared by `Profiler`s,
+        if profiling fails on any host before start, it is aborted on all hosts.
+        :raises:
+            `ProfilerError`: if profiling fails on all hosts
+        """
+        start_barrier = threading.Barrier(len(self.hosts))
+
+        def profile_host(host: Host):
+            try:
+                host.profiler.profile(start_barrier=start_barrier)
+            except Exception:
+                start_barrier.abort()
+                raise
+
+        self.logger.info(f"start profiling on {len(self.hosts)} hosts")
+        with ThreadPoolExecutor(max_workers=len(self.hosts)) as executor:
+            tasks = { executor.submit(profile_host, host): host for host in self.hosts }
+            try:
+                wait(tasks)
+            except KeyboardInterrupt:
+                # e.g. when perf is attached to processes without a workload, it runs until the user presses Ctrl-C
+                self.logger.info("interrupted, stop profiling")
+                start_barrier.abort()
+                for host in self.hosts:
+                    host.profiler.stop()
+                wait(tasks)
+
+        failed_hosts = []
+        for task, host in tasks.items():
+            if task.exception() is not None:
+                self.logger.error(f"profiling failed on host {host.name}: {task.exception()}")
+                failed_hosts.append(host)
+        self.__exclude(failed_hosts)
+        if len(self.hosts) == 0:
+            raise ProfilerError("Profiling failed on all hosts.")
+
+    def analyze(self):
+        """
+        Analyze the raw performance data of each host, then aggregate the results over hosts.
+        :raises:
+            `AnalyzerError`: if analysis fails on all hosts
+        """
+        failed_hosts = []
+        for host in self.hosts:
+            self.logger.info(f"analyze the results of host {host.name}")
+            try:
+                host.analyzer = Analyzer(host.test_dir, host.configs, host.event_groups)
+                host.analyzer.analyze()
+                host.analyzer.get_timeseries(to_csv=True)
+                host.analyzer.get_aggregated_metrics(to_csv=True)
+                for level in host.configs.get("breakdown", []):
+                    host.analyzer.get_breakdown_metrics(level, to_csv=True)
+                host.analyzer.get_collector_results(to_csv=True)
+            except Exception as e:
+                self.logger.error(f"analysis failed on host {host.name}: {e}")
+                failed_hosts.append(host)
+        self.__exclude(failed_hosts)
+        if len(self.hosts) == 0:
+            raise AnalyzerError("Analysis failed on all hosts.")
+
+        self.analyzer = ClusterAnalyzer(self.test_dir, self.configs, self.hosts)
+        self.analyzer.analyze()
+
+    def close(self):
+        """
+        Close the connections to all hosts.
+        """
+        for host in self.hosts:
+            if host.connector:
+                host.connector.close()
+
+
+class ClusterAnalyzer:
+    """
+    `ClusterAnalyzer` is responsible for aggregating the timeseries of multiple hosts analyzed by `Analyzer`.
+    Since profiling starts on all hosts at the same time, the i-th interval of all hosts are aligned,
+    and only intervals reported by all hosts are kept. In each interval:
+    - events are summed over hosts, except the events of 'SYSTEM' type (e.g. wall clock time) which are averaged,
+    - metrics are evaluated from the aggregated events, e.g. memory bandwidth of the cluster, CPI of the cluster,
+    - OS-level metrics are averaged (utilization) or summed (packet rates) over hosts.
+    Metrics are only available if all hosts share the same architecture, otherwise only events are aggregated.
+    """
+
+    def __init__(self, test_dir: str, configs: dict, hosts: list) -> None:
+        """
+        Constructor of `ClusterAnalyzer`.
+        :param `test_dir`: a string of the path of (local) test directory for this run
+        :param `configs`: a dict of parsed configurations
+        :param `hosts`: a list of `Host`s whose `.analyzer` has analyzed the results
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.test_dir: str = test_dir
+        self.configs: dict = configs
+        self.hosts: list = hosts
+
+        self.timeseries: pd.DataFrame = None
+        self.coverage: pd.DataFrame = None
+        self.aggregated_metrics: pd.DataFrame = None
+        self.host_metrics: pd.DataFrame = None    # aggregated metrics of each host: host x (<event> | ... | <metric> | ...)
+
+    def analyze(self):
+        """
+        Aggregate the timeseries over hosts, then aggregate them over all intervals.
+        """
+        event_groups = self.hosts[0].event_groups
+        metrics = self.hosts[0].analyzer.metrics
+        if any(host.event_groups.arch != event_groups.arch for host in self.hosts):
+            self.logger.warning("hosts have different architectures, only common events are aggregated over hosts")
+            metrics = []
+        event_names = [ item["name"] for item in event_groups.events
+                        if all(item["name"] in host.analyzer.timeseries.columns for host in self.hosts) ]
+        system_events = [ item["name"] for item in event_groups.events if item.get("type") == "SYSTEM" ]
+        os_metrics = [ column for column in self.hosts[0].analyzer.timeseries.columns
+                       if column.startswith(("OS ", "NIC "))
+                       and all(column in host.analyzer.timeseries.columns for host in self.hosts) ]
+
+        # host | interval | timestamp | <event> | ... | <OS metric> | ...
+        frames = []
+        coverage_frames = []
+        for host in self.hosts:
+            index = np.arange(len(host.analyzer.timeseries))
+            frames.append(host.analyzer.timeseries[["timestamp"] + event_names + os_metrics].assign(interval=index))
+            coverage_frames.append(host.analyzer.coverage[event_names].assign(interval=index))
+        stacked = pd.concat(frames, ignore_index=True)
+        stacked_coverage = pd.concat(coverage_frames, ignore_index=True)
+
+        # keep the intervals reported by all hosts, e.g. the last interval may be missing on some hosts
+        grouped = stacked.groupby("interval")
+        complete = grouped.size() == len(self.hosts)
+        aggregation = { "timestamp": "mean" }
+        for column in event_names:
+            aggregation[column] = "mean" if column in system_events else "sum"
+        for column in os_metrics:
+            aggregation[column] = "sum" if column.startswith("NIC ") else "mean"
+        aggregated = grouped.agg(aggregation)[complete]
+        coverage = stacked_coverage.groupby("interval").mean()[complete]
+
+        columns = { column: aggregated[column].to_numpy() for column in aggregated.columns }
+        mapping_id_to_values = { item["id"]: columns[item["name"]] for item in event_groups.events if item["name"] in columns }
+        for item in metrics:
+            columns[item["metric"]] = event_groups.metric_expressions[item["metric"]](mapping_id_to_values)
+        min_coverage = coverage.min(axis=1).to_numpy()
+        columns["MIN COVERAGE"] = min_coverage
+        columns["LOW COVERAGE"] = min_coverage < self.configs.get("coverage_threshold", 20.0)
+
+        self.timeseries = pd.DataFrame(columns).reset_index(drop=True)
+        self.coverage = coverage.reset_index(drop=True)
+        self.logger.debug(f"{len(self.timeseries)} intervals are aggregated over {len(self.hosts)} hosts")
+
+        # `.aggregate_timeseries()` requires all events of `EventGroup`, events which are not common are `NaN`
+        timeseries = self.timeseries.reindex(columns=list(self.timeseries.columns) +
+                                             [ item["name"] for item in event_groups.events if item["name"] not in event_names ])
+        coverage = self.coverage.reindex(columns=[ item["name"] for item in event_groups.events ])
+        self.aggregated_metrics = Analyzer.aggregate_timeseries(timeseries, coverage, event_groups, metrics)
+
+        self.host_metrics = pd.DataFrame({ host.name: host.analyzer.aggregated_metrics.loc["value"] for host in self.hosts }).T
+
+    def get_timeseries(self, to_csv: bool = False) -> pd.DataFrame:
+        """
+        Get the timeseries aggregated over hosts.
+        :param `to_csv`: if `True`, save the timeseries to `timeseries.csv` in the test directory
+        :return: a DataFrame: timestamp | <event> | ... | <OS metric> | ... | <metric> | ... | MIN COVERAGE | LOW COVERAGE
+        """
+        if to_csv:
+            timeseries_path = os.path.join(self.test_dir, "timeseries.csv")
+            self.timeseries.to_csv(timeseries_path, header=True)
+            self.logger.info(f"save timeseries aggregated over hosts to CSV file: {timeseries_path}")
+        return self.timeseries
+
+    def get_aggregated_metrics(self, to_csv: bool = False) -> pd.DataFrame:
+        """
+        Get the metrics aggregated over hosts and intervals.
+        :param `to_csv`: if `True`, save the results to `aggregated_metrics.csv` in the test directory
+        :return: a DataFrame: (value | coverage | error) x (<event> | ... | <event> | <metric> | ... | <metric>)
+        """
+        if to_csv:
+            aggregated_metrics_path = os.path.join(self.test_dir, "aggregated_metrics.csv")
+            self.aggregated_metrics.to_csv(aggregated_metrics_path, header=True)
+            self.logger.info(f"save aggregated metrics over hosts to CSV file: {aggregated_metrics_path}")
+        return self.aggregated_metrics
+
+    def get_host_metrics(self, to_csv: bool = False) -> pd.DataFrame:
+        """
+        Get the aggregated metrics of each host side by side.
+        :param `to_csv`: if `True`, save the results to `aggregated_metrics_hosts.csv` in the test directory
+        :return: a DataFrame: host x (<event> | ... | <event> | <metric> | ... | <metric>)
+        """
+        if to_csv:
+            host_metrics_path = os.path.join(self.test_dir, "aggregated_metrics_hosts.csv")
+            self.host_metrics.to_csv(host_metrics_path, header=True, index_label="host")
+            self.logger.info(f"save aggregated metrics of each host to CSV file: {host_metrics_path}")
+        return self.host_metrics
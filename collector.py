@@ -0,0 +1,273 @@
+import os
+import re
+import logging
+import numpy as np
+import pandas as pd
+from event_group import EventGroup
+from hperf_exception import ProfilerError
+
+
+# files in the test directory for synchronizing collectors:
+# every collector waits for `START_FILE` before collecting, and auxiliary collectors stop after `STOP_FILE` is created.
+START_FILE = ".start"
+STOP_FILE = ".stop"
+# the pid of perf, to which `Profiler` sends SIGINT to stop profiling (e.g. when the user presses Ctrl-C)
+PERF_PID_FILE = "perf_pid"
+# the UTC offset of the SUT (e.g. '+0800'), since start timestamps are recorded in local time
+TIMEZONE_FILE = "timezone"
+# for multi-pass collection (`--multi-pass`), the outputs of the i-th pass are saved in the sub-directory 'pass_<i>'
+PASS_DIR_PREFIX = "pass_"
+
+
+class Collector:
+    """
+    `Collector` is the base class of collectors of raw performance data, which are run concurrently by `Profiler` on SUT.
+    Each collector generates a shell script which:
+    1. waits for the start barrier (`START_FILE` created by `Profiler`),
+    2. records its start timestamp in `<name>_start_timestamp`,
+    3. collects data and writes its own timestamped output in the test directory.
+    `perf` runs the workload and creates `STOP_FILE` when the workload finishes, then auxiliary collectors stop.
+    The output of each collector is read by `Analyzer` and aligned on the clock of perf (see `Analyzer.analyze_collectors()`).
+    """
+    name: str = None
+
+    def __init__(self, configs: dict, event_groups: EventGroup, pass_index: int = None) -> None:
+        """
+        Constructor of `Collector`
+        :param `configs`: a dict of parsed configurations (the member `configs` in `Controller`)
+        :param `event_groups`: an instance of `EventGroup`
+        :param `pass_index`: the index of pass for multi-pass collection (`--multi-pass`), `None` for a single pass
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.configs: dict = configs
+        self.event_groups: EventGroup = event_groups
+        self.pass_index: int = pass_index
+
+    def get_script(self, output_dir: str) -> str:
+        """
+        Generate the string of shell script for this collector.
+        :param `output_dir`: the path of test directory on SUT
+        :return: a string of shell script
+        """
+        script = "#!/bin/bash\n"
+        script += f'TMP_DIR={output_dir}\n'
+        # if profiling is aborted before it starts (e.g. Ctrl-C while waiting for the trigger), the stop barrier is created instead
+        script += f'while [ ! -e "$TMP_DIR"/{START_FILE} ]; do [ -e "$TMP_DIR"/{STOP_FILE} ] && exit 0; sleep 0.01; done\n'
+        script += f'date +%Y-%m-%d" "%H:%M:%S.%N | cut -b 1-23 > "$TMP_DIR"/{self.name}_start_timestamp\n'
+        script += self.get_collect_script()
+        return script
+
+    def get_collect_script(self) -> str:
+        """
+        Generate the part of shell script which collects data after the start barrier.
+        `TMP_DIR` is defined as the path of test directory on SUT.
+        """
+        pass
+
+    @classmethod
+    def has_results(cls, test_dir: str) -> bool:
+        """
+        Check if the output of this collector exists in the test directory.
+        """
+        return os.path.exists(os.path.join(test_dir, f"{cls.name}_start_timestamp"))
+
+    @classmethod
+    def read_results(cls, test_dir: str) -> dict:
+        """
+        Read the output of this collector in the test directory.
+        :param `test_dir`: a string of the path of test directory
+        :return: a dict of DataFrames keyed by the name of result,
+        each DataFrame has a column 'time' of absolute timestamps in UTC, followed by columns of values
+        """
+        return {}
+
+    def get_interval_seconds(self) -> float:
+        """
+        :return: the sampling interval (in seconds) specified by `-I/--interval` option
+        """
+        return self.configs.get("interval", 1000) / 1000
+
+
+class PerfCollector(Collector):
+    """
+    `PerfCollector` runs the workload under `perf stat` in interval mode.
+    By default, perf counts system-wide for each cpu. It can also be attached to running processes (`--pid`), 
+    or count system-wide for each cgroup (`--cgroup`), where socket-wide events are excluded since they can not be attributed. 
+    If no workload is specified in these modes, perf runs until it receives SIGINT (see `PERF_PID_FILE`) 
+    or the capture window (`--duration`, `--max-intervals`) ends. 
+    Its output is read by `Analyzer` itself (see `perf_reader.read_perf_result()`).
+    """
+    name = "perf"
+
+    def get_collect_script(self) -> str:
+        if "pid" in self.configs:
+            target = f'-p {",".join(str(pid) for pid in self.configs["pid"])}'
+            excluded_types = ["SOCKET"]
+        elif "cgroup" in self.configs:
+            target = f'-A -a --for-each-cgroup {",".join(self.configs["cgroup"])}'
+            excluded_types = ["SOCKET"]
+        else:
+            target = '-A -a'
+            excluded_types = []
+        command = self.configs.get("command", "")
+
+        # capture window: skip the warm-up by `--delay`, and stop after `--max-intervals` intervals 
+        # or `--duration` seconds (counted after the delay) by sending SIGINT to perf
+        window_options = ""
+        if "delay" in self.configs:
+            window_options += f' -D {round(self.configs["delay"] * 1000)}'
+        if "max_intervals" in self.configs:
+            window_options += f' --interval-count {self.configs["max_intervals"]}'
+        timeout = ""
+        if "duration" in self.configs:
+            timeout = f'timeout -s INT {self.configs.get("delay", 0) + self.configs["duration"]} '
+
+        script = 'perf_result="$TMP_DIR"/perf_result\n'
+        script += 'perf_error="$TMP_DIR"/perf_error\n'
+        script += f'date +%z > "$TMP_DIR"/{TIMEZONE_FILE}\n'
+        # perf runs in background so that its pid can be recorded, and `Profiler` can stop it by SIGINT, 
+        # while the script itself ignores SIGINT to notify auxiliary collectors after perf exits
+        script += "trap '' INT\n"
+        script += f'3>"$perf_result" {timeout}perf stat -e {self.event_groups.get_event_groups_str(excluded_types, self.pass_index)} {target} -x "\t" -I {self.configs.get("interval", 1000)}{window_options} --log-fd 3 {command} 2>"$perf_error" &\n'
+        script += 'perf_pid=$!\n'
+        script += f'echo $perf_pid > "$TMP_DIR"/{PERF_PID_FILE}\n'
+        script += 'wait $perf_pid\n'
+        script += 'ret_code=$?\n'
+        if timeout:
+            # `timeout` forwards SIGINT to perf, and exits with 124 when the duration expires
+            script += '[ $ret_code -eq 124 ] && ret_code=0\n'
+        script += f'touch "$TMP_DIR"/{STOP_FILE}\n'
+        script += 'exit $ret_code\n'
+        return script
+
+
+class SarCollector(Collector):
+    """
+    `SarCollector` collects CPU utilization (`sar -u ALL -P ALL`) and network statistics (`sar -n DEV`) by sysstat.
+    The sampling interval of sar is at least 1 second.
+    """
+    name = "sar"
+
+    def get_collect_script(self) -> str:
+        interval = max(1, round(self.get_interval_seconds()))
+        script = 'sar_binary="$TMP_DIR"/sar.log\n'
+        script += f'sar -A -o "$sar_binary" {interval} > /dev/null 2>&1 &\n'
+        script += 'sar_pid=$!\n'
+        script += f'while [ ! -e "$TMP_DIR"/{STOP_FILE} ]; do sleep 0.1; done\n'
+        script += 'kill -INT $sar_pid\n'
+        script += 'wait $sar_pid\n'
+        script += 'sadf -d "$sar_binary" -- -u ALL -P ALL | sed \'s/;/,/g\' > "$TMP_DIR"/sar_u\n'
+        script += 'sadf -d "$sar_binary" -- -n DEV | sed \'s/;/,/g\' > "$TMP_DIR"/sar_n_dev\n'
+        script += 'rm -f "$sar_binary"\n'
+        return script
+
+    @classmethod
+    def read_results(cls, test_dir: str) -> dict:
+        """
+        Read the outputs of `sadf -d`, where timestamps are in UTC:
+        ```
+        # hostname,interval,timestamp,CPU,%user,%nice,%system,%iowait,%steal,%idle
+        solegpu2,1,2023-06-12 05:03:20 UTC,2,0.99,0.00,0.99,0.00,0.00,98.02
+        ```
+        :return: a dict with 'sar_u' (time | CPU | %user | ...) and 'sar_n_dev' (time | IFACE | rxpck/s | ...),
+        where 'CPU' is -1 for all cpus
+        """
+        results = {}
+        for result_name in ("sar_u", "sar_n_dev"):
+            result_path = os.path.join(test_dir, result_name)
+            if not os.path.exists(result_path) or os.path.getsize(result_path) == 0:
+                continue
+            result = pd.read_csv(result_path)
+            result = result.rename(columns={ "# hostname": "hostname", "timestamp": "time" })
+            # there may be repeated headers (e.g. sar restarted) or a line of averages
+            result = result[result["time"] != "timestamp"]
+            result["time"] = pd.to_datetime(result["time"].str.replace(" UTC", "", regex=False), utc=True)
+            value_columns = [ col for col in result.columns if col not in ("hostname", "interval", "time", "CPU", "IFACE") ]
+            result[value_columns] = result[value_columns].astype(np.float64)
+            if "CPU" in result.columns:
+                result["CPU"] = pd.to_numeric(result["CPU"].replace("all", -1)).astype(np.int64)
+            results[result_name] = result.drop(columns=["hostname", "interval"]).reset_index(drop=True)
+        return results
+
+
+class ProcCollector(Collector):
+    """
+    `ProcCollector` samples kernel counters in `/proc/vmstat` and `/sys/devices/system/node/node*/numastat`.
+    Each sample is written with an absolute timestamp (seconds since the epoch) to `proc_result`:
+    ```
+    timestamp            | source | counter | value
+    1686546200.123456789 | vmstat | pgfault | 123456789
+    1686546200.123456789 | node0  | numa_hit | 987654321
+    ```
+    """
+    name = "proc"
+
+    def get_collect_script(self) -> str:
+        script = 'proc_result="$TMP_DIR"/proc_result\n'
+        script += f'while [ ! -e "$TMP_DIR"/{STOP_FILE} ]; do\n'
+        script += '    t=$(date +%s.%N)\n'
+        script += '    awk -v t="$t" \'{print t"\\tvmstat\\t"$1"\\t"$2}\' /proc/vmstat >> "$proc_result"\n'
+        script += '    for f in /sys/devices/system/node/node*/numastat; do\n'
+        script += '        [ -e "$f" ] || continue\n'
+        script += '        node=$(basename $(dirname "$f"))\n'
+        script += '        awk -v t="$t" -v n="$node" \'{print t"\\t"n"\\t"$1"\\t"$2}\' "$f" >> "$proc_result"\n'
+        script += '    done\n'
+        script += f'    sleep {self.get_interval_seconds()}\n'
+        script += 'done\n'
+        return script
+
+    @classmethod
+    def read_results(cls, test_dir: str) -> dict:
+        """
+        Read the samples of kernel counters.
+        Cumulative counters are converted to rates (per second) between consecutive samples,
+        while gauges in `/proc/vmstat` (with the prefix 'nr_') are kept as they are.
+        :return: a dict with 'proc': time | <source>.<counter> | ...
+        """
+        result_path = os.path.join(test_dir, "proc_result")
+        if not os.path.exists(result_path) or os.path.getsize(result_path) == 0:
+            return {}
+        samples = pd.read_csv(result_path, sep="\t", header=None, names=["timestamp", "source", "counter", "value"],
+                              dtype={ "timestamp": np.float64, "source": "category", "counter": "category", "value": np.float64 })
+        samples["name"] = samples["source"].astype(str) + "." + samples["counter"].astype(str)
+        # the last sample may be incomplete if the collector is stopped while writing
+        samples = samples[samples["timestamp"] < samples["timestamp"].max()] if samples["timestamp"].nunique() > 1 else samples
+        matrix = samples.pivot_table(index="timestamp", columns="name", values="value", aggfunc="last")
+
+        elapsed = np.diff(matrix.index.to_numpy(), prepend=np.nan)
+        gauges = [ col for col in matrix.columns if re.match(r"vmstat\.nr_", col) ]
+        counters = [ col for col in matrix.columns if col not in gauges ]
+        rates = matrix[counters].diff().div(elapsed, axis=0)
+        result = pd.concat([matrix[gauges], rates], axis=1).iloc[1:]
+        result.columns.name = None
+
+        result.insert(0, "time", pd.to_datetime(result.index.to_numpy(), unit="s", utc=True))
+        return { "proc": result.reset_index(drop=True) }
+
+
+# available collectors, which can be specified by `--collectors` option
+COLLECTORS = { cls.name: cls for cls in (PerfCollector, SarCollector, ProcCollector) }
+
+
+def get_collectors(configs: dict, event_groups: EventGroup, pass_index: int = None) -> list:
+    """
+    Create the collectors specified by `--collectors` option, `perf` is always included.
+    :param `configs`: a dict of parsed configurations
+    :param `event_groups`: an instance of `EventGroup`
+    :param `pass_index`: the index of pass for multi-pass collection (`--multi-pass`), `None` for a single pass
+    :return: a list of instances of `Collector`, where the first one is `PerfCollector`
+    :raises:
+        `ProfilerError`: if a collector is not supported
+    """
+    names = ["perf"] + [ name for name in configs.get("collectors", []) if name != "perf" ]
+    # for multi-pass collection, auxiliary collectors only run in the first pass, 
+    # which is the reference of timestamps for `Analyzer` (see `Analyzer.source_dir`)
+    if pass_index is not None and pass_index > 0:
+        names = ["perf"]
+    collectors = []
+    for name in names:
+        if name not in COLLECTORS:
+            raise ProfilerError(f"Unsupported collector: {name}")
+        collectors.append(COLLECTORS[name](configs, event_groups, pass_index))
+    return collectors
@@ -3,6 +3,11 @@ import subprocess
 import os
 import socket
 import logging
+import atexit
+import tarfile
+import stat
+import shlex
+import getpass
 import paramiko
 import threading
 from hperf_exception import ConnectorError
@@ -23,6 +28,79 @@ class Connector:
     def run_command(self, command_args: Union[Sequence[str], str]) -> str:
         pass
 
+    def read_file(self, file_name: str, offset: int = 0) -> bytes:
+        pass
+
+
+class SSHConnectionPool:
+    """
+    `SSHConnectionPool` keeps authenticated SSH sessions keyed by `(hostname, port, username)` for the lifetime of the process, 
+    so that consecutive runs against the same host within a process (e.g. by a script driving `Controller` repeatedly) 
+    reuse the session instead of connecting and authenticating again. 
+    Sessions are not shared across invocations of 'hperf.py', since they are kept alive only until the process exits. 
+    """
+    __lock = threading.Lock()
+    __clients: dict = {}
+
+    @classmethod
+    def acquire(cls, hostname: str, port: int, username: str, password: str = None, key_filename: Union[str, list] = None) -> paramiko.SSHClient:
+        """
+        Get an active SSH session to the host, or open a new one if there is no active session in the pool. 
+        A new session is authenticated by the private keys specified by `key_filename`, keys in ssh-agent, 
+        default keys in `~/.ssh/` (e.g. `id_rsa`, `id_ed25519`) and the password (if specified), in this order. 
+        :return: an instance of `paramiko.SSHClient`
+        :raises:
+            `paramiko.BadHostKeyException`, `paramiko.AuthenticationException`, `paramiko.SSHException`, `socket.error`: 
+            if fail to open a new SSH session
+        """
+        key = (hostname, port, username)
+        with cls.__lock:
+            client = cls.__clients.get(key)
+        if client is not None and client.get_transport() is not None and client.get_transport().is_active():
+            logging.getLogger("hperf").debug(f"reuse SSH session to {username}@{hostname}:{port}")
+            return client
+
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy)   # for the first connection
+        try:
+            client.connect(hostname, port, username, password, key_filename=key_filename, allow_agent=True, look_for_keys=True)
+        except Exception:
+            client.close()
+            raise
+        client.get_transport().set_keepalive(30)
+
+        with cls.__lock:
+            previous = cls.__clients.get(key)
+            cls.__clients[key] = client
+        if previous is not None:
+            previous.close()
+        return client
+
+    @classmethod
+    def discard(cls, client: paramiko.SSHClient):
+        """
+        Close an SSH session and remove it from the pool, e.g. when the session is broken. 
+        """
+        with cls.__lock:
+            for key, pooled_client in list(cls.__clients.items()):
+                if pooled_client is client:
+                    del cls.__clients[key]
+        client.close()
+
+    @classmethod
+    def close_all(cls):
+        """
+        Close all SSH sessions in the pool. 
+        """
+        with cls.__lock:
+            clients = list(cls.__clients.values())
+            cls.__clients.clear()
+        for client in clients:
+            client.close()
+
+
+atexit.register(SSHConnectionPool.close_all)
+
 
 class LocalConnector(Connector):
     """
@@ -83,6 +161,21 @@ class LocalConnector(Connector):
         output = output.decode("utf-8")
         return output
 
+    def read_file(self, file_name: str, offset: int = 0) -> bytes:
+        """
+        Read a file in the test directory on SUT from a given offset, which is useful for tailing a file that is still being written. 
+        :param `file_name`: name of the file in test directory
+        :param `offset`: the position (in bytes) to start reading
+        :return: the bytes from `offset` to the current end of the file (empty if the file does not exist yet)
+        """
+        file_path = os.path.join(self.test_dir, file_name)
+        try:
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                return f.read()
+        except FileNotFoundError:
+            return b""
+
 
 class RemoteConnector(Connector):
     """
@@ -90,6 +183,13 @@ class RemoteConnector(Connector):
     The remote SUT is can not be accessed locally, so that the operations rely on SSH / SFTP connection to remote SUT. 
     """
 
+    # size of SSH channel window (bytes) and read buffer for pulling files from remote SUT
+    PULL_WINDOW_SIZE = 16 * 1024 * 1024
+    PULL_BUFFER_SIZE = 1024 * 1024
+
+    # the 'data' filter (Python 3.12+) rejects unsafe metadata in the archive
+    EXTRACT_OPTIONS = { "filter": "data" } if hasattr(tarfile, "data_filter") else {}
+
     def __init__(self, test_dir: str, **conn_info) -> None:
         """
         Constructor of `LocalConnector`.  
@@ -101,11 +201,19 @@ class RemoteConnector(Connector):
         and the output need to download from remote SUT. The remote directory is for these temporary files. 
         The remote temporary directory is named `.remote_test_dir`
 
+        The host can be an alias defined in `~/.ssh/config`, where 'HostName', 'User', 'Port' and 'IdentityFile' are used 
+        unless they are specified explicitly. 
+        The SSH session is authenticated by private keys, ssh-agent or password (see `SSHConnectionPool.acquire()`), 
+        if all of them fail and `interactive` is `True`, the user will be asked to enter the password. 
+
         :param `test_dir`: path of the test directory for this run, which can be obtained by `Controller.get_test_dir_path()` 
         :param `conn_info`: keyword arguments for remote SSH connection: 
-            `hostname`: the server to connect to
-            `username`: the username to authenticate as
-            `password`: used for password authentication
+            `hostname`: the server (or the alias in `~/.ssh/config`) to connect to
+            `username`: the username to authenticate as (optional, the current local user by default)
+            `port`: the port of SSH (optional, 22 by default)
+            `key_filename`: the path of private key file (optional)
+            `password`: used for password authentication (optional)
+            `interactive`: whether to ask the user for the password if authentication fails (optional, `True` by default)
         :raises:
             `ConnectorError`: if encounter errors during the SSH / SFTP connection to remote SUT by `paramiko` module
         """
@@ -115,30 +223,38 @@ class RemoteConnector(Connector):
         self.local_test_dir: str = test_dir
 
         # step 2. open a SSH session
-        # paramiko SSH connection configurations
-        self.hostname: str = conn_info["hostname"]
-        self.username: str = conn_info["username"]
-        self.password: str = conn_info["password"]
-        # TODO: the port of SSH is 22 by default. in future, the port can be specified explictly by command line option '-p'.
-        self.port: int = 22
-
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy)   # for the first connection
-        
+        # paramiko SSH connection configurations, options in command line take precedence over `~/.ssh/config`
+        ssh_config = self.__lookup_ssh_config(conn_info["hostname"])
+        self.hostname: str = ssh_config.get("hostname", conn_info["hostname"])
+        self.username: str = conn_info.get("username") or ssh_config.get("user") or getpass.getuser()
+        self.port: int = conn_info.get("port") or int(ssh_config.get("port", 22))
+        self.key_filename = conn_info.get("key_filename") or ssh_config.get("identityfile")
+        self.password: str = conn_info.get("password")
+        self.interactive: bool = conn_info.get("interactive", True)
+
+        # the SSH session is reused if there is an active one to the same host in `SSHConnectionPool`
+        self.client: paramiko.SSHClient = None
+        self.sftp: paramiko.SFTPClient = None
         try:
             # may raise exceptions: 
             # - paramiko.BadHostKeyException: the server's host key could not be verified
             # - paramiko.AuthenticationException: authentication failed
             # - paramiko.SSHException: connecting or establishing an SSH session failed
-            self.client.connect(self.hostname, self.port, self.username, self.password)
+            try:
+                self.client = SSHConnectionPool.acquire(self.hostname, self.port, self.username, self.password, self.key_filename)
+            except paramiko.SSHException as e:
+                # no private key or password is accepted, or there is no private key at all
+                auth_failed = isinstance(e, paramiko.AuthenticationException) or "No authentication methods" in str(e)
+                if not auth_failed or not self.interactive or self.password is not None:
+                    raise
+                self.password = self.__ask_password()
+                self.client = SSHConnectionPool.acquire(self.hostname, self.port, self.username, self.password, self.key_filename)
         except (paramiko.BadHostKeyException, paramiko.AuthenticationException, paramiko.SSHException) as e:
-            self.client.close()
             # format of `e.args`: `(message, )`
-            raise ConnectorError(f"SSH connection failed: {e.args[0]}")
+            raise ConnectorError(f"SSH connection to {self.username}@{self.hostname}:{self.port} failed: {e.args[0]}")
         except socket.error as e:
-            self.client.close()
             # format of `e.args`: `(err_code, message)`
-            raise ConnectorError(f"SSH connection failed: {e.args[1]}")
+            raise ConnectorError(f"SSH connection to {self.username}@{self.hostname}:{self.port} failed: {e.args[-1]}")
 
         # step 3. open a SFTP session
         self.sftp = self.client.open_sftp()
@@ -156,11 +272,9 @@ class RemoteConnector(Connector):
                 self.close()
                 raise ConnectorError(f"SFTP session failed: {e.args[0]}")
             else:
-                for file in self.sftp.listdir("."):    # delete all files in ./.hperf/
-                    try:
-                        self.sftp.remove(file)
-                    except IOError as e:   # if fail to remove (the `file` is a directory), just ignore
-                        pass
+                # delete all files in ./.hperf/, including sub-directories (e.g. 'pass_<i>' of multi-pass collection), 
+                # otherwise they would be pulled to the local test directory of this run
+                self.__remove_remote_dir_contents(".")
             finally:
                 self.sftp.chdir()    # reset working directory to ./
         else:    # directory ./.hperf/ does not exist on the remote SUT
@@ -175,6 +289,55 @@ class RemoteConnector(Connector):
 
         self.logger.debug(f"remote test directory: {self.remote_test_dir}")
     
+    def __remove_remote_dir_contents(self, remote_dir: str):
+        """
+        Remove all files and sub-directories in a directory on the remote SUT recursively through SFTP session. 
+        Failures are ignored, since the files left will be overwritten or ignored by this run. 
+        :param `remote_dir`: the path of directory on the remote SUT
+        """
+        try:
+            attrs = self.sftp.listdir_attr(remote_dir)
+        except IOError:
+            return
+        for attr in attrs:
+            path = os.path.join(remote_dir, attr.filename)
+            try:
+                if stat.S_ISDIR(attr.st_mode):
+                    self.__remove_remote_dir_contents(path)
+                    self.sftp.rmdir(path)
+                else:
+                    self.sftp.remove(path)
+            except IOError:
+                pass
+
+    @staticmethod
+    def __lookup_ssh_config(host: str) -> dict:
+        """
+        Look up the configurations of a host in `~/.ssh/config`. 
+        :param `host`: the hostname or an alias
+        :return: a dict of configurations with lowercase keys, e.g. 'hostname', 'user', 'port' and 'identityfile', 
+        or an empty dict if `~/.ssh/config` does not exist or can not be parsed
+        """
+        ssh_config_path = os.path.expanduser("~/.ssh/config")
+        if not os.path.exists(ssh_config_path):
+            return {}
+        try:
+            return paramiko.SSHConfig.from_path(ssh_config_path).lookup(host)
+        except Exception as e:
+            logging.getLogger("hperf").warning(f"fail to parse {ssh_config_path}: {e}")
+            return {}
+
+    # the password is asked one host at a time, e.g. when connecting to multiple hosts concurrently
+    __prompt_lock = threading.Lock()
+
+    def __ask_password(self) -> str:
+        """
+        Ask the user to enter the password by command line interaction. 
+        :return: the password
+        """
+        with self.__prompt_lock:
+            return getpass.getpass(f"connect to {self.hostname}, enter the password for user {self.username}: ")
+
     def run_command(self, command_args: Sequence[str]) -> str:
         """
         Run a command on SUT, then return the stdout output of executing the command. 
@@ -260,20 +423,98 @@ class RemoteConnector(Connector):
         self.logger.debug(f"generate script in remote temporary directory: {remote_script_path}")
         return remote_script_path
 
+    def read_file(self, file_name: str, offset: int = 0) -> bytes:
+        """
+        Read a file in the remote test directory from a given offset through SFTP session, 
+        which is useful for tailing a file that is still being written on remote SUT. 
+        :param `file_name`: name of the file in remote test directory
+        :param `offset`: the position (in bytes) to start reading
+        :return: the bytes from `offset` to the current end of the file (empty if the file does not exist yet)
+        """
+        remote_file_path = os.path.join(self.remote_test_dir, file_name)
+        # -------- critical section --------
+        self.locker.acquire()
+        try:
+            with self.sftp.open(remote_file_path, "rb") as f:    # may raise `IOError`
+                f.seek(offset)
+                return f.read()
+        except IOError:
+            return b""
+        finally:
+            self.locker.release()
+        # -------- critical section ends --------
+
     def pull_remote(self):
         """
         Pull all files to the test directory (a sub-directory in local temporary directory) from remote temporary directory. 
+        The files are archived and compressed on the remote SUT, then streamed back over a single SSH channel and extracted on the fly, 
+        since the raw performance data in text is highly compressible. 
+        If streaming fails (e.g. 'tar' or 'gzip' is unavailable on the remote SUT), the files are pulled through SFTP one by one. 
+        :raises:
+            `ConnectorError`: if fail to pull raw performance data from remote SUT
+        """
+        try:
+            self.__pull_remote_stream()
+            return
+        except (tarfile.TarError, EOFError, OSError, paramiko.SSHException) as e:
+            self.logger.debug(f"fail to stream files from remote SUT ({e}), pull files through SFTP instead")
+        self.__pull_remote_sftp()
+
+    def __pull_remote_stream(self):
+        """
+        Pull all files from remote temporary directory by streaming a compressed tar archive ('tar | gzip') over an SSH channel. 
+        :raises:
+            `tarfile.TarError`, `EOFError`, `OSError`: if the stream is not a complete archive
+            `paramiko.SSHException`: if fail to execute command on remote SUT
+        """
+        # with 'pipefail', a failure of 'tar' (e.g. a file can not be read) is not hidden by the exit code of 'gzip', 
+        # and the login shell of the remote user may not be bash, as the profiling scripts are
+        command = "bash -c " + shlex.quote(f"set -o pipefail; tar -C {shlex.quote(self.remote_test_dir)} -cf - . | gzip -1")
+        self.logger.debug(f"stream files from remote SUT: {command}")
+        # a larger window than the default allows more data in flight, which matters on high-latency links
+        channel = self.client.get_transport().open_session(window_size=self.PULL_WINDOW_SIZE)
+        try:
+            channel.exec_command(command)    # may raise `paramiko.SSHException`
+            with channel.makefile("rb", self.PULL_BUFFER_SIZE) as stream:
+                # 'r|gz' reads the archive as a stream, so that it is never buffered entirely in memory
+                with tarfile.open(fileobj=stream, mode="r|gz") as tar:
+                    for member in tar:
+                        # only regular files in the remote temporary directory and its sub-directories 
+                        # (e.g. 'pass_<i>' of multi-pass collection) are pulled
+                        member.name = os.path.normpath(member.name)
+                        if not member.isfile() or os.path.isabs(member.name) or member.name.startswith(".."):
+                            continue
+                        tar.extract(member, self.local_test_dir, **self.EXTRACT_OPTIONS)
+                        self.logger.debug(f"get file from remote SUT to local test directory: {member.name}")
+            ret_code = channel.recv_exit_status()
+        finally:
+            channel.close()
+        if ret_code != 0:
+            raise OSError(f"'{command}' exits with code {ret_code}")
+
+    def __pull_remote_sftp(self):
+        """
+        Pull all files from remote temporary directory through SFTP session one by one. 
         :raises:
             `ConnectorError`: if fail to pull raw performance data from remote SUT
         """
         # -------- critical section --------
         self.locker.acquire()
         try:
-            for file in self.sftp.listdir(self.remote_test_dir):
-                remote_file_path = os.path.join(self.remote_test_dir, file)
-                local_file_path = os.path.join(self.local_test_dir, file)
-                self.sftp.get(remote_file_path, local_file_path)    # may raise `IOError`
-                self.logger.debug(f"get file from remote SUT to local test directory: {remote_file_path} -> {local_file_path}")
+            # sub-directories (e.g. 'pass_<i>' of multi-pass collection) are pulled recursively
+            pending_dirs = [""]
+            while len(pending_dirs) > 0:
+                sub_dir = pending_dirs.pop()
+                os.makedirs(os.path.join(self.local_test_dir, sub_dir), exist_ok=True)
+                for attr in self.sftp.listdir_attr(os.path.join(self.remote_test_dir, sub_dir)):    # may raise `IOError`
+                    file = os.path.join(sub_dir, attr.filename)
+                    if stat.S_ISDIR(attr.st_mode):
+                        pending_dirs.append(file)
+                        continue
+                    remote_file_path = os.path.join(self.remote_test_dir, file)
+                    local_file_path = os.path.join(self.local_test_dir, file)
+                    self.sftp.get(remote_file_path, local_file_path)    # may raise `IOError`
+                    self.logger.debug(f"get file from remote SUT to local test directory: {remote_file_path} -> {local_file_path}")
         except IOError:
             raise ConnectorError(f"Fail to pull raw performance data from remote SUT.")
         finally:
@@ -282,10 +523,15 @@ class RemoteConnector(Connector):
 
     def close(self):
         """
-        Close SSH / SFTP connection if it exists. 
+        Close SFTP connection if it exists, and release the SSH session to `SSHConnectionPool` for later runs against the same host. 
+        If the SSH session is broken, it is closed and removed from the pool. 
         This method is useful in `finally` blocks for releasing resources. 
         """
         if self.sftp:
             self.sftp.close()
+            self.sftp = None
         if self.client:
-            self.client.close()
+            transport = self.client.get_transport()
+            if transport is None or not transport.is_active():
+                SSHConnectionPool.discard(self.client)
+            self.client = None
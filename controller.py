@@ -1,4 +1,5 @@
 import logging
+import json
 import os
 import sys
 from datetime import datetime
@@ -8,8 +9,11 @@ from typing import Sequence
 from opt_parser import OptParser
 from profiler import Profiler
 from analyzer import Analyzer
+from live_analyzer import LiveAnalyzer
 from connector import Connector, LocalConnector, RemoteConnector
 from event_group import EventGroup
+from sut import SUT, SUTCache
+from cluster import Cluster
 
 
 class Controller:
@@ -34,6 +38,8 @@ class Controller:
         self.profiler: Profiler = None
         self.analyzer: Analyzer = None
         self.event_groups: EventGroup = None
+        self.sut: SUT = None
+        self.cluster: Cluster = None    # for multiple remote SUTs (`--hosts` or `--hosts-file` option)
 
         # Initialize `Logger`
         # **Note**: Since `Logger` follows singleton pattern,
@@ -75,6 +81,10 @@ class Controller:
         try:
             # step 1.
             self.__parse()    # may raise `SystemExit` or `ParserError`
+            # for re-analysis mode (`python hperf.py analyze [options] TEST_DIR`), only analyze the existing test directory
+            if self.configs["mode"] == "analyze":
+                self.__reanalyze()
+                return
             # step 2.
             self.__prework()
             # step 3.
@@ -94,7 +104,10 @@ class Controller:
             if isinstance(self.connector, RemoteConnector):
                 self.connector.close()
                 self.logger.debug("RemoteConnector closed.")
-            if self.connector:
+            if self.cluster:
+                self.cluster.close()
+                self.logger.debug("connections to all hosts closed.")
+            if self.connector or self.cluster:
                 self.__save_log_file()
 
     def __parse(self):
@@ -121,7 +134,8 @@ class Controller:
         Complete some preworks based on the valid configurations (`.configs`) before profiling. 
         The following steps will be conducted based on the parsed configurations: 
         1) create an unique test directory in the temporary directory (`.tmp_dir`)
-        2) instantiate a `LocalConnector` or `RemoteConnector` (`.connector`)
+        2) instantiate a `LocalConnector` or `RemoteConnector` (`.connector`), 
+        or a `Cluster` (`.cluster`) which connects to multiple remote SUTs
 
         The temporary directory (`.configs["tmp_dir"]`) specified by command line options `--tmp-dir` (`/tmp/hperf/` by default). 
         The test directory is for this run of hperf and used to save profiling scripts, raw performance data, analysis results, log file, etc. 
@@ -171,12 +185,18 @@ class Controller:
         if self.configs["host_type"] == "local":
             self.logger.debug("SUT is on local")
             self.connector = LocalConnector(self.get_test_dir_path())
+        elif self.configs["host_type"] == "cluster":
+            self.logger.debug(f"SUTs are on {len(self.configs['hosts'])} remote hosts")
+            self.cluster = Cluster(self.get_test_dir_path(), self.configs)
+            self.cluster.connect()    # may raise `ProfilerError`
         else:
             self.logger.debug("SUT is on remote")
             self.connector = RemoteConnector(self.get_test_dir_path(), 
                                              hostname=self.configs["hostname"],
                                              username=self.configs["username"],
-                                             password=self.configs["password"])    # may raise `ConnectorError`
+                                             port=self.configs["port"],
+                                             key_filename=self.configs["key_filename"],
+                                             interactive="non_interactive" not in self.configs)    # may raise `ConnectorError`
 
     def __find_test_id(self) -> str:
         """
@@ -218,14 +238,61 @@ class Controller:
         :raises:
             `SystemExit`: if user choose not to continue profiling when sanity check fails 
             `ConnectorError`: if encounter errors when executing command or script on SUT
+            `EventGroupError`: if any specified metric is not defined for the architecture of SUT, 
+            or none of the metrics is supported by the SUT
             `ProfilerError`: if the profiling is not successful on SUT
         """
-        self.event_groups = EventGroup(self.connector)
-        self.profiler = Profiler(self.connector, self.configs, self.event_groups)
+        # all static information of the SUT is discovered by a single probe, 
+        # the hardware description is reused from the cache if it is not expired (see `--sut-cache-ttl` option), 
+        # the output of 'lscpu' and the CPU topology are saved in the local test directory for `Analyzer`
+        self.logger.info("get static information of SUT")
+        sut_cache = None
+        if self.configs.get("sut_cache_ttl", 0) > 0:
+            sut_cache = SUTCache(os.path.join(self.tmp_dir, ".sut_cache"), self.configs["sut_cache_ttl"])
+
+        # for multiple remote SUTs, the following steps are conducted on all hosts concurrently
+        if self.cluster:
+            self.cluster.discover(sut_cache)    # may raise `ProfilerError`
+            self.__confirm_sanity_check(self.cluster.sanity_check())
+            self.cluster.profile()    # may raise `ProfilerError`
+            return
+
+        self.sut = SUT.discover(self.connector, sut_cache)    # may raise `ConnectorError`
+        self.sut.save(self.get_test_dir_path())
+
+        self.event_groups = EventGroup(self.sut, self.configs.get("metrics"))    # may raise `EventGroupError`
+        # unsupported events are dropped or substituted before the real run (see `--no-probe` option)
+        if "no_probe" not in self.configs:
+            self.event_groups.probe_capabilities(self.connector)    # may raise `ConnectorError` and `EventGroupError`
+        if sut_cache:
+            sut_cache.save(self.sut)
+        self.profiler = Profiler(self.connector, self.configs, self.event_groups, self.sut)
+        self.__save_metadata()
 
         # step 3.1. sanity check
-        # if sanity check does not pass, let user choose whether to continue profiling.
-        if not self.profiler.sanity_check():
+        self.__confirm_sanity_check(self.profiler.sanity_check())
+
+        # step 3.2. profile
+        # in live mode, new intervals will be analyzed and printed while the workload is running
+        if "live" in self.configs:
+            # the ring buffer keeps the intervals of the last minute
+            window = max(60, 60000 // self.configs.get("interval", 1000))
+            live_analyzer = LiveAnalyzer(self.connector, self.get_test_dir_path(), self.configs, self.event_groups, window)
+        else:
+            live_analyzer = None
+        self.profiler.profile(live_analyzer)    # may raise `ProfilerError` or `ConnectorError` (for `RemoteConnector`)
+
+    def __confirm_sanity_check(self, passed: bool):
+        """
+        If sanity check does not pass, let user choose whether to continue profiling. 
+        In non-interactive mode (`--non-interactive` option), profiling always continues. 
+        :param `passed`: the result of sanity check
+        :raises:
+            `SystemExit`: if user choose not to continue profiling
+        """
+        if not passed and "non_interactive" in self.configs:
+            self.logger.warning("sanity check failed, continue profiling in non-interactive mode.")
+        elif not passed:
             select = input("Detected some problems which may interfere profiling. Continue profiling? [y|N] ")
             while True:
                 if select == "y" or select == "Y":
@@ -237,20 +304,83 @@ class Controller:
         else:
             self.logger.info("sanity check passed.")
 
-        # step 3.2. profile
-        self.profiler.profile()    # may raise `ProfilerError` or `ConnectorError` (for `RemoteConnector`)
-
     def __analyze(self):
         """
         Analyze the raw performance data which is generated by `Profiler`. 
         Then output the report of performance metrics to the test directory. 
         """
+        # for multiple remote SUTs, the results of each host are saved in its sub-directory, 
+        # and the results aggregated over hosts are printed and saved in the test directory
+        if self.cluster:
+            self.cluster.analyze()    # may raise `AnalyzerError`
+            print(self.cluster.analyzer.get_timeseries(to_csv=True))
+            print(self.cluster.analyzer.get_aggregated_metrics(to_csv=True))
+            print(self.cluster.analyzer.get_host_metrics(to_csv=True))
+            return
+
         self.analyzer = Analyzer(self.get_test_dir_path(), self.configs, self.event_groups)
         self.analyzer.analyze()
         print(self.analyzer.get_timeseries(to_csv=True))
         print(self.analyzer.get_aggregated_metrics(to_csv=True))
+        for level in self.configs.get("breakdown", []):
+            print(self.analyzer.get_breakdown_metrics(level, to_csv=True))
+        self.analyzer.get_collector_results(to_csv=True)
         self.analyzer.get_timeseries_plot()
 
+    def __reanalyze(self):
+        """
+        Re-analyze the raw performance data in an existing test directory (`.configs["test_dir"]`) without profiling again. 
+        `EventGroup` is reconstructed from the metadata saved in the test directory, 
+        and the scope of CPUs, the metrics and the time window can be different from the original run. 
+        Options which are not specified again (e.g. `-c`, `--coverage-threshold` and `--breakdown`) and the sampling interval 
+        are taken from the configurations of the original run saved in the metadata. 
+        The report of performance metrics will overwrite the previous one in the test directory. 
+        :raises:
+            `EventGroupError`: if the metadata of the test directory is not found
+            `AnalyzerError`: if the raw performance data can not be handled
+        """
+        self.tmp_dir, self.test_id = os.path.split(self.configs["test_dir"])
+        self.logger.info(f"re-analyze test directory: {self.get_test_dir_path()}")
+        self.event_groups = EventGroup.from_test_dir(self.get_test_dir_path())    # may raise `EventGroupError`
+
+        # the sampling interval and the options of analysis of the original run are used, 
+        # unless they are specified again in re-analysis mode
+        saved_configs = self.__load_saved_configs()
+        for key in ("interval", "cpu_list", "coverage_threshold", "breakdown"):
+            if key not in self.configs and key in saved_configs:
+                self.configs[key] = saved_configs[key]
+        self.configs.setdefault("cpu_list", "all")
+        self.configs.setdefault("coverage_threshold", 20.0)
+        self.logger.debug(f"configurations for re-analysis: {self.configs}")
+
+        self.__analyze()
+
+    def __load_saved_configs(self) -> dict:
+        """
+        Load the configurations of the original run saved in the metadata of the test directory (see `.__save_metadata()`). 
+        :return: a dict of configurations, or an empty dict if the metadata is not found (e.g. test directories of earlier versions)
+        """
+        metadata_path = os.path.join(self.get_test_dir_path(), "hperf_meta.json")
+        try:
+            with open(metadata_path) as f:
+                return json.load(f).get("configs", {})
+        except (IOError, ValueError):
+            return {}
+
+    def __save_metadata(self):
+        """
+        Save the metadata of this run in the test directory (`hperf_meta.json`), 
+        which is used to reconstruct `EventGroup` in re-analysis mode. 
+        """
+        metadata = self.event_groups.get_metadata()
+        metadata["configs"] = self.configs
+        # the number of passes of multi-pass collection ('pass_<i>' for i below it), 0 for a single pass
+        metadata["num_passes"] = self.event_groups.get_num_passes() if self.configs.get("multi_pass") else 0
+        metadata_path = os.path.join(self.get_test_dir_path(), "hperf_meta.json")
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        self.logger.debug(f"save metadata of this run: {metadata_path}")
+
     def __save_log_file(self):
         """
         Copy the log file from `self.log_filed_path` to the test directory for this run. 
@@ -1,26 +1,52 @@
+from typing import Sequence
+from sut import SUT
 from connector import Connector
+from metric_expression import MetricExpression
+from hperf_exception import EventGroupError
 import logging
+import json
+import os
 
 class EventGroup:
     """
     'EventGroup' is responsible for detecting the architecture of the SUT 
     and generating the string of event groups, which can be accepted by '-e' options of 'perf'.
     """
-    def __init__(self, connector: Connector = None) -> None:
+    # affinity groups up to this number are packed optimally by branch-and-bound, otherwise by first-fit decreasing
+    EXACT_SOLVER_MAX_GROUPS = 24
+    # the budget of search nodes of branch-and-bound, which bounds the time of grouping to milliseconds
+    EXACT_SOLVER_MAX_NODES = 5000
+
+    def __init__(self, sut: SUT = None, metrics: Sequence[str] = None) -> None:
         """
         Constructor of 'EventGroup'.
-        It will firstly determine the architecture of the SUT through 'Connector', 
+        It will firstly determine the architecture of the SUT by its description discovered by `SUT.discover()`, 
         then it will dynamic import the pre-defined configurations in 'profiler/arch/<arch_name>.py'.
-        :param connector: an instance of 'Connector' ('LocalConnector' or 'RemoteConnector')
+        :param sut: an instance of `SUT`
+        :param `metrics`: names or categories of metrics to collect (see `.select_metrics()`), by default all metrics
+        :raises:
+            `EventGroupError`: if any expression of metrics is invalid or any specified metric is not defined
         """
         self.logger = logging.getLogger("hperf")
         
-        if connector:
-            self.connector = connector
+        self.sut: SUT = None
+
+        # ids of events dropped and perf names of events substituted after probing the capabilities of PMUs 
+        # (see `.probe_capabilities()`)
+        self.dropped_events: set = set()
+        self.substituted_events: dict = {}
+        # names or categories of metrics selected by `--metrics` option (see `.select_metrics()`), `None` for all metrics
+        self.selected_metrics: list = None
+
+        if sut:
+            self.sut = sut
             
             self.isa = self.__get_isa()
             
-            self.arch = self.__get_architecture()
+            # the architecture may be loaded from `SUTCache`, otherwise it is recorded in `.sut` for caching
+            if self.sut.arch is None:
+                self.sut.arch = self.__get_architecture()
+            self.arch = self.sut.arch
 
             # dynamic import event configurations based on the architecture of the SUT
             arch_module = __import__(f"arch.{self.arch}", fromlist=[0])
@@ -32,6 +58,12 @@ class EventGroup:
 
             self.available_GP: int = getattr(arch_module, "available_GP")
 
+            self.__compile_metrics()    # may raise `EventGroupError`
+            self.__compile_counter_constraints()
+
+            if metrics:
+                self.select_metrics(metrics)    # may raise `EventGroupError`
+
             self.__optimize_event_groups()
 
     @classmethod
@@ -56,65 +88,455 @@ class EventGroup:
 
         my_event_group.available_GP: int = getattr(arch_module, "available_GP")
 
+        my_event_group.__compile_metrics()    # may raise `EventGroupError`
+        my_event_group.__compile_counter_constraints()
+
+        return my_event_group
+
+    @classmethod
+    def from_test_dir(cls, test_dir: str):
+        """
+        Constructor of 'EventGroup', without Connector. 
+        Reconstruct the event groups used by a previous run from the metadata saved in its test directory (`hperf_meta.json`), 
+        so that the raw performance data can be re-analyzed without profiling again. 
+        For test directories without metadata, the architecture is determined by the output of 'lscpu' saved in `cpu_info`. 
+        :param `test_dir`: a string of the path of test directory
+        :raises:
+            `EventGroupError`: if neither metadata nor `cpu_info` is found in the test directory
+        """
+        meta_path = os.path.join(test_dir, "hperf_meta.json")
+        cpu_info_path = os.path.join(test_dir, "cpu_info")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            my_event_group = cls.get_event_group(meta["isa"], meta["arch"])
+            # only the events required by the metrics selected in the previous run were collected
+            if meta.get("metrics"):
+                my_event_group.select_metrics(meta["metrics"])
+            # events dropped or substituted after probing the capabilities of PMUs in the previous run
+            my_event_group.__adapt_events(meta.get("dropped_events", []), 
+                                          { int(id): perf_name for id, perf_name in meta.get("substituted_events", {}).items() })
+            if "events" in meta:
+                my_event_group.__restrict_events(set(meta["events"]))
+            my_event_group.event_groups = [ set(group) for group in meta["event_groups"] ]
+        elif os.path.exists(cpu_info_path):
+            my_event_group = cls()
+            with open(cpu_info_path) as f:
+                my_event_group.sut = SUT.from_lscpu(f.read())
+            isa = my_event_group.__get_isa()
+            my_event_group.isa = isa    # required by `.__get_architecture()`
+            my_event_group = cls.get_event_group(isa, my_event_group.__get_architecture())
+        else:
+            raise EventGroupError(f"Fail to find the metadata of test directory {test_dir}")
         return my_event_group
 
+    def get_metadata(self) -> dict:
+        """
+        Get the metadata of event groups, which is saved in the test directory as `hperf_meta.json` 
+        and can be used to reconstruct `EventGroup` by `.from_test_dir()`. 
+        :return: a dict of metadata
+        """
+        return {
+            "isa": self.isa,
+            "arch": self.arch,
+            "event_groups": [ sorted(group) for group in self.event_groups ],
+            "time_share": self.get_time_share(),
+            "metrics": self.selected_metrics,
+            "events": sorted([ item["id"] for item in self.events ]),
+            "dropped_events": sorted(self.dropped_events),
+            "substituted_events": self.substituted_events
+        }
+
+    def resolve_metrics(self, selection: Sequence[str]) -> list:
+        """
+        Resolve the names or categories of metrics (case-insensitive), e.g. `["CPI", "cache"]`, 
+        to the metrics defined for the architecture. 
+        :param `selection`: a list of names or categories of metrics
+        :return: a list of metrics (items in `.metrics`), in the order defined for the architecture
+        :raises:
+            `EventGroupError`: if any item of the selection matches neither a metric nor a category
+        """
+        selected_metrics = set()
+        for selector in selection:
+            matched_metrics = { item["metric"] for item in self.metrics
+                                if selector.upper() in (item["metric"].upper(), item.get("category", "").upper()) }
+            if len(matched_metrics) == 0:
+                categories = sorted({ item["category"] for item in self.metrics if "category" in item })
+                raise EventGroupError(f"Metric {selector} is not defined for architecture {self.arch} "
+                                      f"(available categories: {', '.join(categories)})")
+            selected_metrics |= matched_metrics
+        return [ item for item in self.metrics if item["metric"] in selected_metrics ]
+
+    def select_metrics(self, selection: Sequence[str]):
+        """
+        Restrict the metrics to compute and the events to collect to the given names or categories of metrics. 
+        Only the events which the expressions of selected metrics depend on are kept, 
+        so that fewer events are multiplexed on the general-purpose counters and each event gets a higher coverage. 
+        It should be called before `.__optimize_event_groups()`. 
+        :param `selection`: a list of names or categories of metrics, e.g. `["CPI", "cache"]`
+        :raises:
+            `EventGroupError`: if any item of the selection matches neither a metric nor a category
+        """
+        self.metrics = self.resolve_metrics(selection)
+        self.selected_metrics = list(selection)
+        required_events = set()
+        for item in self.metrics:
+            required_events |= self.metric_expressions[item["metric"]].dependencies
+        self.__restrict_events(required_events)
+        self.logger.info(f"collect {len(self.events)} events for {len(self.metrics)} metrics: "
+                         f"{', '.join([ item['metric'] for item in self.metrics ])}")
+
+    def probe_capabilities(self, connector: Connector):
+        """
+        Probe the capabilities of PMUs of the SUT by `SUT.probe_events()` and adapt the events before the real run, 
+        so that an unsupported event fails fast here instead of losing the whole run to an error of perf. 
+        1. an unsupported event is substituted by the first supported one of its 'alternatives' in the architecture module, 
+        otherwise it is dropped together with the metrics depending on it, 
+        2. if any event is dropped, event groups are packed again, 
+        3. each multiplexed event group is probed with the pinned events, and a warning is logged if it can not be scheduled. 
+        The results are kept in `.sut` and cached by `SUTCache`, so that they are probed only once for each SUT. 
+        :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
+        :raises:
+            `ConnectorError`: if fail to execute the probe script on the SUT
+            `EventGroupError`: if none of the metrics is supported by the SUT
+        """
+        if not self.sut.perf_version:
+            self.logger.debug("skip probing the capabilities of PMUs since perf is not found")
+            return
+
+        # step 1. probe events and their alternatives
+        probed_events = {}
+        for item in self.events:
+            system_wide = item.get("type") in ("SOCKET", "SYSTEM")
+            for perf_name in [item["perf_name"]] + item.get("alternatives", []):
+                probed_events[perf_name] = system_wide
+        event_support = self.sut.probe_events(connector, probed_events)    # may raise `ConnectorError`
+
+        # step 2. drop or substitute unsupported events
+        dropped_events = set()
+        substituted_events = {}
+        for item in self.events:
+            if event_support[item["perf_name"]] is not False:
+                continue
+            alternatives = [ perf_name for perf_name in item.get("alternatives", []) if event_support[perf_name] ]
+            if len(alternatives) > 0:
+                self.logger.warning(f"event {item['name']} ({item['perf_name']}) is not supported by the SUT, "
+                                    f"substituted by {alternatives[0]}")
+                substituted_events[item["id"]] = alternatives[0]
+            else:
+                self.logger.warning(f"event {item['name']} ({item['perf_name']}) is not supported by the SUT, dropped")
+                dropped_events.add(item["id"])
+        if len(dropped_events) == 0 and len(substituted_events) == 0:
+            self.logger.debug("all events are supported by the SUT")
+        self.__adapt_events(dropped_events, substituted_events)    # may raise `EventGroupError`
+        if len(dropped_events) > 0:
+            self.__optimize_event_groups()
+
+        # step 3. probe multiplexed event groups with the pinned events, which occupy counters at the same time
+        perf_names = { item["id"]: item["perf_name"] for item in self.events }
+        pinned_str = "".join([ f"{perf_names[id]}:D," for id in self.pinned_events ])
+        probed_groups = [ pinned_str + "{" + ",".join([ perf_names[id] for id in sorted(group) ]) + "}"
+                          for group in self.event_groups ]
+        group_support = self.sut.probe_events(connector, { group: False for group in probed_groups })
+        for group in probed_groups:
+            if group_support[group] is False:
+                self.logger.warning(f"event group {group} can not be scheduled on the SUT, "
+                                    f"the counter constraints of architecture {self.arch} may be inaccurate")
+
+    def __adapt_events(self, dropped_events: Sequence[int], substituted_events: dict):
+        """
+        Drop or substitute unsupported events, and drop the metrics depending on the dropped events. 
+        It is used by `.probe_capabilities()`, and by `.from_test_dir()` to reproduce the events of a previous run. 
+        :param `dropped_events`: ids of events to drop
+        :param `substituted_events`: a dict mapping the id of event to the perf name substituting it
+        :raises:
+            `EventGroupError`: if all metrics are dropped
+        """
+        dropped_events = set(dropped_events)
+        self.dropped_events |= dropped_events
+        self.substituted_events.update(substituted_events)
+        # items of events are shared by the architecture module, hence they are copied rather than modified
+        self.events = [ dict(item, perf_name=substituted_events[item["id"]]) if item["id"] in substituted_events else item
+                        for item in self.events if item["id"] not in dropped_events ]
+        if len(dropped_events) == 0:
+            return
+
+        dropped_metrics = [ item["metric"] for item in self.metrics
+                            if self.metric_expressions[item["metric"]].dependencies & dropped_events ]
+        if len(dropped_metrics) == len(self.metrics):
+            raise EventGroupError("None of the metrics is supported by the SUT")
+        if len(dropped_metrics) > 0:
+            self.logger.warning(f"metrics depending on unsupported events are dropped: {', '.join(dropped_metrics)}")
+        self.metrics = [ item for item in self.metrics if item["metric"] not in dropped_metrics ]
+        self.other_events = [ event for event in self.other_events if event not in dropped_events ]
+        self.pinned_events = [ event for event in self.pinned_events if event not in dropped_events ]
+        self.event_groups = [ [ event for event in group if event not in dropped_events ] for group in self.event_groups ]
+        self.event_groups = [ group for group in self.event_groups if len(group) > 0 ]
+        # fixed counters may be released by pinned events which are dropped
+        self.__compile_counter_constraints()
+
+    def __restrict_events(self, event_ids: set):
+        """
+        Restrict the events to collect (and the event groups) to the given ids of events. 
+        :param `event_ids`: a set of ids of events to keep
+        """
+        self.events = [ item for item in self.events if item["id"] in event_ids ]
+        self.other_events = [ event for event in self.other_events if event in event_ids ]
+        self.pinned_events = [ event for event in self.pinned_events if event in event_ids ]
+        self.event_groups = [ [ event for event in group if event in event_ids ] for group in self.event_groups ]
+        self.event_groups = [ group for group in self.event_groups if len(group) > 0 ]
+        # fixed counters may be released by pinned events which are not required any more
+        self.__compile_counter_constraints()
+
+    def __compile_metrics(self):
+        """
+        Parse and validate the expressions of all metrics once, and record the compiled expressions in `.metric_expressions`, 
+        which is a dict mapping the name of metric to an instance of `MetricExpression`. 
+        :raises:
+            `EventGroupError`: if any expression is invalid or references an undefined event id
+        """
+        event_ids = { item["id"] for item in self.events }
+        self.metric_expressions: dict = {}
+        for item in self.metrics:
+            self.metric_expressions[item["metric"]] = MetricExpression(item["metric"], item["expression"], event_ids)
+            self.logger.debug(f"metric {item['metric']} depends on events: {sorted(self.metric_expressions[item['metric']].dependencies)}")
+
+    def __compile_counter_constraints(self):
+        """
+        Build the counter constraints of events from the optional fields of events in the architecture module: 
+        'counters' is a list of indexes of general-purpose counters which the event can be scheduled on 
+        (by default, any of the `.available_GP` counters), 
+        'fixed' is the index of the fixed counter dedicated to the event (e.g. 'cycles' and 'instructions' on Intel processors). 
+        Fixed counters occupied by pinned events are not available to multiplexed event groups (except the pinned events themselves), 
+        while pinned events without fixed counters (e.g. 'instructions' on Arm processors) occupy general-purpose counters 
+        together with every multiplexed event group (see `.__can_schedule()`). 
+        The candidate counters of each event are recorded in `.counter_candidates`, 
+        which is a dict mapping event id to a list of counters, such as `[("FIXED", 1), ("GP", 0), ("GP", 1)]`.
+        """
+        reserved_fixed_counters = { item["fixed"] for item in self.events
+                                    if "fixed" in item and item["id"] in self.pinned_events }
+        self.counter_candidates: dict = {}
+        for item in self.events:
+            candidates = []
+            if "fixed" in item and (item["fixed"] not in reserved_fixed_counters or item["id"] in self.pinned_events):
+                candidates.append(("FIXED", item["fixed"]))
+            candidates += [ ("GP", counter) for counter in item.get("counters", range(self.available_GP))
+                            if 0 <= counter < self.available_GP ]
+            self.counter_candidates[item["id"]] = candidates
+        self.__pinned_gp_events = [ item["id"] for item in self.events if "fixed" not in item and item["id"] in self.pinned_events ]
+        self.__num_counters = self.available_GP + len({ item["fixed"] for item in self.events
+                                                        if "fixed" in item and item["fixed"] not in reserved_fixed_counters })
+        self.__num_counters -= len(self.__pinned_gp_events)
+        self.__schedulable_cache: dict = {}
+
+    def __can_schedule(self, event_group: set) -> bool:
+        """
+        Determine whether all events of an event group can be counted simultaneously, 
+        i.e. each event can be assigned to a distinct counter among its candidates (`.counter_candidates`). 
+        It is a bipartite matching between events and counters, solved by augmenting paths, 
+        where the pinned events without fixed counters are always matched as well since they are counted all the time. 
+        :param `event_group`: a set of event ids
+        :return: `True` if the event group can be scheduled
+        """
+        if len(event_group) > self.__num_counters:
+            return False
+        key = frozenset(event_group)
+        if key in self.__schedulable_cache:
+            return self.__schedulable_cache[key]
+
+        assignment = {}    # counter -> event id
+
+        def assign(event: int, visited: set) -> bool:
+            for counter in self.counter_candidates.get(event, []):
+                if counter in visited:
+                    continue
+                visited.add(counter)
+                if counter not in assignment or assign(assignment[counter], visited):
+                    assignment[counter] = event
+                    return True
+            return False
+
+        # events with fewer candidate counters are assigned first, which usually avoids augmenting
+        events = sorted(set(event_group) | set(self.__pinned_gp_events), key=lambda event: len(self.counter_candidates.get(event, [])))
+        schedulable = all(assign(event, set()) for event in events)
+        self.__schedulable_cache[key] = schedulable
+        return schedulable
+
     def __optimize_event_groups(self):
         """
-        Adaptive Grouping
+        Adaptive Grouping. 
+        The event groups defined for the architecture are affinity groups: events in the same group feed the same metrics 
+        and should be co-scheduled, so a group is split only if it can not be scheduled at all. 
+        The affinity groups are packed into as few multiplexed groups as possible, 
+        where all events of a multiplexed group must be assigned to distinct counters they are allowed to use 
+        (`.available_GP` general-purpose counters, restricted by per-event counter masks, and fixed counters). 
+        Since the multiplexed groups share the general-purpose counters in a round-robin manner, 
+        minimizing the number of multiplexed groups maximizes the time-share (coverage) of each event. 
+        For small catalogs (up to `EXACT_SOLVER_MAX_GROUPS` affinity groups), the optimal packing is found by branch-and-bound; 
+        otherwise (or if the search exceeds `EXACT_SOLVER_MAX_NODES`), the first-fit decreasing packing is used.
         """
-        filtered_event_groups = []
+        not_multiplexing_events = set(self.other_events + self.pinned_events)
 
-        not_multiplexing_events = self.other_events + self.pinned_events
+        # step 1. remove the events that are not multiplexed from the affinity groups, 
+        # and merge overlapping affinity groups, so that each event is counted in exactly one multiplexed group
+        affinity_groups = []
+        for event_group in self.__merge_overlapping_groups([ set(group) - not_multiplexing_events for group in self.event_groups ]):
+            if not self.__can_schedule(event_group):
+                # otherwise 'perf' would never schedule the whole group and report '<not counted>'
+                split_event_groups = self.__split_event_group(event_group)
+                self.logger.warning(f"event group {sorted(event_group)} can not be scheduled on the available counters "
+                                    f"({self.available_GP} general-purpose counters, {len(self.__pinned_gp_events)} of which are occupied by pinned events, "
+                                    f"and the fixed counters), "
+                                    f"it is split into {[ sorted(group) for group in split_event_groups ]}")
+                affinity_groups += split_event_groups
+            else:
+                affinity_groups.append(event_group)
 
-        for event_group in self.event_groups:
-            filtered_event_group = set()
-            for event in event_group: 
-                if event not in not_multiplexing_events:
-                    filtered_event_group.add(event)
-            if len(filtered_event_group) != 0:
-                filtered_event_groups.append(filtered_event_group)
+        # step 2. place larger groups first, which makes both first-fit and branch-and-bound converge quickly
+        affinity_groups.sort(key=len, reverse=True)
+
+        # step 3. first-fit decreasing, which also serves as the initial upper bound of branch-and-bound
+        packed_groups = self.__pack_first_fit(affinity_groups)
         
-        while True:
-            if len(filtered_event_groups) <= 1:
-                break
-
-            # Find G_i
-            g_size = 1000
-            for i, g in enumerate(filtered_event_groups):
-                if len(g) < g_size:
-                    g_size = len(g)
-                    g_i_index = i
-                    g_i = g
-            del filtered_event_groups[g_i_index]
-
-            # Find G_j
-            g_size = 1000
-            for i, g in enumerate(filtered_event_groups):
-                g_merged = g.union(g_i)
-                if len(g_merged) < g_size:
-                    g_size = len(g_merged)
-                    g_j_index = i
-                    g_j = g
-            del filtered_event_groups[g_j_index]
-
-            # Merge G_i and G_j
-            g_merged = g_j.union(g_i)
-            
-            if len(g_merged) <= self.available_GP:
-                filtered_event_groups.insert(0, g_merged)
+        # step 4. branch-and-bound if first-fit does not reach the lower bound
+        # events without fixed counters must share the general-purpose counters left by the pinned events
+        num_gp_events = len([ event for event in set().union(*affinity_groups)
+                              if all(counter[0] == "GP" for counter in self.counter_candidates.get(event, [])) ])
+        num_gp_counters = max(self.available_GP - len(self.__pinned_gp_events), 1)
+        lower_bound = max(-(-num_gp_events // num_gp_counters),
+                          len([ group for group in affinity_groups if not self.__can_schedule(group) ]))
+        if len(packed_groups) > lower_bound and len(affinity_groups) <= EventGroup.EXACT_SOLVER_MAX_GROUPS:
+            packed_groups = self.__pack_branch_and_bound(affinity_groups, packed_groups, lower_bound)
+
+        self.event_groups = packed_groups
+        self.logger.debug(f"{len(affinity_groups)} affinity groups are packed into {len(packed_groups)} multiplexed groups "
+                          f"(lower bound: {lower_bound})")
+        if len(packed_groups) > 0:
+            self.logger.info(f"expected time-share of each multiplexed event group: "
+                             f"{', '.join([ f'{share * 100:.1f}%' for share in self.get_time_share() ])}")
+
+    def __merge_overlapping_groups(self, event_groups: list) -> list:
+        """
+        Merge event groups sharing any event into one group, and discard empty groups. 
+        :param `event_groups`: a list of sets of event ids
+        :return: a list of disjoint sets of event ids
+        """
+        merged_groups = []
+        for group in event_groups:
+            group = set(group)
+            if len(group) == 0:
+                continue
+            for merged_group in [ merged_group for merged_group in merged_groups if merged_group & group ]:
+                group |= merged_group
+                merged_groups.remove(merged_group)
+            merged_groups.append(group)
+        return merged_groups
+
+    def __split_event_group(self, event_group: set) -> list:
+        """
+        Split an event group which can not be scheduled into smaller affinity groups along the dependencies of metrics, 
+        i.e. the events of the group required by the same metric are still kept together if they can be scheduled. 
+        :param `event_group`: a set of event ids
+        :return: a list of disjoint sets of event ids
+        """
+        sub_groups = [ expression.dependencies & event_group for expression in self.metric_expressions.values() ]
+        sub_groups += [ { event } for event in event_group ]
+        split_event_groups = []
+        for group in self.__merge_overlapping_groups(sub_groups):
+            if self.__can_schedule(group):
+                split_event_groups.append(group)
             else:
-                filtered_event_groups.insert(g_j_index, g_j)
-                filtered_event_groups.insert(g_i_index, g_i)
-                break
-        
-        self.event_groups = filtered_event_groups
-    
+                split_event_groups += [ { event } for event in sorted(group) ]
+        return split_event_groups
+
+    def __pack_first_fit(self, affinity_groups: list) -> list:
+        """
+        Pack affinity groups by first-fit: each group is merged into the first packed group that can schedule the union. 
+        :param `affinity_groups`: a list of sets of event ids, sorted by size in descending order
+        :return: a list of sets of event ids (packed groups)
+        """
+        packed_groups = []
+        for group in affinity_groups:
+            for packed_group in packed_groups:
+                if self.__can_schedule(packed_group | group):
+                    packed_group |= group
+                    break
+            else:
+                packed_groups.append(set(group))
+        return packed_groups
+
+    def __pack_branch_and_bound(self, affinity_groups: list, best_packed_groups: list, lower_bound: int) -> list:
+        """
+        Find the packing of affinity groups with the minimum number of packed groups by depth-first branch-and-bound. 
+        Each affinity group is either merged into an existing packed group or opens a new one, 
+        and a branch is pruned once it can not use fewer packed groups than the best packing found so far. 
+        :param `affinity_groups`: a list of sets of event ids, sorted by size in descending order
+        :param `best_packed_groups`: a feasible packing (e.g. by first-fit), used as the initial upper bound
+        :param `lower_bound`: the lower bound of the number of packed groups, the search stops once it is reached
+        :return: a list of sets of event ids (packed groups)
+        """
+        best = [ set(group) for group in best_packed_groups ]
+        packed_groups = []
+        num_nodes = 0
+
+        def search(i: int) -> bool:
+            """
+            Place the i-th affinity group and all the following ones. 
+            :return: `True` if the search should stop (lower bound reached or node budget exhausted)
+            """
+            nonlocal best, num_nodes
+            num_nodes += 1
+            if num_nodes > EventGroup.EXACT_SOLVER_MAX_NODES:
+                return True
+            if i == len(affinity_groups):
+                best = [ set(group) for group in packed_groups ]
+                return len(best) <= lower_bound
+            group = affinity_groups[i]
+            tried = []
+            for packed_group in packed_groups:
+                merged = packed_group | group
+                # skip the packed groups that can not schedule the union or are identical to a tried one (symmetric branches)
+                if packed_group in tried or not self.__can_schedule(merged):
+                    continue
+                tried.append(set(packed_group))
+                added = group - packed_group
+                packed_group |= added
+                stop = search(i + 1)
+                packed_group -= added
+                if stop:
+                    return True
+            # open a new packed group only if it can still improve the best packing
+            if len(packed_groups) + 1 < len(best):
+                packed_groups.append(set(group))
+                stop = search(i + 1)
+                packed_groups.pop()
+                if stop:
+                    return True
+            return False
+
+        search(0)
+        if num_nodes > EventGroup.EXACT_SOLVER_MAX_NODES:
+            self.logger.debug(f"branch-and-bound for event grouping exceeds {EventGroup.EXACT_SOLVER_MAX_NODES} nodes, "
+                              f"use the best packing found so far")
+        return best
+
+    def get_time_share(self) -> list:
+        """
+        Get the expected time-share of each multiplexed event group in `.event_groups`. 
+        The multiplexed groups are scheduled on the general-purpose counters in a round-robin manner, 
+        so each group is expected to be counted for 1 / (number of groups) of the time, 
+        while the pinned and other events are always counted. 
+        :return: a list of fractions in (0, 1], in the same order as `.event_groups`
+        """
+        num_groups = len(self.event_groups)
+        return [ 1 / num_groups for _ in range(num_groups) ]
+
     def __get_isa(self) -> str:
         """
         Determine the Instruction Set Architecture (ISA) of the SUT by analyzing the output of 'lscpu' command.
         :return: a string of ISA, such as 'x86_64', 'aarch64', etc.
         """
-        isa = self.connector.run_command("lscpu | grep 'Architecture:' | awk -F: '{print $2}'").strip()
+        isa = self.__get_lscpu_field("Architecture")
         self.logger.debug(f"ISA: {isa}")
         return isa
     
@@ -123,13 +545,13 @@ class EventGroup:
         Determine the architecture of the SUT by analyzing the output of 'lscpu' command.
         :return: a string of architecture
         """
-        processor = self.connector.run_command("lscpu | grep 'Model name:' | awk -F: '{print $2}'").strip()
+        processor = self.__get_lscpu_field("Model name")
         self.logger.debug(f"processor model: {processor}")
         # TODO: the following logic is simple, it should be refined in future
         if self.isa == "x86_64":
             if processor.find("Intel") != -1:
             # determine the microarchitecture code of intel processor by lscpu 'Model'
-                model = self.connector.run_command("lscpu | grep 'Model:' | awk -F: '{print $2}'").strip()
+                model = self.__get_lscpu_field("Model")
                 try:
                     model = int(model)
                     if model == 106:
@@ -158,9 +580,41 @@ class EventGroup:
         self.logger.debug(f"architecture model: {arch}")
         return arch
     
-    def get_event_groups_str(self) -> str:
+    def __get_lscpu_field(self, field: str) -> str:
+        """
+        Get the value of a field in the output of 'lscpu' of the SUT (`.sut`). 
+        :param `field`: the name of field, e.g. 'Architecture'
+        :return: a string of the value (empty if the field does not exist)
+        """
+        return self.sut.get_lscpu_field(field)
+
+    def get_num_passes(self) -> int:
+        """
+        Get the number of passes for multi-pass collection (`--multi-pass`), 
+        where each multiplexed event group is collected in a separate run of the workload without multiplexing. 
+        :return: the number of multiplexed event groups (at least 1)
+        """
+        return max(len(self.event_groups), 1)
+
+    def get_reference_event(self) -> dict:
+        """
+        Get the pinned event to which the passes of multi-pass collection are normalized (see `Analyzer.merge_passes()`). 
+        Instructions are preferred, since the progress of a deterministic workload is measured by retired instructions. 
+        :return: an item in `.events`, or `None` if no event is pinned
+        """
+        pinned_events = [ item for item in self.events if item["id"] in self.pinned_events ]
+        for item in pinned_events:
+            if item["perf_name"] == "instructions":
+                return item
+        return pinned_events[0] if len(pinned_events) > 0 else None
+
+    def get_event_groups_str(self, excluded_types: Sequence[str] = (), pass_index: int = None) -> str:
         """
         Get the string of event groups, which can be accepted by '-e' options of 'perf'.
+        :param `excluded_types`: types of events to exclude, e.g. `["SOCKET"]` since socket-wide events can not be 
+        attached to processes or cgroups
+        :param `pass_index`: for multi-pass collection, only the multiplexed event group of this pass is included, 
+        besides the pinned and other events which are collected in every pass
         """
         def get_event_by_id(id: int) -> str:
             """
@@ -171,12 +625,20 @@ class EventGroup:
                     return item["perf_name"]
             return ""
 
+        excluded_event_ids = { item["id"] for item in self.events if item.get("type") in excluded_types }
+
         event_groups_str = ""
         for other_event_id in self.other_events:
-            event_groups_str += (get_event_by_id(other_event_id) + ",")
+            if other_event_id not in excluded_event_ids:
+                event_groups_str += (get_event_by_id(other_event_id) + ",")
         for pinned_event_id in self.pinned_events:
-            event_groups_str += (get_event_by_id(pinned_event_id) + ":D" + ",")
-        for group in self.event_groups:
+            if pinned_event_id not in excluded_event_ids:
+                event_groups_str += (get_event_by_id(pinned_event_id) + ":D" + ",")
+        event_groups = self.event_groups if pass_index is None else [ self.event_groups[pass_index] ]
+        for group in event_groups:
+            group = [ event_id for event_id in group if event_id not in excluded_event_ids ]
+            if len(group) == 0:
+                continue
             event_groups_str += "'{"
             for event_id in group:
                 event_groups_str += (get_event_by_id(event_id) + ",")
@@ -7,6 +7,10 @@ The entrance of hperf. Users can invoke hperf from command line, like:
 ```
 $ python hperf.py [options] <command>
 ```
+or re-analyze the raw performance data of a previous run without profiling again, like:
+```
+$ python hperf.py analyze [options] <test_dir>
+```
 refer to README.md for supported options
 """
 if __name__ == "__main__":
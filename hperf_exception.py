@@ -8,6 +8,7 @@ BaseException
    |- HperfError
       |- ParserError
       |- ConnectorError
+      |- EventGroupError
       |- ProfilerError
       |- AnalyzerError
       |- LoggerError
@@ -27,6 +28,9 @@ class ParserError(HperfError):
 class ConnectorError(HperfError):
     pass
 
+class EventGroupError(HperfError):
+    pass
+
 class ProfilerError(HperfError):
     pass
 
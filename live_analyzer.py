@@ -0,0 +1,145 @@
+import io
+import logging
+from collections import deque
+import pandas as pd
+import numpy as np
+from connector import Connector
+from event_group import EventGroup
+from analyzer import Analyzer
+
+
+class LiveAnalyzer:
+    """
+    `LiveAnalyzer` is responsible for analyzing the raw performance data incrementally while the workload is running.
+    It tails `perf_result` on SUT through `Connector`, parses only the new bytes appended by perf since the last update,
+    and prints derived metrics of every interval.
+    The memory usage is bounded: only a ring buffer of recent intervals and running sums of all intervals are kept.
+    """
+
+    def __init__(self, connector: Connector, test_dir: str, configs: dict, event_groups: EventGroup, window: int = 60) -> None:
+        """
+        Constructor of `LiveAnalyzer`
+        :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
+        :param `test_dir`: a string of the path of (local) test directory
+        :param `configs`: a dict of parsed configurations (the member `configs` in `Controller`)
+        :param `event_groups`: an instance of `EventGroup`
+        :param `window`: the number of recent intervals kept in the ring buffer
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.connector: Connector = connector
+        self.test_dir: str = test_dir
+        self.event_groups: EventGroup = event_groups
+
+        # `Analyzer` is reused for the analysis of each batch of new intervals
+        self.analyzer = Analyzer(test_dir, configs, event_groups)
+
+        self.offset: int = 0    # the position in `perf_result` of bytes which have been read
+        self.buffer: bytes = b""    # an incomplete line at the end of bytes which have been read
+        self.pending: pd.DataFrame = None    # rows of the latest timestamp, the interval may not be completely written by perf
+
+        self.recent = deque(maxlen=window)    # ring buffer of recent intervals (timestamp | <event> | ... | <metric> | ...)
+        self.n_intervals: int = 0
+        self.event_sums = pd.Series(0.0, index=[ item["name"] for item in event_groups.events ])
+        self.metric_sums = pd.Series(0.0, index=[ item["metric"] for item in self.analyzer.metrics ])
+        self.metric_counts = pd.Series(0, index=[ item["metric"] for item in self.analyzer.metrics ])
+
+    def update(self):
+        """
+        Read new bytes appended to `perf_result` and analyze the intervals completed since the last update.
+        This method is supposed to be called periodically during profiling (see `Profiler.profile()`).
+        """
+        self.__read_new_intervals()
+
+        # the rows of the latest timestamp are held until a later timestamp appears
+        if self.pending is not None and len(self.pending) > 0:
+            latest = self.pending["timestamp"].max()
+            completed = self.pending[self.pending["timestamp"] < latest]
+            self.pending = self.pending[self.pending["timestamp"] == latest]
+            self.__consume(completed)
+
+    def finish(self):
+        """
+        Analyze all remaining intervals after profiling finished.
+        """
+        self.__read_new_intervals()
+        if self.buffer:
+            self.__append(self.buffer)
+            self.buffer = b""
+        if self.pending is not None:
+            self.__consume(self.pending)
+            self.pending = None
+
+    def __read_new_intervals(self):
+        """
+        Read the new bytes of `perf_result` and append the complete lines to `.pending`.
+        """
+        chunk = self.connector.read_file("perf_result", self.offset)
+        self.offset += len(chunk)
+        data = self.buffer + chunk
+        end = data.rfind(b"\n")
+        if end == -1:
+            self.buffer = data
+            return
+        self.buffer = data[end + 1:]
+        self.__append(data[:end + 1])
+
+    def __append(self, data: bytes):
+        """
+        Parse lines of raw performance data and append them to `.pending`.
+        :param `data`: bytes of complete lines of `perf_result`
+        """
+        rows = Analyzer.read_perf_result(io.BytesIO(data))
+        if self.pending is None or len(self.pending) == 0:
+            self.pending = rows
+        else:
+            self.pending = pd.concat([self.pending, rows], ignore_index=True)
+
+    def __consume(self, raw_data: pd.DataFrame):
+        """
+        Analyze completed intervals, update the ring buffer and running sums, then print derived metrics.
+        :param `raw_data`: a DataFrame of raw performance data of completed intervals
+        """
+        if len(raw_data) == 0:
+            return
+        timeseries, _ = self.analyzer.analyze_raw_data(raw_data)
+
+        self.n_intervals += len(timeseries)
+        self.event_sums += timeseries[self.event_sums.index].sum()
+        self.metric_sums += timeseries[self.metric_sums.index].sum()    # NaN (e.g. division by zero) is skipped
+        self.metric_counts += timeseries[self.metric_counts.index].notna().sum()
+        for _, row in timeseries.iterrows():
+            self.recent.append(row)
+
+        self.__print_report()
+
+    def __print_report(self):
+        """
+        Print the metrics of the latest interval, the average over recent intervals and the average over all intervals.
+        """
+        recent = self.get_recent_timeseries()
+        metrics = list(self.metric_sums.index)
+        report = pd.DataFrame({
+            "LAST": recent.iloc[-1][metrics],
+            f"LAST {len(recent)}": recent[metrics].mean(),
+            "ALL": self.metric_sums / self.metric_counts.replace(0, np.nan),
+        })
+        low_coverage = " (LOW COVERAGE)" if recent.iloc[-1]["LOW COVERAGE"] else ""
+        print(f"[{recent.iloc[-1]['timestamp']:.3f}s, {self.n_intervals} intervals]{low_coverage}")
+        print(report.to_string())
+
+    def get_recent_timeseries(self) -> pd.DataFrame:
+        """
+        Get the timeseries of recent intervals in the ring buffer.
+        :return: a DataFrame of timeseries: timestamp | <event> | ... | <event> | <metric> | ... | <metric>
+        """
+        return pd.DataFrame(list(self.recent)).reset_index(drop=True)
+
+    def get_aggregated_metrics(self) -> pd.DataFrame:
+        """
+        Get the aggregated metrics of all analyzed intervals from running sums,
+        for events, get the sum of values; for metrics, get the average of values (same as `Analyzer.get_aggregated_metrics()`).
+        :return: a DataFrame with a single row of aggregated results
+        """
+        metric_results = pd.concat([self.event_sums, self.metric_sums / self.metric_counts.replace(0, np.nan)])
+        return pd.DataFrame(metric_results).T.reset_index(drop=True)
@@ -0,0 +1,100 @@
+import ast
+import re
+import numpy as np
+from hperf_exception import EventGroupError
+
+
+class MetricExpression:
+    """
+    `MetricExpression` is a compiled form of a metric expression defined in `arch/<arch_name>.py`,
+    such as `"(1000 * e30) / e21"`, where `eNN` refers to the event with id `NN`.
+    The expression is parsed and validated only once, then it can be evaluated over whole columns (NumPy arrays) of event counts.
+    """
+
+    # operators which are allowed in metric expressions
+    __BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+    __UNARY_OPERATORS = (ast.UAdd, ast.USub)
+    __EVENT_PATTERN = re.compile(r"e(\d+)")
+
+    def __init__(self, metric: str, expression: str, event_ids: set) -> None:
+        """
+        Constructor of `MetricExpression`.
+        :param `metric`: the name of metric, e.g. `"L1 CACHE MPKI"`
+        :param `expression`: a string of expression, e.g. `"(1000 * e30) / e21"`
+        :param `event_ids`: a set of ids of events defined in the same arch module
+        :raises:
+            `EventGroupError`: if the expression is not well-formed or references an undefined event id
+        """
+        self.metric: str = metric
+        self.expression: str = expression
+        self.dependencies: set = set()    # ids of events required by this metric
+
+        try:
+            tree = ast.parse(expression, mode="eval")
+        except SyntaxError:
+            raise EventGroupError(f"Invalid expression of metric {metric}: {expression}")
+
+        # replace every division `a / b` by a call of `__safe_div(a, b)`
+        # and every event `eNN` by a lookup of `NN` in the mapping of event values
+        tree = self.__transform(tree.body)
+        tree = ast.fix_missing_locations(ast.Expression(body=tree))
+        self.__code = compile(tree, f"<metric {metric}>", "eval")
+
+        undefined_event_ids = self.dependencies - set(event_ids)
+        if undefined_event_ids:
+            raise EventGroupError(f"Undefined events {sorted(undefined_event_ids)} in expression of metric {metric}: {expression}")
+
+    def __transform(self, node: ast.AST) -> ast.AST:
+        """
+        Validate a node of the parsed expression and transform it to a vectorized form recursively.
+        :param `node`: a node of the abstract syntax tree
+        :return: the transformed node
+        :raises:
+            `EventGroupError`: if the node is not allowed in metric expressions
+        """
+        if isinstance(node, ast.BinOp) and isinstance(node.op, self.__BINARY_OPERATORS):
+            left = self.__transform(node.left)
+            right = self.__transform(node.right)
+            if isinstance(node.op, ast.Div):
+                return ast.Call(func=ast.Name(id="safe_div", ctx=ast.Load()), args=[left, right], keywords=[])
+            return ast.BinOp(left=left, op=node.op, right=right)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, self.__UNARY_OPERATORS):
+            return ast.UnaryOp(op=node.op, operand=self.__transform(node.operand))
+        elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            return node
+        elif isinstance(node, ast.Name):
+            obj = self.__EVENT_PATTERN.fullmatch(node.id)
+            if obj:
+                event_id = int(obj.group(1))
+                self.dependencies.add(event_id)
+                return ast.Subscript(value=ast.Name(id="values", ctx=ast.Load()),
+                                     slice=ast.Constant(value=event_id),
+                                     ctx=ast.Load())
+        raise EventGroupError(f"Invalid expression of metric {self.metric}: {self.expression}")
+
+    @staticmethod
+    def safe_div(dividend, divisor) -> np.ndarray:
+        """
+        Element-wise division where a zero divisor results in `NaN` instead of a warning, `inf` or `ZeroDivisionError`.
+        :param `dividend`: a NumPy array or a scalar
+        :param `divisor`: a NumPy array or a scalar
+        :return: a NumPy array of quotients
+        """
+        dividend, divisor = np.broadcast_arrays(np.asarray(dividend, dtype=np.float64),
+                                                np.asarray(divisor, dtype=np.float64))
+        result = np.full(dividend.shape, np.nan)
+        np.divide(dividend, divisor, out=result, where=(divisor != 0))
+        return result
+
+    def __call__(self, values: dict) -> np.ndarray:
+        """
+        Evaluate the metric over whole columns of event counts.
+        :param `values`: a dict mapping event ids to NumPy arrays (or scalars) of event counts,
+        it should contain all events in `.dependencies`
+        :return: a NumPy array of metric results
+        """
+        return np.asarray(eval(self.__code, {"__builtins__": {}, "safe_div": self.safe_div, "values": values}),
+                          dtype=np.float64)
+
+    def __repr__(self) -> str:
+        return f"MetricExpression({self.metric!r}, {self.expression!r})"
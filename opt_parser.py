@@ -1,8 +1,8 @@
 from argparse import ArgumentParser, REMAINDER
 from typing import Sequence
 import logging
+import os
 import sys
-from getpass import getpass
 from hperf_exception import ParserError
 
 
@@ -38,11 +38,36 @@ class OptParser:
         self.parser.add_argument("-V", "--version",
                                  action="store_true",
                                  help="show the version and exit")
-        #   [-r/--remote SSH_CONN_STR]
-        self.parser.add_argument("-r", "--remote",
-                                 metavar="SSH_CONN_STR",
+        #   [-r/--remote SSH_CONN_STR] | [--hosts SSH_CONN_STR_LIST] | [--hosts-file PATH]
+        # for multiple hosts, profiling is conducted on all hosts concurrently and starts at the same time
+        host_group = self.parser.add_mutually_exclusive_group()
+        host_group.add_argument("-r", "--remote",
+                                metavar="SSH_CONN_STR",
+                                type=str,
+                                help="profiling on remote host by specifying a SSH connection string (default on local host)")
+        host_group.add_argument("--hosts",
+                                metavar="SSH_CONN_STR_LIST",
+                                type=str,
+                                help="profiling on multiple remote hosts by passing a comma-separated list of SSH connection strings")
+        host_group.add_argument("--hosts-file",
+                                metavar="PATH",
+                                type=str,
+                                help="profiling on multiple remote hosts listed in an inventory file, one SSH connection string per line")
+        #   [-p/--port PORT], [-i/--identity-file PATH]
+        # by default, the port, username and private key are looked up in '~/.ssh/config', 
+        # and the SSH session is authenticated by private keys or ssh-agent, the password is asked only if they fail
+        self.parser.add_argument("-p", "--port",
+                                 metavar="PORT",
+                                 type=int,
+                                 help="port of SSH on remote hosts (default 22)")
+        self.parser.add_argument("-i", "--identity-file",
+                                 metavar="PATH",
                                  type=str,
-                                 help="profiling on remote host by specifying a SSH connection string (default on local host)")
+                                 help="private key file for SSH authentication")
+        #   [--non-interactive]
+        self.parser.add_argument("--non-interactive",
+                                 action="store_true",
+                                 help="never ask the user, i.e. fail instead of asking for the password, and continue profiling when sanity check fails")
         #   [--tmp-dir]
         self.parser.add_argument("--tmp-dir",
                                  metavar="TMP_DIR_PATH",
@@ -54,15 +79,144 @@ class OptParser:
                                  action="store_true",
                                  help="increase output verbosity")
 
+        #   [-I/--interval INTERVAL_MS]
+        # perf accepts intervals down to 10 ms, however, a short interval increases the overhead and the volume of raw performance data.
+        self.parser.add_argument("-I", "--interval",
+                                 metavar="INTERVAL_MS",
+                                 type=int,
+                                 default=1000,
+                                 help="sampling interval in milliseconds, at least 10 (default 1000)")
+
+        #   [--pid PID_LIST] | [-G/--cgroup CGROUP_LIST]
+        # attach perf to running processes, or count for each cgroup (container) instead of the whole system. 
+        # In these modes, COMMAND is optional: if specified (e.g. 'sleep 60'), profiling lasts until it finishes, 
+        # otherwise profiling lasts until Ctrl-C is pressed.
+        target_group = self.parser.add_mutually_exclusive_group()
+        target_group.add_argument("--pid",
+                                  metavar="PID_LIST",
+                                  type=str,
+                                  help="attach to running processes by passing a comma-separated list of pids")
+        target_group.add_argument("-G", "--cgroup",
+                                  metavar="CGROUP_LIST",
+                                  type=str,
+                                  help="count for each cgroup by passing a comma-separated list of cgroup names, e.g. 'system.slice/nginx.service'")
+
+        #   [--duration SECONDS], [--delay SECONDS], [--start-when-cpu-util PERCENTAGE], [--max-intervals N]
+        # capture window: by default, profiling lasts as long as the workload.
+        self.parser.add_argument("--duration",
+                                 metavar="SECONDS",
+                                 type=float,
+                                 help="stop profiling after the specified seconds (not including the delay)")
+        self.parser.add_argument("--delay",
+                                 metavar="SECONDS",
+                                 type=float,
+                                 help="skip the warm-up by starting counting after the specified seconds")
+        self.parser.add_argument("--start-when-cpu-util",
+                                 metavar="PERCENTAGE",
+                                 type=float,
+                                 help="start profiling when the CPU utilization of the SUT exceeds the specified percentage (not available with a workload)")
+        self.parser.add_argument("--max-intervals",
+                                 metavar="N",
+                                 type=int,
+                                 help="stop profiling after the specified number of intervals")
+
+        #   [--collectors COLLECTOR_LIST]
+        # auxiliary collectors run concurrently with perf, e.g. 'sar,proc' (perf is always used)
+        self.parser.add_argument("--collectors",
+                                 metavar="COLLECTOR_LIST",
+                                 type=str,
+                                 default="perf",
+                                 help="collectors run concurrently by passing a comma-separated list of 'perf', 'sar' and 'proc' (default 'perf')")
+
+        #   [--sut-cache-ttl SECONDS]
+        # the hardware description of the SUT is cached in '<TMP_DIR>/.sut_cache/', so that repeated runs skip the discovery
+        self.parser.add_argument("--sut-cache-ttl",
+                                 metavar="SECONDS",
+                                 type=float,
+                                 default=86400,
+                                 help="time to live of the cached hardware description of the SUT, 0 to disable the cache (default 86400)")
+
+        #   [--no-probe]
+        # by default, each event is probed by a dry run of 'perf stat' before profiling, and unsupported events are dropped
+        self.parser.add_argument("--no-probe",
+                                 action="store_true",
+                                 help="do not probe the PMUs of the SUT for unsupported events before profiling")
+
+        #   [-c/--cpu CPU_ID_LIST], [--coverage-threshold PERCENTAGE], [--metrics METRIC_LIST]
+        self.__add_analysis_arguments(self.parser)
+
+        #   [--live]
+        # analyze and print derived metrics of every interval while the workload is running
+        self.parser.add_argument("--live",
+                                 action="store_true",
+                                 help="analyze and print derived metrics of every interval while the workload is running")
+
+        #   [--multi-pass]
+        # run the workload once for each multiplexed event group, so that no event is multiplexed
+        self.parser.add_argument("--multi-pass",
+                                 action="store_true",
+                                 help="run the workload once for each event group instead of multiplexing the groups, "
+                                      "and merge the passes by normalizing to the pinned events (for deterministic workloads)")
+
+        # `OptParser` for re-analysis mode: `python hperf.py analyze [options] TEST_DIR`
+        self.analyze_parser = ArgumentParser(prog="python hperf.py analyze",
+                                             description="re-analyze the raw performance data in an existing test directory without profiling again")
+        self.analyze_parser.add_argument("test_dir",
+                                         metavar="TEST_DIR",
+                                         type=str,
+                                         help="test directory of a previous run, e.g. '/tmp/hperf/20230612_test001'")
+        self.analyze_parser.add_argument("-v", "--verbose",
+                                         action="store_true",
+                                         help="increase output verbosity")
+        self.__add_analysis_arguments(self.analyze_parser)
+        # options not specified in re-analysis mode default to the configurations of the original run (see `Controller`)
+        self.analyze_parser.set_defaults(cpu=None, coverage_threshold=None)
+        #   [--window START,END]
+        self.analyze_parser.add_argument("--window",
+                                         metavar="START,END",
+                                         type=str,
+                                         help="only analyze the intervals with timestamps (in seconds since the start of profiling) in [START, END], "
+                                              "either bound can be omitted, e.g. '10,' or ',60'")
+
+    def __add_analysis_arguments(self, parser: ArgumentParser):
+        """
+        Add the options which affect the analysis of raw performance data, 
+        which are shared by the profiling mode and the re-analysis mode. 
+        :param `parser`: an instance of `ArgumentParser`
+        """
         #   [--cpu CPU]
         # hperf will conduct a system-wide profiling so that the list will not affect performance data collection
         # but will affect the aggregation of raw performance data.
         # If not specified, 'Analyzer' will aggregate performance data of all cpus.
-        self.parser.add_argument("-c", "--cpu",
-                                 metavar="CPU_ID_LIST",
-                                 type=str,
-                                 default="all",
-                                 help="specify the scope of performance data aggregation by passing a list of cpu ids.")
+        parser.add_argument("-c", "--cpu",
+                            metavar="CPU_ID_LIST",
+                            type=str,
+                            default="all",
+                            help="specify the scope of performance data aggregation by passing a list of cpu ids.")
+
+        #   [--coverage-threshold PERCENTAGE]
+        # intervals where any event ran on the counter below this percentage of time (due to multiplexing) will be flagged.
+        parser.add_argument("--coverage-threshold",
+                            metavar="PERCENTAGE",
+                            type=float,
+                            default=20.0,
+                            help="flag intervals where any event ran on the counter below this percentage of time (default 20)")
+
+        #   [--metrics METRIC_LIST]
+        # If not specified, all metrics defined for the architecture of the SUT will be computed.
+        # Otherwise, only the events required by the specified metrics will be collected.
+        parser.add_argument("--metrics",
+                            metavar="METRIC_LIST",
+                            type=str,
+                            help="specify the metrics to collect and compute by passing a comma-separated list of metric names "
+                                 "or categories (general, cache, memory, branch, tlb, ...), e.g. 'CPI,cache'")
+
+        #   [--breakdown LEVEL_LIST]
+        # If specified, besides the results aggregated over all selected cpus, metrics will be computed for each unit of the levels.
+        parser.add_argument("--breakdown",
+                            metavar="LEVEL_LIST",
+                            type=str,
+                            help="compute metrics for each cpu, physical core or socket by passing a comma-separated list of levels, e.g. 'core,socket'")
 
     def parse_args(self, argv: Sequence[str]) -> dict:
         """
@@ -75,6 +229,11 @@ class OptParser:
         """
         configs = {}
 
+        # re-analysis mode: `python hperf.py analyze [options] TEST_DIR`
+        if len(argv) > 0 and argv[0] == "analyze":
+            return self.__parse_analyze_args(argv[1:])
+        configs["mode"] = "profile"
+
         args = self.parser.parse_args(argv)
         # Note: if `ArgumentParser` detect `-h`/`--help` option, 
         # it will print help message and raise a `SystemExit` exception to exit the program.
@@ -98,36 +257,204 @@ class OptParser:
         if args.verbose:
             configs["verbose"] = True
 
-        # step 1. workload command
-        # if command is empty, raise an exception and exit the program
+        # step 1. workload command and target of profiling
+        # if command is empty, raise an exception and exit the program, 
+        # unless perf is attached to processes or cgroups, where profiling lasts until Ctrl-C is pressed
         if args.command:
             configs["command"] = " ".join(args.command)
-        else:
+        elif not (args.pid or args.cgroup):
             raise ParserError("Workload is not specified.")
 
+        if args.pid:
+            try:
+                configs["pid"] = [ int(pid) for pid in args.pid.split(",") ]
+            except ValueError:
+                raise ParserError(f"Invalid argument {args.pid} for --pid option")
+            # counts are aggregated over all cpus by perf when it is attached to processes
+            if args.cpu != "all" or args.breakdown:
+                raise ParserError("-c/--cpu and --breakdown options are not available with --pid option")
+        if args.cgroup:
+            configs["cgroup"] = [ item.strip() for item in args.cgroup.split(",") if item.strip() != "" ]
+            if len(configs["cgroup"]) == 0:
+                raise ParserError(f"Invalid argument {args.cgroup} for -G/--cgroup option")
+
         # step 2. local / remote SUT (default local)
+        if args.non_interactive:
+            configs["non_interactive"] = True
         if args.remote:
             configs["host_type"] = "remote"
-            remote_configs = self.__parse_remote_str(args.remote)
-            # add keys: hostname, username, password
+            remote_configs = self.__parse_remote_str(args.remote, args)
+            # add keys: hostname, username, port, key_filename
             configs.update(remote_configs)
+        elif args.hosts or args.hosts_file:
+            configs["host_type"] = "cluster"
+            # a list of dicts with keys: hostname, username, port, key_filename
+            configs["hosts"] = [ self.__parse_remote_str(ssh_conn_str, args) for ssh_conn_str in self.__parse_host_list(args) ]
+            if args.live:
+                raise ParserError("--live option is not available with multiple hosts")
         else:
             configs["host_type"] = "local"
+            if args.port is not None or args.identity_file:
+                raise ParserError("-p/--port and -i/--identity-file options are only available for remote hosts")
 
-        # step 3. scope of performance data aggregation
-        if args.cpu != "all":
-            configs["cpu_list"] = self.__parse_cpu_list(args.cpu)
-        else:
-            configs["cpu_list"] = "all"
+        # step 3. scope of performance data aggregation, threshold of coverage and metrics
+        configs.update(self.__parse_analysis_args(args))
 
         # step 4. temporary directory
         if args.tmp_dir:
             configs["tmp_dir"] = args.tmp_dir
 
+        # step 5. live mode
+        if args.live:
+            configs["live"] = True
+
+        # step 6. sampling interval
+        if args.interval < 10:
+            raise ParserError(f"Invalid argument {args.interval} for -I/--interval option (at least 10 ms)")
+        configs["interval"] = args.interval
+
+        # step 7. capture window
+        if args.duration is not None:
+            if args.duration <= 0:
+                raise ParserError(f"Invalid argument {args.duration} for --duration option")
+            configs["duration"] = args.duration
+        if args.delay is not None:
+            if args.delay < 0:
+                raise ParserError(f"Invalid argument {args.delay} for --delay option")
+            configs["delay"] = args.delay
+        if args.start_when_cpu_util is not None:
+            if args.start_when_cpu_util <= 0 or args.start_when_cpu_util > 100:
+                raise ParserError(f"Invalid argument {args.start_when_cpu_util} for --start-when-cpu-util option")
+            # the workload is launched by perf after the trigger, so it could never raise the CPU utilization itself
+            if "command" in configs:
+                raise ParserError("--start-when-cpu-util option is not available with a workload, "
+                                  "use it with --pid, -G/--cgroup or system-wide profiling instead")
+            configs["start_cpu_util"] = args.start_when_cpu_util
+        if args.max_intervals is not None:
+            if args.max_intervals < 1:
+                raise ParserError(f"Invalid argument {args.max_intervals} for --max-intervals option")
+            configs["max_intervals"] = args.max_intervals
+
+        # step 8. collectors
+        configs["collectors"] = []
+        for collector in args.collectors.split(","):
+            collector = collector.strip()
+            if collector not in ("perf", "sar", "proc"):
+                raise ParserError(f"Invalid argument {args.collectors} for --collectors option")
+            if collector not in configs["collectors"]:
+                configs["collectors"].append(collector)
+
+        # step 9. cache of SUT description
+        if args.sut_cache_ttl < 0:
+            raise ParserError(f"Invalid argument {args.sut_cache_ttl} for --sut-cache-ttl option")
+        configs["sut_cache_ttl"] = args.sut_cache_ttl
+        if args.no_probe:
+            configs["no_probe"] = True
+
+        # step 10. multi-pass collection, which re-runs the workload for each pass
+        if args.multi_pass:
+            if "command" not in configs:
+                raise ParserError("--multi-pass option requires a workload to re-run")
+            if args.live or configs["host_type"] == "cluster":
+                raise ParserError("--multi-pass option is not available with --live option or multiple hosts")
+            configs["multi_pass"] = True
+
+        self.logger.debug(f"parsed configurations: {configs}")
+
+        return configs
+
+    def __parse_analyze_args(self, argv: Sequence[str]) -> dict:
+        """
+        Parse and validate the options and arguments for re-analysis mode (`python hperf.py analyze [options] TEST_DIR`). 
+        :param `argv`: a list of arguments following 'analyze'
+        :return: a dict of configurations for this run
+        :raises:
+            `SystemExit`: for `-h` option, it will print corresponding information and exit program 
+            `ParserError`: if options and arguments are invalid 
+        """
+        configs = {}
+        configs["mode"] = "analyze"
+
+        args = self.analyze_parser.parse_args(argv)
+
+        if args.verbose:
+            configs["verbose"] = True
+
+        configs["test_dir"] = os.path.abspath(args.test_dir)
+        if not os.path.isdir(configs["test_dir"]):
+            raise ParserError(f"Test directory {args.test_dir} does not exist.")
+
+        configs.update(self.__parse_analysis_args(args))
+
+        if args.window:
+            configs["window"] = self.__parse_window(args.window)
+
         self.logger.debug(f"parsed configurations: {configs}")
 
         return configs
 
+    def __parse_analysis_args(self, args) -> dict:
+        """
+        Parse and validate the options added by `.__add_analysis_arguments()`. 
+        :param `args`: the namespace returned by `ArgumentParser.parse_args()`
+        :return: a dict of configurations for analysis
+        :raises:
+            `ParserError`: if options and arguments are invalid 
+        """
+        configs = {}
+
+        # scope of performance data aggregation 
+        # (in re-analysis mode, options which are not specified are `None` and omitted in the configurations)
+        if args.cpu is not None:
+            if args.cpu != "all":
+                configs["cpu_list"] = self.__parse_cpu_list(args.cpu)
+            else:
+                configs["cpu_list"] = "all"
+
+        # threshold of coverage
+        if args.coverage_threshold is not None:
+            if args.coverage_threshold < 0 or args.coverage_threshold > 100:
+                raise ParserError(f"Invalid argument {args.coverage_threshold} for --coverage-threshold option")
+            configs["coverage_threshold"] = args.coverage_threshold
+
+        # metrics (the names will be validated by `EventGroup` and `Analyzer` since they depend on the architecture)
+        if args.metrics:
+            configs["metrics"] = [ item.strip() for item in args.metrics.split(",") if item.strip() != "" ]
+            if len(configs["metrics"]) == 0:
+                raise ParserError(f"Invalid argument {args.metrics} for --metrics option")
+
+        # levels of breakdown
+        if args.breakdown:
+            configs["breakdown"] = []
+            for level in args.breakdown.split(","):
+                level = level.strip()
+                if level not in ("cpu", "core", "socket"):
+                    raise ParserError(f"Invalid argument {args.breakdown} for --breakdown option")
+                if level not in configs["breakdown"]:
+                    configs["breakdown"].append(level)
+
+        return configs
+
+    def __parse_window(self, window: str) -> list:
+        """
+        Parse the string of time window with the format of `START,END`, where either bound can be omitted. 
+
+        e.g. if `window = '10,'`, the method will return `[10.0, None]`
+        :param `window`: a string of time window
+        :return: a list of the start and the end of the window (in seconds)
+        :raises:
+            `ParserError`: if the string of time window is invalid
+        """
+        try:
+            start, end = window.split(",")
+            start = float(start) if start.strip() != "" else None
+            end = float(end) if end.strip() != "" else None
+        except ValueError:
+            raise ParserError(f"Invalid argument {window} for --window option")
+        if start is not None and end is not None and start > end:
+            raise ParserError(f"Invalid argument {window} for --window option")
+        return [start, end]
+
     def __parse_cpu_list(self, cpu_list: str) -> list:
         """
         Parse the string of cpu list with comma (`,`) and hyphen (`-`), and get the list of cpu ids. 
@@ -162,34 +489,71 @@ class OptParser:
                 raise ParserError(f"Invalid argument {cpu_list} for -c/--cpu option")
         return reduced_cpu_ids
 
-    def __parse_remote_str(self, ssh_conn_str: str) -> dict:
+    def __parse_host_list(self, args) -> list:
         """
-        Parse the SSH connection string with the format of `username@hostname`, then ask user to enter the password.
-        :param `ssh_conn_str`: SSH connection string
-        :return: a dict of remote host informations which can be updated to `configs` in method `.parse_args()`
+        Get the list of SSH connection strings from `--hosts` option, or from the inventory file of `--hosts-file` option, 
+        where empty lines and comments (beginning with '#') are ignored. 
+        :param `args`: the parsed arguments
+        :return: a list of SSH connection strings
         :raises:
-            `ParserError`: if the SSH connection string is invalid 
+            `ParserError`: if the inventory file can not be read, or the list is empty or has duplicate hosts
         """
-        # TODO: try to parse all information for the remote SSH connection from the parameter of -r / --remote option.
-        # e.g. ssh_conn_str = "tongyu@ampere.solelab.tech"
+        if args.hosts:
+            ssh_conn_strs = [ item.strip() for item in args.hosts.split(",") if item.strip() != "" ]
+        else:
+            try:
+                with open(args.hosts_file) as f:
+                    lines = [ line.split("#", 1)[0].strip() for line in f ]
+            except IOError:
+                raise ParserError(f"Fail to read the inventory file {args.hosts_file} for --hosts-file option")
+            ssh_conn_strs = [ line for line in lines if line != "" ]
+        if len(ssh_conn_strs) == 0:
+            raise ParserError("No host is specified for --hosts or --hosts-file option")
+
+        # the results of each host are saved in a sub-directory named by its hostname
+        hostnames = [ ssh_conn_str.split("@")[-1].split(":")[0] for ssh_conn_str in ssh_conn_strs ]
+        if len(set(hostnames)) != len(hostnames):
+            raise ParserError("Duplicate hosts for --hosts or --hosts-file option")
+        return ssh_conn_strs
 
+    def __parse_remote_str(self, ssh_conn_str: str, args) -> dict:
+        """
+        Parse the SSH connection string with the format of `[username@]hostname[:port]`, 
+        where the hostname can be an alias defined in `~/.ssh/config`. 
+        The password is not asked here, it is asked by `RemoteConnector` only if authentication by private keys or ssh-agent fails. 
+        :param `ssh_conn_str`: SSH connection string
+        :param `args`: the parsed arguments, for `-p/--port` and `-i/--identity-file` options
+        :return: a dict of remote host informations which can be updated to `configs` in method `.parse_args()`, 
+        where the username, port and private key file are `None` if they are not specified
+        :raises:
+            `ParserError`: if the SSH connection string or the port is invalid 
+        """
         remote_configs = {}
-        # parse the SSH connection string to get hostname and username
+        # parse the SSH connection string to get hostname, username and port
         try:
-            # TODO: enhance the logic of parsing SSH connection string
-            remote_configs["username"]: str = ssh_conn_str.split("@")[0]
-            remote_configs["hostname"]: str = ssh_conn_str.split("@")[1]
-            if remote_configs["username"] == "" or remote_configs["hostname"] == "":
+            if ssh_conn_str.find("@") != -1:
+                remote_configs["username"], address = ssh_conn_str.rsplit("@", 1)
+                if remote_configs["username"] == "":
+                    raise ValueError
+            else:
+                remote_configs["username"], address = None, ssh_conn_str
+            if address.find(":") != -1:
+                remote_configs["hostname"], port = address.split(":", 1)
+                remote_configs["port"] = int(port)
+            else:
+                remote_configs["hostname"], remote_configs["port"] = address, args.port
+            if remote_configs["hostname"] == "":
                 raise ValueError
-        except (IndexError, ValueError):
+        except ValueError:
             raise ParserError(f"Invalid SSH connection string: {ssh_conn_str}")
+        if remote_configs["port"] is not None and not 0 < remote_configs["port"] < 65536:
+            raise ParserError(f"Invalid port of SSH: {remote_configs['port']}")
 
-        # get the password by command line interaction
-        remote_configs["password"] = getpass(f'connect to {remote_configs["hostname"]}, '
-                                             f'enter the password for user {remote_configs["username"]}: ')
-
-        # TODO: other configurations may be used in future
-        # remote_configs["port"] = 22
-        # remote_configs["private_key"] = "~/.ssh/id_rsa"
+        if args.identity_file:
+            remote_configs["key_filename"] = os.path.expanduser(args.identity_file)
+            if not os.path.isfile(remote_configs["key_filename"]):
+                raise ParserError(f"Invalid argument {args.identity_file} for -i/--identity-file option")
+        else:
+            remote_configs["key_filename"] = None
 
         return remote_configs
@@ -0,0 +1,117 @@
+"""
+This module includes the reader of the raw performance data generated by perf in interval mode with CSV-style output,
+i.e. `perf stat -A -a -x "\t" -I <interval> ...`.
+Each line of the output has the following fields:
+```
+timestamp | unit | value | unit of value | event | run time | percentage | metric value | metric unit
+1.0010475 | CPU0 | 130992 |              | r08d1 | 511300367 | 50.03    | 127.980      | K/sec
+```
+The value is `<not counted>` if the event is not scheduled in the interval, or `<not supported>` if it can not be measured.
+
+When perf is attached to processes (`-p`), counts are aggregated over all cpus so that there is no field of unit;
+when perf counts for each cgroup (`--for-each-cgroup`), there is a field of cgroup following the event.
+The layout is detected from the first line (see `detect_layout()`).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# columns kept by `read_perf_result()` and their positions in a line of the output of perf, for each layout
+PERF_RESULT_LAYOUTS = {
+    # perf stat -A -a ...
+    "per_cpu": (["timestamp", "unit", "value", "metric", "run_time", "coverage"], [0, 1, 2, 4, 5, 6]),
+    # perf stat -A -a --for-each-cgroup ...
+    "per_cgroup": (["timestamp", "unit", "value", "metric", "cgroup", "run_time", "coverage"], [0, 1, 2, 4, 5, 6, 7]),
+    # perf stat -p ...
+    "aggregated": (["timestamp", "value", "metric", "run_time", "coverage"], [0, 1, 3, 4, 5]),
+}
+
+# the unit of all rows when counts are aggregated over all cpus by perf
+AGGREGATED_UNIT = "ALL"
+
+# tokens in the column of value which represent the event is not measured in the interval
+NOT_COUNTED_TOKENS = ["<not counted>", "<not supported>"]
+
+
+def detect_layout(file) -> str:
+    """
+    Detect the layout of the raw performance data from its first line.
+    :param `file`: the path of the raw performance data file, or a seekable file-like object
+    :return: a key of `PERF_RESULT_LAYOUTS`, 'per_cpu' if the file is empty
+    """
+    if hasattr(file, "read"):
+        position = file.tell()
+        first_line = file.readline()
+        file.seek(position)
+    else:
+        with open(file, "rb") as f:
+            first_line = f.readline()
+    if isinstance(first_line, bytes):
+        first_line = first_line.decode("utf-8", errors="replace")
+
+    fields = first_line.rstrip("\n").split("\t")
+    if len(fields) < 2 or fields[1].startswith("CPU"):
+        # run time is numeric (or empty), otherwise it is the name of cgroup, e.g. '/system.slice/nginx.service'
+        if len(fields) > 5 and fields[5].strip() != "" and not fields[5].strip().replace(".", "", 1).isdigit():
+            return "per_cgroup"
+        return "per_cpu"
+    return "aggregated"
+
+
+def read_perf_result(file) -> pd.DataFrame:
+    """
+    Read the raw performance data generated by perf and convert it to a compact DataFrame with native types:
+    - 'timestamp': float64, seconds relative to the start of profiling
+    - 'unit': categorical, e.g. 'CPU0', or `AGGREGATED_UNIT` if counts are aggregated over all cpus by perf
+    - 'value': float64, `NaN` for `<not counted>` and `<not supported>`
+    - 'metric': categorical, the name of event used in perf without modifiers (e.g. 'cycles:D' -> 'cycles')
+    - 'cgroup': categorical, the name of cgroup (only for the output of `--for-each-cgroup`)
+    - 'run_time': int64, the time (ns) the event was actually running on the counter (0 if not counted)
+    - 'coverage': float64, the percentage of the interval the event was actually running on the counter (0 if not counted)
+
+    Strings of 'unit' and 'metric' are mapped to small integer codes by the C parser of pandas directly,
+    so that no Python object is created per row.
+    :param `file`: the path of the raw performance data file, or a file-like object (e.g. bytes wrapped by `io.BytesIO`)
+    :return: a DataFrame with columns 'timestamp', 'unit', 'value', 'metric', ('cgroup',) 'run_time' and 'coverage'
+    """
+    names, usecols = PERF_RESULT_LAYOUTS[detect_layout(file)]
+    raw_data = pd.read_csv(file,
+                           sep="\t",
+                           header=None,
+                           names=names,
+                           usecols=usecols,
+                           dtype={"timestamp": np.float64,
+                                  "unit": "category",
+                                  "value": np.float64,
+                                  "metric": "category",
+                                  "cgroup": "category",
+                                  "run_time": np.float64,
+                                  "coverage": np.float64},
+                           na_values={"value": NOT_COUNTED_TOKENS + [""], "run_time": [""], "coverage": [""]},
+                           keep_default_na=False,
+                           engine="c")
+
+    if "unit" not in raw_data.columns:
+        raw_data.insert(1, "unit", pd.Categorical.from_codes(np.zeros(len(raw_data), dtype=np.int8), categories=[AGGREGATED_UNIT]))
+    raw_data["metric"] = strip_event_modifiers(raw_data["metric"])
+    raw_data["run_time"] = raw_data["run_time"].fillna(0).astype(np.int64)
+    raw_data["coverage"] = raw_data["coverage"].fillna(0.0)
+    return raw_data
+
+
+def strip_event_modifiers(events: pd.Series) -> pd.Series:
+    """
+    Remove the modifiers of event names (e.g. 'cycles:D' -> 'cycles') by operating on categories rather than rows.
+    :param `events`: a categorical Series of event names used in perf
+    :return: a categorical Series of event names without modifiers
+    """
+    categories = events.cat.categories
+    stripped = categories.str.split(":").str[0]
+    if stripped.equals(categories):
+        return events
+    new_categories = pd.Index(stripped.unique())
+    mapping = new_categories.get_indexer(stripped)
+    codes = events.cat.codes.to_numpy()
+    new_codes = np.where(codes >= 0, mapping[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=new_categories), index=events.index)
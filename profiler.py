@@ -1,52 +1,72 @@
 from connector import Connector, LocalConnector, RemoteConnector
 from event_group import EventGroup
+from sut import SUT
+from collector import get_collectors, START_FILE, STOP_FILE, PERF_PID_FILE, PASS_DIR_PREFIX
 import logging
 from hperf_exception import ProfilerError
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+import threading
+import os
 
 class Profiler:
     """
     `Profiler` is responsible for collecting raw microarchitecture performance data. 
     It will collect raw performance data by other profilers (such as perf, sar, etc.) on SUTs through `Connector`. 
     """
-    def __init__(self, connector: Connector, configs: dict, event_groups: EventGroup):
+    def __init__(self, connector: Connector, configs: dict, event_groups: EventGroup, sut: SUT):
         """
         Constructor of 'Profiler'
         :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
         :param `configs`: a dict of parsed configurations by `Parser`
         :param `event_group`: an instance of 'EventGroup'
+        :param `sut`: an instance of `SUT`
         """
         self.logger = logging.getLogger("hperf")
         
         self.connector: Connector = connector
         self.configs: dict = configs
         self.event_groups: EventGroup = event_groups
+        self.sut: SUT = sut
 
-    def profile(self):
+        self.output_dir: str = None    # the directory on SUT for the outputs of the current pass
+        self.interrupted: bool = False    # whether the user presses Ctrl-C during profiling
+
+    def profile(self, live_analyzer=None, start_barrier: threading.Barrier = None):
         """
         Generate and execute profiling script on SUT. 
+        For multi-pass collection (`--multi-pass`), the workload is run once for each multiplexed event group, 
+        and the outputs of each pass are saved in the sub-directory `pass_<i>` of the test directory (see `PASS_DIR_PREFIX`). 
+        :param `live_analyzer`: an instance of `LiveAnalyzer` (optional), 
+        if specified, it will be updated periodically to analyze new intervals while the workload is running
+        :param `start_barrier`: an instance of `threading.Barrier` (optional) shared by `Profiler`s of multiple SUTs, 
+        if specified, profiling starts on all SUTs at the same time (see `Cluster.profile()`)
         :raises:
             `ConnectorError`: for `RemoteConnector`, 
             if fail to generate or execute script on remote SUT, or fail to pull raw performance data from remote SUT
             `ProfilerError`: if the returned code of executing script does not equal to 0 
         """
-        self.logger.info("get static information of SUT")
-        self.get_cpu_info()
-        self.get_cpu_topo()
+        if self.configs.get("multi_pass"):
+            abnormal_flag = False
+            num_passes = self.event_groups.get_num_passes()
+            self.logger.info(f"multi-pass collection: the workload is run {num_passes} times, "
+                             f"each event group is counted in a separate pass without multiplexing")
+            for pass_index in range(num_passes):
+                pass_dir = f"{PASS_DIR_PREFIX}{pass_index}"
+                self.connector.run_command(f"mkdir -p {os.path.join(self.__get_output_dir(), pass_dir)}")
+                self.logger.info(f"start profiling pass {pass_index + 1}/{num_passes}")
+                abnormal_flag |= self.__profile_pass(pass_dir, pass_index)
+                # the workload is not re-run after the user presses Ctrl-C
+                if self.interrupted:
+                    if pass_index + 1 < num_passes:
+                        self.logger.warning(f"profiling is interrupted, events of the remaining {num_passes - pass_index - 1} passes are not collected")
+                    break
+        else:
+            self.logger.info("start profiling")
+            abnormal_flag = self.__profile_pass("", None, live_analyzer, start_barrier)
         
-        perf_script = self.__get_perf_script()
+        if live_analyzer:
+            live_analyzer.finish()
 
-        self.logger.info("start profiling")
-        
-        abnormal_flag = False
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            perf_task = executor.submit(self.connector.run_script, perf_script, "perf.sh")
-
-            for future in as_completed([perf_task]):
-                ret_code = future.result()
-                if ret_code != 0:
-                    abnormal_flag = True
-        
         if isinstance(self.connector, RemoteConnector):
             self.connector.pull_remote()
         
@@ -55,116 +75,163 @@ class Profiler:
         
         self.logger.info("end profiling")
 
+    def __profile_pass(self, pass_dir: str, pass_index: int = None, live_analyzer=None, start_barrier: threading.Barrier = None) -> bool:
+        """
+        Run the collectors of a single pass on SUT and wait until the workload finishes. 
+        :param `pass_dir`: the sub-directory of the test directory for the outputs of this pass, empty for a single pass
+        :param `pass_index`: the index of pass for multi-pass collection, `None` for a single pass
+        :param `live_analyzer`: see `.profile()`
+        :param `start_barrier`: see `.profile()`
+        :return: `True` if any collector exits abnormally
+        :raises:
+            `ConnectorError`: for `RemoteConnector`, if fail to generate or execute script on remote SUT
+            `ProfilerError`: if the profiling is aborted before start
+        """
+        # perf and auxiliary collectors (e.g. sar) specified by `--collectors` option run concurrently
+        collectors = get_collectors(self.configs, self.event_groups, pass_index)    # may raise `ProfilerError`
+        output_dir = os.path.join(self.__get_output_dir(), pass_dir) if pass_dir else self.__get_output_dir()
+        self.output_dir = output_dir
+        scripts = {}
+        for collector in collectors:
+            scripts[collector.name] = collector.get_script(output_dir)
+            self.logger.debug(f"profiling script by {collector.name}: \n" + scripts[collector.name])
+
+        abnormal_flag = False
+        with ThreadPoolExecutor(max_workers=len(collectors) + 1) as executor:
+            tasks = { executor.submit(self.connector.run_script, scripts[collector.name], os.path.join(pass_dir, f"{collector.name}.sh")): collector.name 
+                      for collector in collectors }
+            perf_task = next(task for task, name in tasks.items() if name == "perf")
+
+            started = False
+            try:
+                # wait for the trigger condition specified by `--start-when-cpu-util` option
+                if "start_cpu_util" in self.configs:
+                    self.logger.info(f"wait until CPU utilization exceeds {self.configs['start_cpu_util']}%")
+                    trigger_task = executor.submit(self.connector.run_script, self.__get_trigger_script(output_dir), os.path.join(pass_dir, "trigger.sh"))
+                    wait([trigger_task])
+
+                # wait until all SUTs are ready to start, if the barrier is broken (e.g. profiling fails on another SUT), 
+                # notify all scripts to exit by the stop barrier
+                if start_barrier is not None:
+                    try:
+                        start_barrier.wait()
+                    except threading.BrokenBarrierError:
+                        self.connector.run_command(f"touch {output_dir}/{STOP_FILE}")
+                        raise ProfilerError("Profiling is aborted before start.")
+
+                # all collectors are waiting for the start barrier, then start collecting at the same time
+                self.connector.run_command(f"touch {output_dir}/{START_FILE}")
+                started = True
+
+                if live_analyzer:
+                    # analyze new intervals in `perf_result` periodically until the profiling script finishes, 
+                    # for short sampling intervals, new intervals are analyzed in batches at most once per second
+                    poll_period = max(self.configs.get("interval", 1000), 1000) / 1000
+                    while not wait([perf_task], timeout=poll_period).done:
+                        live_analyzer.update()
+                wait([perf_task])
+            except KeyboardInterrupt:
+                # if profiling has not started yet, notify all scripts to exit by the stop barrier
+                if not started:
+                    self.connector.run_command(f"touch {output_dir}/{STOP_FILE}")
+                    raise
+                # e.g. when perf is attached to processes without a workload, it runs until the user presses Ctrl-C, 
+                # then perf is stopped by SIGINT and the performance data collected so far will be analyzed as usual
+                self.logger.info("interrupted, stop profiling")
+                self.interrupted = True
+                self.stop()
+                wait([perf_task])
+
+            # when the workload finishes, the script of perf notifies auxiliary collectors to stop, 
+            # the stop barrier is also created here in case the script of perf fails before that
+            self.connector.run_command(f"touch {output_dir}/{STOP_FILE}")
+            for future in as_completed(tasks):
+                ret_code = future.result()
+                if ret_code != 0:
+                    self.logger.warning(f"collector {tasks[future]} exits with code {ret_code}")
+                    abnormal_flag = True
+
+        return abnormal_flag
+
+    def stop(self):
+        """
+        Stop perf on SUT by sending SIGINT to the process recorded in `PERF_PID_FILE` by the profiling script. 
+        :raises:
+            `ConnectorError`: for `RemoteConnector`, if fail to execute command on remote SUT
+        """
+        output_dir = self.output_dir or self.__get_output_dir()
+        self.connector.run_command(f"kill -INT $(cat {output_dir}/{PERF_PID_FILE}) 2>/dev/null")
+
     def sanity_check(self) -> bool:
         """
-        Check the environment on the SUT for profiling.
+        Check the environment on the SUT for profiling by its description discovered by `SUT.discover()`.
         Since the collection of performance data requires exclusive usage of PMCs, 
         it is necessary to check if there is any other profiler (such as VTune, perf, etc.) is already running. 
         Specifically, for x86_64 platform, the NMI watchdog will occupy a generic PMC, 
         so that it will also be checked.
         :return: if the SUT passes the sanity check, it will return `True`, 
         else it will return `False` and record the information through `Logger`.
-        :raises:
-            `ConnectorError`: for `RemoteConnector`, if fail to execute command for sanity check on remote SUT
         """
         sanity_check_flag = True
 
-        # 1. check if there is any other profiler (such as VTune, perf, etc.) is already running
-        # TODO: add more pattern of profilers may interfere measurement
-        process_check_list = [
-            "linux-tools/.*/perf", 
-            "/intel/oneapi/vtune/.*/emon"
-        ]    # process command pattern
-        for process in process_check_list:
-            process_check_cmd = f"ps -ef | awk '{{print $8}}' | grep {process}"
-            output = self.connector.run_command(process_check_cmd)    # may raise `ConnectorError`
-            if output:
-                process_cmd = output
-                self.logger.warning(f"sanity check: process may interfere measurement exists. {process_cmd}")
-                sanity_check_flag = False
-        # 2. for x86_64 platform, check the NMI watchdog
-        if self.event_groups.isa == "x86_64":
-            nmi_watchdog_check_cmd = ["cat", "/proc/sys/kernel/nmi_watchdog"]
-            output = self.connector.run_command(nmi_watchdog_check_cmd)    # may raise `ConnectorError`
-            if int(output) == 1:
-                self.logger.warning(f"sanity check: NMI watchdog is enabled.")
-                sanity_check_flag = False
+        # 1. check if perf is available
+        if not self.sut.perf_version:
+            self.logger.warning(f"sanity check: perf is not found.")
+            sanity_check_flag = False
+
+        # 2. check if there is any other profiler (such as VTune, perf, etc.) is already running
+        for process_cmd in self.sut.running_profilers:
+            self.logger.warning(f"sanity check: process may interfere measurement exists. {process_cmd}")
+            sanity_check_flag = False
+
+        # 3. for x86_64 platform, check the NMI watchdog
+        if self.sut.isa == "x86_64" and self.sut.nmi_watchdog == 1:
+            self.logger.warning(f"sanity check: NMI watchdog is enabled.")
+            sanity_check_flag = False
 
         return sanity_check_flag
     
-    def get_cpu_info(self):
-        """
-        """
-        if isinstance(self.connector, LocalConnector):
-            output_dir = self.connector.test_dir
-        elif isinstance(self.connector, RemoteConnector):
-            output_dir = self.connector.remote_test_dir
-        else:
-            raise ProfilerError("Fail to get test directory path on SUT when generating profiling script.")
-        
-        self.connector.run_command("lscpu > " + f"{output_dir}/cpu_info")
-    
-    def get_cpu_topo(self):
+    def __get_trigger_script(self, output_dir: str) -> str:
         """
+        Generate the string of shell script which exits when the CPU utilization of the SUT exceeds the threshold 
+        specified by `--start-when-cpu-util` option (or when the stop barrier is created). 
+        The CPU utilization is sampled from '/proc/stat' once per sampling interval (at least 100 ms). 
+        :param `output_dir`: the path of test directory on SUT
+        :return: a string of shell script
         """
-        if isinstance(self.connector, LocalConnector):
-            output_dir = self.connector.test_dir
-        elif isinstance(self.connector, RemoteConnector):
-            output_dir = self.connector.remote_test_dir
-        else:
-            raise ProfilerError("Fail to get test directory path on SUT when generating profiling script.")
+        threshold = round(self.configs["start_cpu_util"] * 100)    # in 0.01%
+        period = max(self.configs.get("interval", 1000), 100) / 1000
 
-        if self.event_groups.isa == "x86_64":
-            # output format:
-            # processor | socket | core id in socket
-            # 0         | 0      | 0
-            # 1         | 0      | 1
-            # 2         | 0      | 2
-            # ...
-            get_topo_cmd = r"awk -F: 'BEGIN{i=0;j=0;k=0}" \
-            r"/processor/{cpu[i]=$2;i++}" \
-            r"/physical id/{skt[j]=$2;j++}" \
-            r"/core id/{phy[k]=$2;k++}" \
-            r'''END{OFS="\t";for(key in cpu)print cpu[key],skt[key],phy[key]}' '''\
-            r"/proc/cpuinfo > " + f"{output_dir}/cpu_topo"
-        elif self.event_groups.isa == "aarch64":
-            # TODO: getting topo for arm is undone
-            # output format:
-            # processor | socket
-            # 0         | 0
-            # 1         | 0
-            # 2         | 0
-            # ...
-            get_topo_cmd = r"awk -F: 'BEGIN{i=0}" \
-            r"/processor/{cpu[i]=$2;i++}" \
-            r'''END{OFS="\t";for(key in cpu)print cpu[key],0}' '''\
-            r"/proc/cpuinfo > " + f"{output_dir}/cpu_topo"
-        else:
-            raise ProfilerError("Unsupported ISA.")
-        
-        self.connector.run_command(get_topo_cmd)
-    
-    def __get_perf_script(self) -> str:
+        script = "#!/bin/bash\n"
+        script += f'TMP_DIR={output_dir}\n'
+        # fields of the line 'cpu' in '/proc/stat': user nice system idle iowait irq softirq steal ...
+        script += 'read -r _ user nice system idle iowait irq softirq steal _ < /proc/stat\n'
+        script += 'prev_total=$((user + nice + system + idle + iowait + irq + softirq + steal)); prev_idle=$((idle + iowait))\n'
+        script += f'while [ ! -e "$TMP_DIR"/{STOP_FILE} ]; do\n'
+        script += f'    sleep {period}\n'
+        script += '    read -r _ user nice system idle iowait irq softirq steal _ < /proc/stat\n'
+        script += '    total=$((user + nice + system + idle + iowait + irq + softirq + steal)); idle=$((idle + iowait))\n'
+        script += '    if [ $total -gt $prev_total ]; then\n'
+        script += '        util=$((10000 * ((total - prev_total) - (idle - prev_idle)) / (total - prev_total)))\n'
+        script += f'        [ $util -ge {threshold} ] && exit 0\n'
+        script += '    fi\n'
+        script += '    prev_total=$total; prev_idle=$idle\n'
+        script += 'done\n'
+        return script
+
+    def __get_output_dir(self) -> str:
         """
-        Based on the parsed configuration, generate the string of shell script for profiling by perf.
-        :return: a string of shell script for profiling
+        Get the path of test directory on SUT. 
+        For local SUT, output raw performance data to the test directory directly will be fine. 
+        However, for remote SUT, raw performance data should be output to the remote temporary which can be accessd on remote SUT, 
+        then pull the data to the local test directory. 
+        :return: a string of the path of test directory on SUT
+        :raises:
+            `ProfilerError`: if the type of `Connector` is unknown
         """
-        # for local SUT, output raw performance data to the test directory directly will be fine. 
-        # however, for remote SUT, raw performance data should be output to the remote temporary which can be accessd on remote SUT, 
-        # then pull the data to the local test directory. 
         if isinstance(self.connector, LocalConnector):
-            perf_dir = self.connector.test_dir
+            return self.connector.test_dir
         elif isinstance(self.connector, RemoteConnector):
-            perf_dir = self.connector.remote_test_dir
+            return self.connector.remote_test_dir
         else:
             raise ProfilerError("Fail to get test directory path on SUT when generating profiling script.")
-        
-        script = "#!/bin/bash\n"
-        script += f'TMP_DIR={perf_dir}\n'
-        script += 'perf_result="$TMP_DIR"/perf_result\n'
-        script += 'perf_error="$TMP_DIR"/perf_error\n'
-        script += 'date +%Y-%m-%d" "%H:%M:%S.%N | cut -b 1-23 > "$TMP_DIR"/perf_start_timestamp\n'
-        script += f'3>"$perf_result" perf stat -e {self.event_groups.get_event_groups_str()} -A -a -x "\t" -I 1000 --log-fd 3 {self.configs["command"]} 2>"$perf_error"\n'
-
-        self.logger.debug("profiling script by perf: \n" + script)
-        return script
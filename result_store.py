@@ -0,0 +1,166 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from typing import Sequence
+
+
+class ResultStore:
+    """
+    `ResultStore` is responsible for persisting the parsed raw performance data and the derived timeseries
+    in a compact columnar binary format (one NumPy `.npy` file per column) in the sub-directory `store/` of a test directory.
+    Columns are loaded lazily by memory mapping, so that re-analyzing a test directory (e.g. with a different `-c` CPU list)
+    does not require parsing the text output of perf again.
+    ```
+    <test_dir>/store/
+    |- manifest.json        // column names, dtypes, categories and the signature of the source `perf_result` files
+    |- raw.timestamp.npy    // float64
+    |- raw.unit.npy         // int16 (or int32) codes of categories in manifest
+    |- raw.metric.npy       // int16 (or int32) codes of categories in manifest
+    |- raw.value.npy        // float64
+    |- raw.run_time.npy     // int64
+    |- raw.coverage.npy     // float64
+    |- timeseries.<i>.npy   // the i-th column of the derived timeseries
+    |- coverage.<i>.npy     // the i-th column of the derived timeseries of coverage of events
+    ```
+    The derived timeseries is reused by `Analyzer.analyze()` if it is derived in the same scope (e.g. CPU list and metrics), 
+    and it is invalidated whenever the raw performance data is saved again.
+    """
+
+    def __init__(self, test_dir: str, source_paths: Sequence[str] = None) -> None:
+        """
+        Constructor of `ResultStore`
+        :param `test_dir`: a string of the path of test directory
+        :param `source_paths`: paths of the raw performance data files from which the stored data is parsed, 
+        e.g. `pass_<i>/perf_result` of each pass for multi-pass collection, by default `<test_dir>/perf_result`
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.test_dir: str = test_dir
+        self.source_paths: list = list(source_paths) if source_paths else [ os.path.join(test_dir, "perf_result") ]
+        self.store_dir: str = os.path.join(test_dir, "store")
+        self.manifest_path: str = os.path.join(self.store_dir, "manifest.json")
+
+    def __load_manifest(self) -> dict:
+        """
+        :return: the dict of manifest, or an empty dict if the store does not exist
+        """
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def __save_manifest(self, manifest: dict):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_manifest_path = self.manifest_path + ".tmp"
+        with open(tmp_manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_manifest_path, self.manifest_path)
+
+    def __get_source_signature(self) -> list:
+        """
+        Get the signature (path, size and modification time) of the source raw performance data files, 
+        which is used to detect a stale store.
+        :return: a list of `[path, size, mtime_ns]` of existing source files (relative to the test directory), 
+        or `None` if none of them exists
+        """
+        signature = []
+        for path in self.source_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append([os.path.relpath(path, self.test_dir), stat.st_size, stat.st_mtime_ns])
+        return signature if len(signature) > 0 else None
+
+    def has_raw_data(self) -> bool:
+        """
+        Check if the parsed raw performance data is stored and up-to-date with the source files (see `.source_paths`).
+        If all source files have been removed (e.g. to save disk space), the store is regarded as up-to-date.
+        """
+        manifest = self.__load_manifest()
+        if "raw" not in manifest:
+            return False
+        signature = self.__get_source_signature()
+        return signature is None or signature == manifest["raw"]["source"]
+
+    def save_raw_data(self, perf_raw_data: pd.DataFrame):
+        """
+        Save the parsed raw performance data returned by `perf_reader.read_perf_result()`.
+        Categorical columns ('unit' and 'metric') are saved as integer codes, and their categories are saved in the manifest.
+        :param `perf_raw_data`: a DataFrame with columns 'timestamp', 'unit', 'value', 'metric', 'run_time' and 'coverage'
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        columns = {}
+        for name in perf_raw_data.columns:
+            column = perf_raw_data[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                code_dtype = np.int16 if len(column.cat.categories) < 2 ** 15 else np.int32
+                np.save(os.path.join(self.store_dir, f"raw.{name}.npy"), column.cat.codes.to_numpy().astype(code_dtype))
+                columns[name] = { "dtype": "category", "categories": [ str(x) for x in column.cat.categories ] }
+            else:
+                np.save(os.path.join(self.store_dir, f"raw.{name}.npy"), column.to_numpy())
+                columns[name] = { "dtype": str(column.dtype) }
+
+        manifest = self.__load_manifest()
+        manifest["raw"] = { "source": self.__get_source_signature(), "rows": len(perf_raw_data), "columns": columns }
+        # the timeseries derived from the previous raw performance data is stale
+        manifest.pop("timeseries", None)
+        self.__save_manifest(manifest)
+        self.logger.debug(f"save parsed raw performance data to {self.store_dir}")
+
+    def load_raw_data(self) -> pd.DataFrame:
+        """
+        Load the parsed raw performance data by memory mapping.
+        :return: a DataFrame with the same columns and dtypes as it was saved
+        """
+        manifest = self.__load_manifest()
+        data = {}
+        for name, column in manifest["raw"]["columns"].items():
+            values = np.load(os.path.join(self.store_dir, f"raw.{name}.npy"), mmap_mode="r")
+            if column["dtype"] == "category":
+                data[name] = pd.Categorical.from_codes(values, categories=column["categories"])
+            else:
+                data[name] = values
+        self.logger.debug(f"load parsed raw performance data from {self.store_dir}")
+        return pd.DataFrame(data, copy=False)
+
+    def save_timeseries(self, timeseries: pd.DataFrame, coverage: pd.DataFrame, scope: dict):
+        """
+        Save the derived timeseries and the timeseries of coverage of events.
+        :param `timeseries`: a DataFrame of timeseries returned by `Analyzer.get_timeseries()`
+        :param `coverage`: a DataFrame of coverage of events returned by `Analyzer.analyze_raw_data()`
+        :param `scope`: a dict describing how the timeseries is derived (e.g. the CPU list), saved in the manifest
+        """
+        os.makedirs(self.store_dir, exist_ok=True)
+        manifest = self.__load_manifest()
+        manifest["timeseries"] = { "scope": scope }
+        for prefix, data in (("timeseries", timeseries), ("coverage", coverage)):
+            columns = []
+            for i, name in enumerate(data.columns):
+                np.save(os.path.join(self.store_dir, f"{prefix}.{i}.npy"), data[name].to_numpy(), allow_pickle=False)
+                columns.append(str(name))
+            manifest["timeseries"][prefix] = { "rows": len(data), "columns": columns }
+        self.__save_manifest(manifest)
+        self.logger.debug(f"save timeseries to {self.store_dir}")
+
+    def load_timeseries(self, scope: dict) -> tuple:
+        """
+        Load the derived timeseries and the timeseries of coverage of events by memory mapping.
+        :param `scope`: a dict describing how the timeseries should be derived, compared with the saved scope
+        :return: a tuple of 2 DataFrames of the timeseries and the coverage, 
+        or `(None, None)` if it is not stored or it was derived in a different scope
+        """
+        manifest = self.__load_manifest()
+        if "timeseries" not in manifest or manifest["timeseries"]["scope"] != scope:
+            return None, None
+        results = []
+        for prefix in ("timeseries", "coverage"):
+            data = {}
+            for i, name in enumerate(manifest["timeseries"][prefix]["columns"]):
+                data[name] = np.load(os.path.join(self.store_dir, f"{prefix}.{i}.npy"), mmap_mode="r")
+            results.append(pd.DataFrame(data, copy=False))
+        self.logger.debug(f"load timeseries from {self.store_dir}")
+        return tuple(results)
@@ -0,0 +1,420 @@
+"""
+This module includes the discovery of the System Under Test (SUT).
+All static information required by hperf (the output of 'lscpu', the CPU topology, PMU devices, NMI watchdog,
+the version of perf and other profilers running on the SUT) is gathered by a single probe script,
+so that only one command is executed on the SUT (i.e. one round trip for remote SUT).
+The static sections (hardware) can be cached locally by `SUTCache`, keyed by the fingerprint of the SUT, 
+as well as the capabilities of the PMUs probed by short dry runs of 'perf stat' (see `SUT.probe_events()`).
+The output of the probe consists of sections, each of which begins with a line of marker, e.g.
+```
+### hperf: lscpu
+Architecture:            x86_64
+...
+### hperf: cpuinfo
+processor	: 0
+physical id	: 0
+core id		: 0
+...
+```
+"""
+
+from connector import Connector
+from hperf_exception import ConnectorError
+import logging
+import json
+import time
+import os
+import re
+
+# prefix of the line of marker which begins a section in the output of the probe script
+SECTION_MARKER = "### hperf: "
+
+# the command of each section in the probe script
+PROBE_SECTIONS = {
+    "lscpu": "LC_ALL=C lscpu",
+    # only the fields for the CPU topology are kept
+    "cpuinfo": "grep -E '^(processor|physical id|core id)' /proc/cpuinfo",
+    "pmu_devices": "ls /sys/bus/event_source/devices",
+    "nmi_watchdog": "cat /proc/sys/kernel/nmi_watchdog",
+    "perf_version": "perf --version",
+    # the command (the first field of arguments) of all processes
+    "processes": "ps -eo args= | awk '{print $1}'",
+    # hostname and the hash of '/proc/cpuinfo' (except the frequencies which change all the time)
+    "fingerprint": "echo \"$(hostname)-$(grep -v MHz /proc/cpuinfo | md5sum | cut -c1-32)\"",
+}
+
+# sections describing the hardware of the SUT, which can be cached by `SUTCache`, 
+# other sections (e.g. the running processes) are probed on every run
+STATIC_SECTIONS = ["lscpu", "cpuinfo", "pmu_devices"]
+
+# the command of dry run of an event (or an event group) when probing the capabilities of PMUs, 
+# the workload is short since only whether the event can be opened and scheduled matters
+EVENT_PROBE_COMMAND = "perf stat -x ';' {target}-e '{event}' -- sleep 0.01 2>&1; echo \"exit $?\""
+
+# messages of perf when the dry run fails due to the lack of privilege rather than the event itself
+PERMISSION_ERROR_PATTERN = re.compile(r"paranoid|Permission denied|No permission|Access to performance monitoring")
+
+# TODO: add more pattern of profilers may interfere measurement
+PROFILER_PROCESS_PATTERNS = [
+    "linux-tools/.*/perf",
+    "/intel/oneapi/vtune/.*/emon"
+]    # process command pattern
+
+
+class SUT:
+    """
+    `SUT` is the structured description of the System Under Test, which is discovered by `.discover()` through `Connector`.
+    The rest of hperf (`EventGroup`, `Profiler`, etc.) reads the static information of the SUT from it
+    rather than executing commands on the SUT separately.
+    """
+
+    def __init__(self, sections: dict) -> None:
+        """
+        Constructor of `SUT`.
+        :param `sections`: a dict mapping the name of section (see `PROBE_SECTIONS`) to the raw output of its command,
+        missing sections are regarded as empty
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.sections: dict = { name: sections.get(name, "") or "" for name in PROBE_SECTIONS }
+
+        self.lscpu: str = self.sections["lscpu"]
+        self.cpu_info: dict = self.parse_lscpu(self.lscpu)
+        self.isa: str = self.get_lscpu_field("Architecture")
+        self.model_name: str = self.get_lscpu_field("Model name")
+        self.pmu_devices: list = sorted(self.sections["pmu_devices"].split())
+        try:
+            self.nmi_watchdog: int = int(self.sections["nmi_watchdog"].strip())
+        except ValueError:
+            self.nmi_watchdog: int = None    # e.g. '/proc/sys/kernel/nmi_watchdog' does not exist
+        self.perf_version: str = self.sections["perf_version"].strip()
+        self.running_profilers: list = self.__find_running_profilers(self.sections["processes"])
+        self.fingerprint: str = self.sections["fingerprint"].strip()
+
+        self.arch: str = None    # the name of arch module, determined by `EventGroup` (or loaded from `SUTCache`)
+        self.cached: bool = False    # if the static sections are loaded from `SUTCache`
+        self.cache_time: float = None    # the time when the entry loaded from `SUTCache` was created
+
+        # whether events (or event groups) are supported, keyed by the specification of events passed to 'perf stat -e', 
+        # probed by `.probe_events()` (or loaded from `SUTCache`)
+        self.event_support: dict = {}
+        self.event_support_updated: bool = False    # if new results are probed since loaded from `SUTCache`
+
+    @classmethod
+    def discover(cls, connector: Connector, cache=None):
+        """
+        Constructor of `SUT`.
+        Execute the probe script on the SUT through `Connector` and parse its output. 
+        All sections (including the fingerprint) are probed by a single script, i.e. one round trip for remote SUT. 
+        If `cache` is specified and there is a valid entry for the fingerprint, the static sections, the name of arch module 
+        and the probed capabilities of PMUs are taken from the entry, so that the arch detection and the dry runs of events are skipped. 
+        :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
+        :param `cache`: an instance of `SUTCache` (optional)
+        :raises:
+            `ConnectorError`: if fail to execute the probe script on the SUT
+        """
+        logger = logging.getLogger("hperf")
+        logger.debug("discover the static information of SUT")
+        sections = cls.__probe(connector, list(PROBE_SECTIONS))
+        entry = cache.load(sections.get("fingerprint", "").strip()) if cache is not None else None
+        if entry:
+            sections.update(entry["sections"])
+        sut = cls(sections)
+        if entry:
+            sut.arch = entry["arch"]
+            sut.cached = True
+            sut.cache_time = entry["time"]
+            sut.event_support = entry.get("event_support", {})
+        logger.debug(f"ISA: {sut.isa}, processor model: {sut.model_name}, perf: {sut.perf_version}")
+        logger.debug(f"PMU devices: {sut.pmu_devices}")
+        return sut
+
+    @classmethod
+    def from_lscpu(cls, output: str):
+        """
+        Constructor of `SUT`, with the output of 'lscpu' only, e.g. `cpu_info` saved in a test directory.
+        :param `output`: a string of the output of 'lscpu'
+        """
+        return cls({ "lscpu": output })
+
+    @classmethod
+    def __probe(cls, connector: Connector, names: list) -> dict:
+        """
+        Execute the probe script of specified sections on the SUT.
+        :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
+        :param `names`: a list of names of sections
+        :return: a dict mapping the name of section to its output
+        :raises:
+            `ConnectorError`: if fail to execute the probe script on the SUT
+        """
+        output = connector.run_command(cls.get_probe_script(names))    # may raise `ConnectorError`
+        if not output:
+            raise ConnectorError("Fail to discover the static information of SUT.")
+        return cls.parse_probe_output(output)
+
+    @staticmethod
+    def get_probe_script(names: list) -> str:
+        """
+        Generate the probe script, which prints the output of the command of each section after its line of marker.
+        Failures of commands are ignored (the section is empty), so that the probe script always exits with 0.
+        :param `names`: a list of names of sections (keys of `PROBE_SECTIONS`)
+        :return: a string of shell script
+        """
+        script = ""
+        for name in names:
+            command = PROBE_SECTIONS[name]
+            script += f"echo '{SECTION_MARKER}{name}'; {command} 2>/dev/null\n"
+        script += "exit 0\n"
+        return script
+
+    @staticmethod
+    def parse_probe_output(output: str) -> dict:
+        """
+        Split the output of the probe script into sections.
+        :param `output`: a string of the output of the probe script
+        :return: a dict mapping the name of section to its output
+        """
+        sections = {}
+        name = None
+        for line in output.splitlines(keepends=True):
+            if line.startswith(SECTION_MARKER):
+                name = line[len(SECTION_MARKER):].strip()
+                sections[name] = ""
+            elif name is not None:
+                sections[name] += line
+        return sections
+
+    @staticmethod
+    def parse_lscpu(output: str) -> dict:
+        """
+        Parse the output of 'lscpu'.
+        :param `output`: a string of the output of 'lscpu'
+        :return: a dict mapping fields to values, e.g. `{"Architecture": "x86_64", ...}`
+        """
+        cpu_info = {}
+        for line in (output or "").splitlines():
+            if line.find(":") != -1:
+                key, value = line.split(":", 1)
+                cpu_info[key.strip()] = value.strip()
+        return cpu_info
+
+    def get_lscpu_field(self, field: str) -> str:
+        """
+        Get the value of a field in the parsed output of 'lscpu' (`.cpu_info`).
+        :param `field`: the name of field, e.g. 'Architecture'
+        :return: a string of the value (empty if the field does not exist)
+        """
+        return self.cpu_info.get(field, "")
+
+    def has_pmu(self, pmu: str) -> bool:
+        """
+        Check if a PMU is registered in '/sys/bus/event_source/devices' of the SUT. 
+        As perf does, a PMU name also matches the devices with the prefix 'uncore_' and the suffix '_<n>', 
+        e.g. 'cha' matches 'uncore_cha_0', ..., 'uncore_cha_39'. 
+        :param `pmu`: the name of PMU in the event, e.g. 'cha' in 'cha/event=0x34,umask=0x1fe001/'
+        :return: `True` if the PMU exists, or if the PMU devices are unknown
+        """
+        if len(self.pmu_devices) == 0:
+            return True
+        pattern = re.compile(rf"(uncore_)?{re.escape(pmu)}(_\d+)?")
+        return any(pattern.fullmatch(device) for device in self.pmu_devices)
+
+    def probe_events(self, connector: Connector, events: dict) -> dict:
+        """
+        Probe whether events (or event groups) are supported by the SUT, so that unsupported events can be dropped 
+        before the real run instead of failing it. 
+        1. events of PMUs which are not registered in '/sys/bus/event_source/devices' are unsupported (see `.has_pmu()`), 
+        2. other events are probed by a short dry run of 'perf stat' for each of them (see `EVENT_PROBE_COMMAND`), 
+        all of which are executed by a single script on the SUT. 
+        An event is unsupported if perf reports `<not supported>` or fails to open it (e.g. syntax error, unknown PMU). 
+        For an event group, it is also unsupported if any event is `<not counted>`, i.e. the group can not be scheduled. 
+        The results are recorded in `.event_support`, and events probed before (e.g. loaded from `SUTCache`) are not probed again. 
+        :param `connector`: an instance of `Connector` (`LocalConnector` or `RemoteConnector`)
+        :param `events`: a dict mapping the specification of events passed to 'perf stat -e' (e.g. 'r08d1' or '{r08d1,r01d1}') 
+        to whether it should be counted system-wide (`-a`, required by uncore events)
+        :return: a dict mapping the specification of events to `True` (supported), `False` (unsupported) 
+        or `None` (unknown, e.g. the dry run is not permitted)
+        :raises:
+            `ConnectorError`: if fail to execute the probe script on the SUT
+        """
+        results = { event: self.event_support[event] for event in events if event in self.event_support }
+        pending_events = []
+        for event in events:
+            if event in results:
+                continue
+            # the PMU is the prefix of an event term, e.g. 'msr' in 'msr/tsc/' or 'cha' in '{cha/event=0x34/,cycles}'
+            pmus = re.findall(r"(?:^|[{,])([\w.-]+)/", event)
+            if not all(self.has_pmu(pmu) for pmu in pmus):
+                results[event] = False
+            else:
+                pending_events.append(event)
+
+        if len(pending_events) > 0:
+            script = ""
+            for i, event in enumerate(pending_events):
+                command = EVENT_PROBE_COMMAND.format(target="-a " if events[event] else "", event=event)
+                script += f"echo '{SECTION_MARKER}{i}'; {command}\n"
+            script += "exit 0\n"
+            self.logger.debug(f"probe {len(pending_events)} events by dry runs of perf")
+            sections = self.parse_probe_output(connector.run_command(script))    # may raise `ConnectorError`
+            for i, event in enumerate(pending_events):
+                results[event] = self.__parse_event_probe(sections.get(str(i), ""), "{" in event)
+
+        for event, supported in results.items():
+            if supported is not None and self.event_support.get(event) != supported:
+                self.event_support[event] = supported
+                self.event_support_updated = True
+        return { event: results[event] for event in events }
+
+    def __parse_event_probe(self, output: str, is_group: bool) -> bool:
+        """
+        Parse the output of a dry run of 'perf stat' (see `EVENT_PROBE_COMMAND`). 
+        :param `output`: the output of the dry run, ended by a line of the exit code, e.g. 'exit 0'
+        :param `is_group`: if the dry run is for an event group
+        :return: `True` (supported), `False` (unsupported) or `None` (unknown)
+        """
+        match = re.search(r"^exit (\d+)\s*$", output, re.MULTILINE)
+        if match is None:
+            return None
+        if "<not supported>" in output or (is_group and "<not counted>" in output):
+            return False
+        if int(match.group(1)) != 0:
+            if PERMISSION_ERROR_PATTERN.search(output):
+                return None
+            return False
+        return True
+
+    def __find_running_profilers(self, processes: str) -> list:
+        """
+        Find the processes of other profilers (such as VTune, perf, etc.) which may interfere measurement.
+        :param `processes`: the output of the section 'processes', one command per line
+        :return: a list of commands of processes matching `PROFILER_PROCESS_PATTERNS`
+        """
+        patterns = [ re.compile(pattern) for pattern in PROFILER_PROCESS_PATTERNS ]
+        return [ line.strip() for line in processes.splitlines()
+                 if any(pattern.search(line) for pattern in patterns) ]
+
+    def get_cpu_topo(self) -> str:
+        """
+        Get the CPU topology in the format read by `Analyzer`.
+        For aarch64 platform, the core ids are unknown.
+        ```
+        processor | socket | core id in socket (x86_64 only)
+        0         | 0      | 0
+        1         | 0      | 1
+        ...
+        ```
+        :return: a string of tab-separated lines
+        """
+        fields = { "processor": [], "physical id": [], "core id": [] }
+        for line in self.sections["cpuinfo"].splitlines():
+            if line.find(":") != -1:
+                key, value = line.split(":", 1)
+                if key.strip() in fields:
+                    fields[key.strip()].append(value.strip())
+
+        lines = []
+        for i, processor in enumerate(fields["processor"]):
+            if self.isa == "aarch64":
+                # TODO: getting topo for arm is undone
+                lines.append(f"{processor}\t0")
+            else:
+                socket = fields["physical id"][i] if i < len(fields["physical id"]) else "0"
+                core = fields["core id"][i] if i < len(fields["core id"]) else processor
+                lines.append(f"{processor}\t{socket}\t{core}")
+        return "".join(line + "\n" for line in lines)
+
+    def save(self, test_dir: str):
+        """
+        Save the output of 'lscpu' (`cpu_info`) and the CPU topology (`cpu_topo`) in the (local) test directory,
+        which are required by `Analyzer` and `EventGroup.from_test_dir()`.
+        :param `test_dir`: a string of the path of (local) test directory
+        """
+        with open(os.path.join(test_dir, "cpu_info"), "w") as f:
+            f.write(self.lscpu)
+        with open(os.path.join(test_dir, "cpu_topo"), "w") as f:
+            f.write(self.get_cpu_topo())
+        self.logger.debug(f"save static information of SUT in {test_dir}")
+
+
+class SUTCache:
+    """
+    `SUTCache` keeps the static sections of the description of SUTs (see `STATIC_SECTIONS`), the name of arch module 
+    and the probed capabilities of PMUs (see `SUT.probe_events()`) 
+    in a local directory (`<tmp_dir>/.sut_cache/` by default), one JSON file per SUT named by its fingerprint 
+    (hostname and the hash of '/proc/cpuinfo'). 
+    An entry is invalidated when it is older than the TTL, or when the fingerprint changes (e.g. after a hardware change). 
+    """
+
+    def __init__(self, cache_dir: str, ttl: float) -> None:
+        """
+        Constructor of `SUTCache`.
+        :param `cache_dir`: a string of the path of cache directory, which is created if it does not exist
+        :param `ttl`: the time to live of entries in seconds
+        """
+        self.logger = logging.getLogger("hperf")
+
+        self.cache_dir: str = cache_dir
+        self.ttl: float = ttl
+
+    def __get_entry_path(self, fingerprint: str) -> str:
+        """
+        :return: the path of the entry file of the fingerprint
+        """
+        # the fingerprint may contain characters which are invalid in file names, e.g. '/'
+        file_name = re.sub(r"[^\w.-]", "_", fingerprint)
+        return os.path.join(self.cache_dir, f"{file_name}.json")
+
+    def load(self, fingerprint: str) -> dict:
+        """
+        Load the entry of a SUT.
+        :param `fingerprint`: the fingerprint of the SUT (`SUT.fingerprint`)
+        :return: a dict with keys 'fingerprint', 'time', 'arch', 'sections' and 'event_support', 
+        or `None` if there is no valid entry for the fingerprint
+        """
+        if not fingerprint:
+            return None
+        entry_path = self.__get_entry_path(fingerprint)
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            self.logger.debug(f"SUT cache miss: {fingerprint}")
+            return None
+        if entry.get("fingerprint") != fingerprint or not entry.get("arch"):
+            self.logger.debug(f"SUT cache miss: {fingerprint} (invalid entry)")
+            return None
+        if time.time() - entry.get("time", 0) > self.ttl:
+            self.logger.debug(f"SUT cache miss: {fingerprint} (expired)")
+            return None
+        self.logger.debug(f"SUT cache hit: {entry_path}")
+        return entry
+
+    def save(self, sut: SUT):
+        """
+        Save the static sections of the description of a SUT and the probed capabilities of its PMUs, 
+        unless they are loaded from the cache without new capabilities probed since 
+        (i.e. an entry is not refreshed before it expires, even if new capabilities are added to it). 
+        Failures are logged and ignored since the cache is only an optimization. 
+        :param `sut`: an instance of `SUT` whose `.arch` has been determined
+        """
+        if (sut.cached and not sut.event_support_updated) or not sut.fingerprint or not sut.arch:
+            return
+        entry = {
+            "fingerprint": sut.fingerprint,
+            "time": sut.cache_time if sut.cached else time.time(),
+            "arch": sut.arch,
+            "sections": { name: sut.sections[name] for name in STATIC_SECTIONS },
+            "event_support": sut.event_support
+        }
+        entry_path = self.__get_entry_path(sut.fingerprint)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_entry_path = entry_path + ".tmp"
+            with open(tmp_entry_path, "w") as f:
+                json.dump(entry, f, indent=2)
+            os.replace(tmp_entry_path, entry_path)
+        except OSError as e:
+            self.logger.warning(f"fail to save SUT cache {entry_path}: {e}")
+            return
+        self.logger.debug(f"save SUT cache: {entry_path}")
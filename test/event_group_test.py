@@ -0,0 +1,108 @@
+import sys, importlib, os
+import numpy as np
+
+if __name__ == "__main__":
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    event_group_module = importlib.import_module("event_group")
+    metric_expression_module = importlib.import_module("metric_expression")
+    hperf_exception_module = importlib.import_module("hperf_exception")
+
+    EventGroup = getattr(event_group_module, "EventGroup")
+    MetricExpression = getattr(metric_expression_module, "MetricExpression")
+    EventGroupError = getattr(hperf_exception_module, "EventGroupError")
+
+    # 1. packed event groups of each architecture: 
+    # every multiplexed event is counted in exactly one group, every group is schedulable, 
+    # and the number of groups is minimal
+    expected_num_groups = {
+        ("x86_64", "intel_icelake"): 3,
+        ("x86_64", "intel_cascadelake"): 2,
+        ("aarch64", "arm"): 6,
+        ("aarch64", "arm_kunpeng"): 1
+    }
+    for (isa, arch), num_groups in expected_num_groups.items():
+        event_groups = EventGroup.get_event_group(isa=isa, arch=arch)
+        multiplexed_events = set().union(*[ set(group) for group in event_groups.event_groups ]) \
+                             - set(event_groups.other_events) - set(event_groups.pinned_events)
+        event_groups._EventGroup__optimize_event_groups()
+        print(arch, [ sorted(group) for group in event_groups.event_groups ])
+
+        packed_events = [ event for group in event_groups.event_groups for event in group ]
+        assert sorted(packed_events) == sorted(multiplexed_events), arch
+        for group in event_groups.event_groups:
+            assert event_groups._EventGroup__can_schedule(set(group)), (arch, group)
+        assert len(event_groups.event_groups) == num_groups, arch
+        assert abs(sum(event_groups.get_time_share()) - 1) < 1e-9, arch
+
+    # 2. the group of branch and TLB events on Ice Lake (6 events on 4 general-purpose counters) 
+    # is split along the dependencies of metrics
+    event_groups = EventGroup.get_event_group(isa="x86_64", arch="intel_icelake")
+    assert not event_groups._EventGroup__can_schedule({40, 41, 50, 51, 52, 53})
+    split_groups = event_groups._EventGroup__split_event_group({40, 41, 50, 51, 52, 53})
+    print(split_groups)
+    assert sorted(split_groups, key=min) == [{40, 41}, {50}, {51, 52, 53}]
+
+    # 3. ref-cycles can only be counted on its fixed counter, 
+    # e.g. it can be multiplexed with 4 events on the 4 general-purpose counters, while a fifth general-purpose event can not
+    assert event_groups.counter_candidates[22] == [("FIXED", 2)]
+    event_groups.pinned_events = [20, 21]
+    event_groups._EventGroup__compile_counter_constraints()
+    assert event_groups.counter_candidates[22] == [("FIXED", 2)]
+    assert ("FIXED", 1) in event_groups.counter_candidates[20]
+    assert event_groups._EventGroup__can_schedule({22, 30, 31, 32, 33})
+    assert not event_groups._EventGroup__can_schedule({30, 31, 32, 33, 40})
+
+    # 4. events restricted to a subset of general-purpose counters, e.g. two events which can only be counted on counter 0 
+    # can not be counted in the same group, while an event with the fixed counter reserved can not be counted at all
+    event_groups = EventGroup.get_event_group(isa="x86_64", arch="intel_icelake")
+    event_groups.events = [ dict(item, counters=[0]) if item["id"] in (30, 31) else item for item in event_groups.events ]
+    event_groups._EventGroup__compile_counter_constraints()
+    assert event_groups.counter_candidates[30] == [("GP", 0)]
+    assert not event_groups._EventGroup__can_schedule({30, 31})
+    assert event_groups._EventGroup__can_schedule({30, 32, 33})
+    event_groups.event_groups = [[30, 31, 32, 33]]
+    event_groups._EventGroup__optimize_event_groups()
+    print([ sorted(group) for group in event_groups.event_groups ])
+    assert len(event_groups.event_groups) == 2
+    assert all(not {30, 31} <= set(group) for group in event_groups.event_groups)
+
+    # 5. only the events required by the selected metrics are collected, in a single group without multiplexing
+    event_groups = EventGroup.get_event_group(isa="x86_64", arch="intel_icelake")
+    event_groups.select_metrics(["CPI", "branch"])
+    event_groups._EventGroup__optimize_event_groups()
+    print(event_groups.get_event_groups_str())
+    assert [ sorted(group) for group in event_groups.event_groups ] == [[40, 41]]
+    assert event_groups.get_time_share() == [1.0]
+    assert { item["id"] for item in event_groups.events } == {20, 21, 40, 41}
+    try:
+        event_groups.select_metrics(["undefined"])
+        assert False
+    except EventGroupError as e:
+        print(e)
+
+    # 6. pinned events without fixed counters (instructions on Arm processors) occupy a general-purpose counter, 
+    # so that the 6 cache events can not be counted in a single group on the 6 general-purpose counters
+    event_groups = EventGroup.get_event_group(isa="aarch64", arch="arm")
+    event_groups.select_metrics(["cache"])
+    event_groups._EventGroup__optimize_event_groups()
+    print(event_groups.get_event_groups_str())
+    assert 21 in event_groups.pinned_events and "fixed" not in [ item for item in event_groups.events if item["id"] == 21 ][0]
+    assert len(event_groups.event_groups) == 2
+    for group in event_groups.event_groups:
+        assert len(group) + 1 <= event_groups.available_GP, group
+    assert not event_groups._EventGroup__can_schedule({30, 31, 32, 33, 34, 35})
+
+    # 7. metric expressions
+    expression = MetricExpression("CPI", "e20 / e21", {20, 21})
+    assert expression.dependencies == {20, 21}
+    values = expression({ 20: np.array([100.0, 200.0, 300.0]), 21: np.array([50.0, 0.0, np.nan]) })
+    assert values[0] == 2.0 and np.isnan(values[1]) and np.isnan(values[2])
+    assert np.isnan(MetricExpression.safe_div(1.0, 0.0))
+    for invalid_expression in ("e20 / e99", "e20 ** 2", "__import__('os')", "e20 /"):
+        try:
+            MetricExpression("INVALID", invalid_expression, {20, 21})
+            assert False, invalid_expression
+        except EventGroupError as e:
+            print(e)
+
+    print("OK")